@@ -1,10 +1,25 @@
 import streamlit as st
 import pandas as pd
-import random
+import os
 import time
 from datetime import datetime
 import numpy as np
-import plotly.graph_objects as go
+
+from bms import CellStore, checkpoint, engine, export
+from bms.acquisition import AcquisitionLoop, random_walk
+from bms.aging import AgingModel
+from bms.benches import BenchManager
+from bms.estimation import SocEstimator
+from bms.figures import FigureCache
+from bms.history import HistoryBuffer
+from bms.integrator import AdaptiveStep
+from bms.noise import Gaussian, NoiseModel, Spikes, Uniform, default_seed
+from bms.pack import BALANCING, PackModel
+from bms.profiling import Profiler
+from bms.rules import DEFAULT_RULESET
+from bms.telemetry import DEFAULT_ROOT, TelemetryWriter, load_channel, safe_name
+from bms.thermal import ThermalModel
+from bms.widgets import cell_table, profiler_panel
 
 
 # Page configuration
@@ -70,13 +85,143 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+
+
+# Perturbations applied by "Refresh Data", all cells in one vectorized update
+REFRESH_NOISE = {
+    "temp": (Gaussian(2.0), Spikes(0.05, 5.0)),
+    "voltage": Uniform(-0.1, 0.1),
+}
+REFRESH_BOUNDS = {"temp": (20, 45), "voltage": ("min_voltage", "max_voltage")}
+
+
+@st.cache_resource(max_entries=32)
+def get_noise(bench_name, group_number):
+    # Tick jitter and refresh noise of a bench, replayable from one seed
+    seed = default_seed()
+    return random_walk(seed), NoiseModel(REFRESH_NOISE, seed, bounds=REFRESH_BOUNDS, stream=1)
+
+
+@st.cache_resource
+def get_profiler():
+    # Section timings of every session and of the simulation ticks
+    return Profiler()
+
+
+@st.cache_resource(max_entries=32, on_release=AcquisitionLoop.stop)
+def get_acquisition(bench_name, group_number):
+    # One long-lived producer per bench, shared by every session viewing it
+    walk, refresh = get_noise(bench_name, group_number)
+    pack = PackModel()
+    steps = (AdaptiveStep(), walk, pack, ThermalModel(), AgingModel(), SocEstimator(), DEFAULT_RULESET)
+    # Only voltage history is plotted, so the buffer spends its memory on that alone
+    loop = AcquisitionLoop(CellStore(), steps=steps, history=HistoryBuffer(channels=("voltage",)))
+    loop.components["pack"] = pack
+    loop.profiler = get_profiler()
+    loop.set_telemetry(TelemetryWriter(DEFAULT_ROOT, bench_name, group_number))
+    # Resume cells, tasks and noise where the last server left this bench
+    loop.components["refresh_noise"] = refresh
+    path = checkpoint.checkpoint_path(checkpoint.DEFAULT_ROOT, bench_name, group_number)
+    loop.restore_checkpoint(path)
+    loop.set_checkpoint(path, bench_name=bench_name, group_number=group_number)
+    return loop.start()
+
+
+@st.cache_resource(on_release=BenchManager.shutdown)
+def get_bench_manager():
+    # Lab-wide worker pool shared by every session; workers start with the first bench
+    return BenchManager(steps=(AdaptiveStep(), random_walk(), ThermalModel(), AgingModel(), SocEstimator(),
+                               DEFAULT_RULESET))
+
+
+SESSION_VIEW = "This session"
+OVERVIEW_VIEW = "🏭 All Benches"
+
+
+# Commands, run one at a time on the acquisition thread via acquisition.submit
+def reset_bench(loop, noise):
+    loop.replace_store(CellStore())
+    # A freshly configured bench replays the same noise sequence
+    for model in noise:
+        model.reseed(model.seed)
+
+
+def initialize_cells(loop, cell_configs, group_number, topology):
+    cells_data = CellStore(capacity=len(cell_configs))
+    for idx, cell_type in enumerate(cell_configs, start=1):
+        cell_key = f"cell_{idx}_{cell_type}"
+        
+        if cell_type == "lfp":
+            voltage = 3.2
+            min_v, max_v = 2.8, 3.6
+        else:  # nmc
+            voltage = 3.6
+            min_v, max_v = 3.4, 4.8
+        
+        cells_data.add(
+            cell_key,
+            cell_type,
+            voltage=voltage,
+            current=0.0,
+            temp=25.0,
+            max_voltage=max_v,
+            min_voltage=min_v,
+            group=group_number,
+            status="Idle"
+        )
+    loop.replace_store(cells_data)
+    # The group is wired as one pack of series cells and parallel strings
+    loop.components["pack"].configure(group_number, *topology)
+
+
+def set_balancing(loop, group_number, balancing):
+    pack = loop.components["pack"]
+    if group_number in pack.topologies:
+        pack.set_balancing(group_number, balancing)
+
+
+def pack_data(loop, group_number):
+    with loop.lock:
+        packs = loop.components["pack"].snapshot()
+    return next((pack for pack in packs if pack["group"] == group_number), None)
+
+
+def refresh_data(loop, refresh_noise):
+    # Simulate data updates
+    refresh_noise(loop.store)
+
+
+def emergency_stop(loop):
+    engine.stop_all(loop.store)
+
+
+def set_sample_rate(loop, rate):
+    loop.sample_rate = rate
+
+
 # Initialize session state
-if 'cells_data' not in st.session_state:
-    st.session_state.cells_data = {}
 if 'bench_configured' not in st.session_state:
     st.session_state.bench_configured = False
 if 'live_monitoring' not in st.session_state:
     st.session_state.live_monitoring = False
+if 'figures' not in st.session_state:
+    st.session_state.figures = FigureCache()
+
+figures = st.session_state.figures
+profiler = get_profiler()
+
+# A new session opens the bench checkpointed last, so a server restart lands back on it
+if "bench_name" not in st.session_state:
+    last_bench = checkpoint.latest() or {}
+    st.session_state.bench_name = last_bench.get("bench_name", "Test Bench Alpha")
+    st.session_state.group_number = last_bench.get("group_number", 1)
+
+# Sessions viewing the same bench share its loop and snapshot; changes are submitted as commands
+bench_key = (st.session_state.bench_name, st.session_state.group_number)
+acquisition = get_acquisition(*bench_key)
+noise = get_noise(*bench_key)
+lab = get_bench_manager()
+cells = acquisition.snapshot()
 
 # Header
 st.markdown("""
@@ -85,14 +230,16 @@ st.markdown("""
     <p>Advanced Battery Management System for Cell Testing & Monitoring</p>
 </div>
 """, unsafe_allow_html=True)
+if acquisition.error is not None:
+    st.error(f"⚠️ Acquisition tick failed ({acquisition.errors} times): {acquisition.error!r}")
 
 # Sidebar configuration
-with st.sidebar:
+with st.sidebar, profiler.section("sidebar"):
     st.markdown("### 🔧 Bench Configuration")
     
     with st.container():
         st.markdown('<div class="sidebar-section">', unsafe_allow_html=True)
-        bench_name = st.text_input("🏭 Bench Name", value="Test Bench Alpha", key="bench_name")
+        bench_name = st.text_input("🏭 Bench Name", key="bench_name")
         
         type_cell = st.selectbox(
             "🔋 Default Cell Type",
@@ -100,7 +247,7 @@ with st.sidebar:
             format_func=lambda x: f"{'NMC (Nickel Manganese Cobalt)' if x == 'nmc' else 'LFP (Lithium Iron Phosphate)'}"
         )
         
-        group_number = st.number_input("👥 Group Number", min_value=1, max_value=100, value=1)
+        group_number = st.number_input("👥 Group Number", min_value=1, max_value=100, key="group_number")
         st.markdown('</div>', unsafe_allow_html=True)
     
     # Cell type specifications
@@ -115,18 +262,93 @@ with st.sidebar:
     with st.container():
         st.markdown('<div class="sidebar-section">', unsafe_allow_html=True)
         num_cells = st.slider("Number of Cells", 1, 16, 8)
+        topologies = [(series, num_cells // series) for series in range(1, num_cells + 1) if num_cells % series == 0]
+        series, parallel = st.selectbox(
+            "🔗 Pack Topology", topologies, index=len(topologies) - 1,
+            format_func=lambda t: f"{t[0]}S{t[1]}P ({t[0]} in series × {t[1]} parallel strings)"
+        )
+        st.selectbox(
+            "⚖️ Balancing", BALANCING, format_func=str.title, key="balancing",
+            on_change=lambda: acquisition.submit(set_balancing, group_number, st.session_state.balancing)
+        )
+        st.slider(
+            "Sample Rate (Hz)", 1, 50, int(acquisition.sample_rate), key="sample_rate",
+            on_change=lambda: acquisition.submit(set_sample_rate, st.session_state.sample_rate)
+        )
         
         if st.button("🚀 Configure Test Bench", type="primary"):
             st.session_state.bench_configured = True
-            st.session_state.cells_data = {}
+            acquisition.submit(reset_bench, noise)
+            st.rerun()
+        st.caption(f"🎲 Noise seed {noise[0].seed} · replay with BMS_NOISE_SEED={noise[0].seed}")
+        if acquisition.checkpoint_error is not None:
+            st.caption(f"💾 Checkpoint failed: {acquisition.checkpoint_error}")
+        elif acquisition.last_checkpoint_time is not None:
+            st.caption(f"💾 Checkpointed {time.time() - acquisition.last_checkpoint_time:.0f}s ago")
+        st.markdown('</div>', unsafe_allow_html=True)
+    
+    st.markdown("### 🏭 Lab Benches")
+    with st.container():
+        st.markdown('<div class="sidebar-section">', unsafe_allow_html=True)
+        if cells and st.button("📤 Run Bench in Pool"):
+            lab.add_bench(bench_name, group_number, cells)
             st.rerun()
+        bench_view = st.selectbox("View", [SESSION_VIEW, *lab.benches, OVERVIEW_VIEW], key="bench_view")
         st.markdown('</div>', unsafe_allow_html=True)
+    
+    st.markdown("### 🛠️ Developer")
+    st.toggle("Show Profiler", key="developer_panel")
+    # Chart payloads are only serialized for the profiler
+    figures.measure = st.session_state.developer_panel
+
+# Pooled benches are stepped by worker processes; only their snapshot is read here
+pool_bench = bench_view not in (SESSION_VIEW, OVERVIEW_VIEW)
+if pool_bench:
+    cells = lab.snapshot(bench_view)
 
 # Main dashboard
-if st.session_state.bench_configured:
+if bench_view == OVERVIEW_VIEW:
+    st.markdown("## 🏭 All Benches")
+    
+    @st.fragment(run_every=1)
+    def bench_overview():
+        with profiler.section("table.bench_overview"):
+            overview = pd.DataFrame(lab.overview())
+            if overview.empty:
+                st.info("No benches running in the pool yet. Configure a bench and click 'Run Bench in Pool'.")
+                return
+            overview["time"] = pd.to_datetime(overview["time"], unit="s")
+            st.dataframe(
+                overview,
+                column_config={
+                    "bench": "Bench",
+                    "worker": "Worker",
+                    "time": st.column_config.DatetimeColumn("Last Sample", format="HH:mm:ss"),
+                    "sim_seconds": st.column_config.NumberColumn("Simulated (s)", format="%.0f"),
+                    "steps": st.column_config.NumberColumn("Steps", format="%d"),
+                    "step_ms": st.column_config.NumberColumn("Step (ms)", format="%.2f"),
+                    "cells": st.column_config.NumberColumn("Cells", format="%d"),
+                    "running": st.column_config.NumberColumn("Running", format="%d"),
+                    "alarms": st.column_config.NumberColumn("Alarms", format="%d"),
+                    "voltage_mean": st.column_config.NumberColumn("Avg Voltage (V)", format="%.2f"),
+                    "current_total": st.column_config.NumberColumn("Total Current (A)", format="%.1f"),
+                    "temp_mean": st.column_config.NumberColumn("Avg Temp (°C)", format="%.1f"),
+                    "temp_max": st.column_config.NumberColumn("Max Temp (°C)", format="%.1f"),
+                    "soc_mean": st.column_config.ProgressColumn("Avg SOC", format="%.2f", min_value=0, max_value=1),
+                    "health_mean": st.column_config.NumberColumn("Avg Health (%)", format="%.1f"),
+                    "error": "Worker Error",
+                },
+                use_container_width=True,
+                hide_index=True
+            )
+            st.caption(f"⚙️ {lab.workers} worker process(es) · {int(overview['cells'].sum())} cells")
+    
+    bench_overview()
+
+elif st.session_state.bench_configured or cells or pool_bench:
     
     # Cell configuration section
-    if not st.session_state.cells_data:
+    if not cells:
         st.markdown("## 🔋 Cell Setup")
         
         with st.form("cell_configuration"):
@@ -143,88 +365,78 @@ if st.session_state.bench_configured:
                         key=f"cell_type_{i}",
                         index=0 if type_cell == "lfp" else 1
                     )
-                    current = st.number_input(
-                        f"Current (A)",
-                        min_value=0.1,
-                        max_value=50.0,
-                        value=2.5,
-                        step=0.1,
-                        key=f"current_{i}"
-                    )
-                    cell_configs.append((cell_type, current))
+                    cell_configs.append(cell_type)
             
             if st.form_submit_button("⚡ Initialize Cells", type="primary"):
-                cells_data = {}
-                for idx, (cell_type, current) in enumerate(cell_configs, start=1):
-                    cell_key = f"cell_{idx}_{cell_type}"
-                    
-                    if cell_type == "lfp":
-                        voltage = 3.2
-                        min_v, max_v = 2.8, 3.6
-                    else:  # nmc
-                        voltage = 3.6
-                        min_v, max_v = 3.4, 4.8
-                    
-                    temp = round(random.uniform(25, 40), 1)
-                    capacity = round(voltage * current, 2)
-                    
-                    cells_data[cell_key] = {
-                        "voltage": voltage,
-                        "current": current,
-                        "temp": temp,
-                        "capacity": capacity,
-                        "max_voltage": max_v,
-                        "min_voltage": min_v,
-                        "status": "Normal",
-                        "timestamp": datetime.now(),
-                        "cycle_count": 0,
-                        "health": random.uniform(85, 100)
-                    }
-                
-                st.session_state.cells_data = cells_data
+                acquisition.submit(initialize_cells, cell_configs, group_number,
+                                   (series, parallel, st.session_state.balancing))
                 st.rerun()
     
     else:
         # Dashboard with live data
-        col1, col2, col3, col4 = st.columns(4)
-        
-        # Calculate summary metrics
-        total_cells = len(st.session_state.cells_data)
-        avg_voltage = np.mean([cell['voltage'] for cell in st.session_state.cells_data.values()])
-        total_capacity = sum([cell['capacity'] for cell in st.session_state.cells_data.values()])
-        avg_temp = np.mean([cell['temp'] for cell in st.session_state.cells_data.values()])
-        
-        with col1:
-            st.markdown(f"""
-            <div class="metric-card">
-                <h3>🔋 Total Cells</h3>
-                <h1>{total_cells}</h1>
-            </div>
-            """, unsafe_allow_html=True)
-        
-        with col2:
-            st.markdown(f"""
-            <div class="metric-card">
-                <h3>⚡ Avg Voltage</h3>
-                <h1>{avg_voltage:.2f}V</h1>
-            </div>
-            """, unsafe_allow_html=True)
-        
-        with col3:
-            st.markdown(f"""
-            <div class="metric-card">
-                <h3>🔥 Total Capacity</h3>
-                <h1>{total_capacity:.1f}Wh</h1>
-            </div>
-            """, unsafe_allow_html=True)
+        with profiler.section("cards"):
+            col1, col2, col3, col4 = st.columns(4)
+            
+            # Calculate summary metrics
+            total_cells = len(cells)
+            avg_voltage = cells.stats.mean("voltage")
+            avg_soc = cells.stats.mean("soc_est") * 100
+            avg_temp = cells.stats.mean("temp")
+            
+            with col1:
+                st.markdown(f"""
+                <div class="metric-card">
+                    <h3>🔋 Total Cells</h3>
+                    <h1>{total_cells}</h1>
+                </div>
+                """, unsafe_allow_html=True)
+            
+            with col2:
+                st.markdown(f"""
+                <div class="metric-card">
+                    <h3>⚡ Avg Voltage</h3>
+                    <h1>{avg_voltage:.2f}V</h1>
+                </div>
+                """, unsafe_allow_html=True)
+            
+            with col3:
+                st.markdown(f"""
+                <div class="metric-card">
+                    <h3>🔋 Avg SOC (EKF)</h3>
+                    <h1>{avg_soc:.1f}%</h1>
+                </div>
+                """, unsafe_allow_html=True)
+            
+            with col4:
+                st.markdown(f"""
+                <div class="metric-card">
+                    <h3>🌡️ Avg Temperature</h3>
+                    <h1>{avg_temp:.1f}°C</h1>
+                </div>
+                """, unsafe_allow_html=True)
         
-        with col4:
-            st.markdown(f"""
-            <div class="metric-card">
-                <h3>🌡️ Avg Temperature</h3>
-                <h1>{avg_temp:.1f}°C</h1>
-            </div>
-            """, unsafe_allow_html=True)
+        # Pack-level view of the group's series/parallel wiring
+        pack = None if pool_bench else pack_data(acquisition, group_number)
+        if pack is not None:
+            with profiler.section("pack"):
+                st.markdown(f"## 🔗 Pack {pack['series']}S{pack['parallel']}P · {pack['balancing'].title()} Balancing")
+                if pack["voltage"] is None:
+                    st.info(f"Group {pack['group']} needs {pack['series'] * pack['parallel']} cells for this topology.")
+                else:
+                    col1, col2, col3, col4 = st.columns(4)
+                    col1.metric("Pack Voltage", f"{pack['voltage']:.2f}V")
+                    col2.metric("Pack Current", f"{pack['current']:.2f}A")
+                    col3.metric("Voltage Spread", f"{pack['voltage_spread'] * 1000:.0f}mV")
+                    col4.metric("SOC Spread", f"{pack['soc_spread'] * 100:.2f}%", f"{pack['balancing_cells']} cells balancing",
+                                delta_color="off")
+                    st.dataframe(
+                        pd.DataFrame({
+                            "String": np.arange(1, pack["parallel"] + 1),
+                            "Current (A)": pack["string_current"],
+                        }),
+                        use_container_width=True,
+                        hide_index=True
+                    )
         
         # Live monitoring toggle
         col1, col2 = st.columns([3, 1])
@@ -237,24 +449,20 @@ if st.session_state.bench_configured:
         # Create visualizations
         col1, col2 = st.columns(2)
         
-        with col1:
+        with col1, profiler.section("chart.voltage"):
             # Voltage comparison chart
-            fig_voltage = go.Figure()
-            
-            cell_names = list(st.session_state.cells_data.keys())
-            voltages = [st.session_state.cells_data[cell]['voltage'] for cell in cell_names]
-            colors = ['#FF6B6B' if 'lfp' in cell else '#4ECDC4' for cell in cell_names]
+            cell_names = cells.keys
+            voltages = cells.voltage
+            colors = np.where(cells.types == "lfp", '#FF6B6B', '#4ECDC4')
             
-            fig_voltage.add_trace(go.Bar(
+            fig_voltage = figures.render("voltage", [("bar", dict(
                 x=cell_names,
                 y=voltages,
                 marker_color=colors,
-                text=[f"{v:.2f}V" for v in voltages],
+                texttemplate="%{y:.2f}V",
                 textposition='auto',
                 hovertemplate="<b>%{x}</b><br>Voltage: %{y:.2f}V<extra></extra>"
-            ))
-            
-            fig_voltage.update_layout(
+            ))], dict(
                 title="Cell Voltage Comparison",
                 xaxis_title="Cell ID",
                 yaxis_title="Voltage (V)",
@@ -262,18 +470,16 @@ if st.session_state.bench_configured:
                 height=400,
                 plot_bgcolor='rgba(0,0,0,0)',
                 paper_bgcolor='rgba(0,0,0,0)'
-            )
+            ))
             
             st.plotly_chart(fig_voltage, use_container_width=True)
         
-        with col2:
+        with col2, profiler.section("chart.temp_capacity"):
             # Temperature and capacity scatter plot
-            temps = [st.session_state.cells_data[cell]['temp'] for cell in cell_names]
-            capacities = [st.session_state.cells_data[cell]['capacity'] for cell in cell_names]
-            
-            fig_scatter = go.Figure()
+            temps = cells.temp
+            capacities = cells.capacity
             
-            fig_scatter.add_trace(go.Scatter(
+            fig_scatter = figures.render("temp_capacity", [("scatter", dict(
                 x=temps,
                 y=capacities,
                 mode='markers+text',
@@ -282,108 +488,130 @@ if st.session_state.bench_configured:
                     color=colors,
                     line=dict(width=2, color='white')
                 ),
-                text=[cell.split('_')[1] for cell in cell_names],
+                text=cells.cell_id,
                 textposition="middle center",
-                hovertemplate="<b>%{text}</b><br>Temperature: %{x:.1f}°C<br>Capacity: %{y:.2f}Wh<extra></extra>"
-            ))
-            
-            fig_scatter.update_layout(
+                hovertemplate="<b>%{text}</b><br>Temperature: %{x:.1f}°C<br>Capacity: %{y:.2f}Ah<extra></extra>"
+            ))], dict(
                 title="Temperature vs Capacity",
                 xaxis_title="Temperature (°C)",
-                yaxis_title="Capacity (Wh)",
+                yaxis_title="Capacity (Ah)",
                 height=400,
                 plot_bgcolor='rgba(0,0,0,0)',
                 paper_bgcolor='rgba(0,0,0,0)'
-            )
+            ))
             
             st.plotly_chart(fig_scatter, use_container_width=True)
         
+        if figures.measure:
+            st.caption(f"📦 Chart payload: {figures.total_payload_bytes / 1024:.1f} kB per frame")
+        
         # Cell status table
         st.markdown("## 📋 Detailed Cell Status")
         
-        # Create DataFrame for display
-        df_data = []
-        for cell_id, data in st.session_state.cells_data.items():
-            status = "Normal"
-            if data['voltage'] >= data['max_voltage'] * 0.95:
-                status = "High Voltage"
-            elif data['voltage'] <= data['min_voltage'] * 1.05:
-                status = "Low Voltage"
-            elif data['temp'] > 35:
-                status = "High Temperature"
-            
-            df_data.append({
-                "Cell ID": cell_id,
-                "Type": cell_id.split('_')[2].upper(),
-                "Voltage (V)": f"{data['voltage']:.2f}",
-                "Current (A)": f"{data['current']:.2f}",
-                "Temperature (°C)": f"{data['temp']:.1f}",
-                "Capacity (Wh)": f"{data['capacity']:.2f}",
-                "Health (%)": f"{data['health']:.1f}",
-                "Status": status
-            })
+        # Filtered, paginated table; only the visible page is built
+        with profiler.section("table.status"):
+            cell_table(cells, DEFAULT_RULESET, key="status", cell_types=["lfp", "nmc"])
         
-        df = pd.DataFrame(df_data)
+        if not pool_bench:
+            # Export filters for the full recorded history
+            with st.expander("📁 Export Options"):
+                export_format = st.selectbox("Format", export.available_formats(), format_func=str.upper)
+                export_cells = st.multiselect("Cells", cell_names)
+                export_types = st.multiselect("Chemistry", ["lfp", "nmc"])
+                export_hours = st.slider("Time Range (hours)", 1, 72, 24)
+            
+            # Control buttons
+            col1, col2, col3 = st.columns(3)
+            
+            with col1:
+                if st.button("🔄 Refresh Data", type="secondary"):
+                    acquisition.submit(refresh_data, noise[1])
+                    st.rerun()
+            
+            with col2:
+                if st.button("📊 Export Data", type="secondary"):
+                    with profiler.section("export"):
+                        # Stream the recorded history to disk chunk by chunk; the file is kept there
+                        # and handed to the download as a file, never held in memory as a whole
+                        file_format = export.FORMATS[export_format]
+                        file_name = f"battery_test_{safe_name(bench_name)}_{datetime.now().strftime('%Y%m%d_%H%M')}.{file_format['extension']}"
+                        frames = export.iter_frames(
+                            DEFAULT_ROOT,
+                            bench_name,
+                            group_number,
+                            cells=export_cells,
+                            chemistries=export_types,
+                            start=time.time() - export_hours * 3600
+                        )
+                        os.makedirs(export.DEFAULT_ROOT, exist_ok=True)
+                        export_path = os.path.join(export.DEFAULT_ROOT, file_name)
+                        export.write_export(export_path, frames, export_format)
+                        st.session_state.last_export = (export_path, file_format["mime"])
+                
+                if "last_export" in st.session_state and os.path.exists(st.session_state.last_export[0]):
+                    export_path, export_mime = st.session_state.last_export
+                    st.download_button(
+                        label=f"📁 Download {os.path.splitext(export_path)[1][1:].upper()}",
+                        data=lambda: open(export_path, "rb"),
+                        file_name=os.path.basename(export_path),
+                        mime=export_mime,
+                        on_click="ignore"
+                    )
+                    st.caption(f"💾 Saved to {os.path.abspath(export_path)}")
+            
+            with col3:
+                if st.button("🚨 Emergency Stop", type="secondary"):
+                    acquisition.submit(emergency_stop)
+                    st.error("⚠️ Emergency stop activated! All cell testing halted.")
+                    st.balloons()
+            
+            # Live monitoring section
+            if st.session_state.live_monitoring:
+                st.markdown("## 🔴 Live Monitoring Active")
+                
+                # Re-rendered every second from the latest acquired sample
+                @st.fragment(run_every=1)
+                def live_table():
+                    with profiler.section("table.live"):
+                        live = acquisition.snapshot()
+                        live_df = pd.DataFrame({
+                            'Cell': live.cell_id,
+                            'Voltage': live.voltage,
+                            'SOC (%)': live.soc_est * 100,
+                            'Temperature': live.temp,
+                            'Time': datetime.fromtimestamp(acquisition.last_sample_time or time.time()).strftime('%H:%M:%S')
+                        })
+                        st.dataframe(live_df, use_container_width=True)
+                        
+                        # Last minute of voltage samples from the ring buffer
+                        history_keys, times, history_voltages = acquisition.history_snapshot("voltage", 60)
+                        if acquisition.history.full and len(times) == acquisition.history.samples:
+                            st.caption(f"⚠️ History is capped at the last {times[-1] - times[0]:.0f}s for {len(history_keys)} cells")
+                        trend_df = pd.DataFrame(history_voltages.T, index=pd.to_datetime(times, unit='s'), columns=history_keys)
+                        st.line_chart(trend_df, y_label="Voltage (V)")
+                
+                live_table()
+        else:
+            st.info(f"📡 Read-only view of a pooled bench, stepped by worker {lab.benches[bench_view]['worker']}.")
+            if bench_view in lab.errors:
+                st.error(f"⚠️ This bench failed in its worker:\n\n```\n{lab.errors[bench_view]}\n```")
         
-        # Color-code the dataframe
-        def color_status(val):
-            if val == "Normal":
-                return 'background-color: #d4edda'
-            elif val in ["High Voltage", "High Temperature"]:
-                return 'background-color: #fff3cd'
+        # Stored telemetry, read through memory maps
+        st.markdown("## 🗄️ Stored Telemetry")
+        with profiler.section("chart.stored_telemetry"):
+            stored_hours = st.slider("History (hours)", 1, 72, 1)
+            # A pooled view reads the history recorded under the pooled bench's name and group
+            stored_bench = lab.benches[bench_view] if pool_bench else {"bench_name": bench_name, "group_number": group_number}
+            stored = load_channel(DEFAULT_ROOT, stored_bench["bench_name"], stored_bench["group_number"], "voltage",
+                                  start=time.time() - stored_hours * 3600)
+            if stored:
+                stored_df = pd.concat([
+                    pd.DataFrame(values, index=pd.to_datetime(times, unit='s'), columns=keys)
+                    for times, keys, values in stored
+                ])
+                st.line_chart(stored_df, y_label="Voltage (V)")
             else:
-                return 'background-color: #f8d7da'
-        
-        styled_df = df.style.applymap(color_status, subset=['Status'])
-        st.dataframe(styled_df, use_container_width=True, hide_index=True)
-        
-        # Control buttons
-        col1, col2, col3 = st.columns(3)
-        
-        with col1:
-            if st.button("🔄 Refresh Data", type="secondary"):
-                # Simulate data updates
-                for cell_id in st.session_state.cells_data:
-                    st.session_state.cells_data[cell_id]['temp'] = round(random.uniform(25, 40), 1)
-                    st.session_state.cells_data[cell_id]['voltage'] += random.uniform(-0.1, 0.1)
-                    st.session_state.cells_data[cell_id]['health'] += random.uniform(-1, 0.5)
-                st.rerun()
-        
-        with col2:
-            if st.button("📊 Export Data", type="secondary"):
-                csv = df.to_csv(index=False)
-                st.download_button(
-                    label="📁 Download CSV",
-                    data=csv,
-                    file_name=f"battery_test_{bench_name}_{datetime.now().strftime('%Y%m%d_%H%M')}.csv",
-                    mime="text/csv"
-                )
-        
-        with col3:
-            if st.button("🚨 Emergency Stop", type="secondary"):
-                st.error("⚠️ Emergency stop activated! All cell testing halted.")
-                st.balloons()
-        
-        # Live monitoring section
-        if st.session_state.live_monitoring:
-            st.markdown("## 🔴 Live Monitoring Active")
-            with st.empty():
-                for i in range(10):
-                    # Simulate real-time updates
-                    live_data = []
-                    for cell_id, data in st.session_state.cells_data.items():
-                        voltage = data['voltage'] + random.uniform(-0.05, 0.05)
-                        temp = data['temp'] + random.uniform(-1, 1)
-                        live_data.append({
-                            'Cell': cell_id.split('_')[1],
-                            'Voltage': voltage,
-                            'Temperature': temp,
-                            'Time': datetime.now().strftime('%H:%M:%S')
-                        })
-                    
-                    live_df = pd.DataFrame(live_data)
-                    st.dataframe(live_df, use_container_width=True)
-                    time.sleep(1)
+                st.info("No telemetry recorded for this bench yet.")
 
 else:
     # Welcome screen
@@ -409,6 +637,9 @@ else:
     - Emergency safety controls
     """)
 
+if st.session_state.developer_panel:
+    profiler_panel(profiler, key="profiler")
+
 # Footer
 st.markdown("---")
 st.markdown("⚡ **Battery Cell Testing Dashboard** | Built with Streamlit & Plotly | 🔋 Advanced Battery Management System")
@@ -0,0 +1,6 @@
+"""Benchmarks for the dashboards' render, simulation and export paths.
+
+Run from the repository root::
+
+    python -m benchmarks.run --cells 1 16 1000 10000 --output benchmarks/results.json
+"""
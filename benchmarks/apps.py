@@ -0,0 +1,80 @@
+"""Full-script rerun benchmarks driven headlessly with Streamlit's ``AppTest``.
+
+Each app is run once to create its acquisition loop, the loop's thread is
+stopped so samples do not race the measurements (commands then run
+immediately), and its store is replaced with a synthetic bench of the
+requested size before timing reruns.
+"""
+import os
+from contextlib import contextmanager
+
+from streamlit.testing.v1 import AppTest
+
+from bms.acquisition import AcquisitionLoop
+
+from benchmarks.micro import make_store
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TIMEOUT = 120
+
+
+@contextmanager
+def captured_loops():
+    """Collect every ``AcquisitionLoop`` the apps start."""
+    loops = []
+    start = AcquisitionLoop.start
+
+    def capture(self):
+        loops.append(self)
+        return start(self)
+
+    AcquisitionLoop.start = capture
+    try:
+        yield loops
+    finally:
+        AcquisitionLoop.start = start
+
+
+def _load(script, n, session_state=()):
+    app = AppTest.from_file(os.path.join(ROOT, script), default_timeout=TIMEOUT)
+    for name, value in dict(session_state).items():
+        app.session_state[name] = value
+    with captured_loops() as loops:
+        app.run()
+    # Loops are shared between sessions, so a later load may find its loop already prepared
+    for loop in loops:
+        loop.stop()
+        loop.replace_store(make_store(n))
+        loop.history.append(loop.store, 0.0)
+    app.run()
+    return app
+
+
+def _click(app, label):
+    def run():
+        next(b for b in app.button if label in b.label).click().run()
+    return run
+
+
+def _checked(app):
+    if app.exception:
+        raise RuntimeError(app.exception[0].message)
+    return app
+
+
+def scenarios(n):
+    """``(name, fn)`` pairs rerunning both dashboards with ``n`` cells."""
+    dashboard = _checked(_load("battery_dashboard.py", n, {"bench_configured": True}))
+    manager = _checked(_load("new_ui.py", n))
+    analytics = _checked(_load("new_ui.py", n))
+    analytics.sidebar.selectbox[0].select("📈 Analytics").run()
+    monitoring = _checked(_load("new_ui.py", n))
+    monitoring.sidebar.selectbox[0].select("📊 Real-time Monitoring").run()
+
+    return [
+        ("battery_dashboard.rerun", dashboard.run),
+        ("battery_dashboard.refresh_data", _click(dashboard, "Refresh Data")),
+        ("new_ui.rerun.cell_management", manager.run),
+        ("new_ui.rerun.analytics", analytics.run),
+        ("new_ui.refresh_data", _click(monitoring, "Refresh Data")),
+    ]
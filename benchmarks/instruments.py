@@ -0,0 +1,35 @@
+"""Latency and throughput of the cycler drivers against the simulated instrument."""
+import asyncio
+
+import numpy as np
+
+from bms.cycler import SimulatedCycler, simulated_bench
+from bms.drivers import ConnectionPool, CyclerDriver
+
+# Reading every channel with its own request is only timed up to this many channels
+PER_CHANNEL_LIMIT = 1000
+
+
+class InstrumentFixture:
+    """Loopback cycler of ``n`` channels and a connection pool, on a private event loop."""
+
+    def __init__(self, n, pool_size=4):
+        self.loop = asyncio.new_event_loop()
+        self.cycler = SimulatedCycler(simulated_bench(n))
+        host, port = self.loop.run_until_complete(self.cycler.start())
+        self.pool = ConnectionPool(host, port, pool_size)
+        self.channels = np.arange(1, n + 1)
+
+    def scenarios(self):
+        def poll(driver):
+            return lambda: self.loop.run_until_complete(driver.measure(self.channels))
+
+        scenarios = [("instrument_poll_batched", poll(CyclerDriver(self.pool, batch_size=64)))]
+        if len(self.channels) <= PER_CHANNEL_LIMIT:
+            scenarios.append(("instrument_poll_per_channel", poll(CyclerDriver(self.pool, batch_size=1))))
+        return scenarios
+
+    def close(self):
+        self.loop.run_until_complete(self.pool.close())
+        self.loop.run_until_complete(self.cycler.stop())
+        self.loop.close()
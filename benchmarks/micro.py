@@ -0,0 +1,135 @@
+"""Micro-benchmarks of the data paths behind the dashboards."""
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from bms import CELL_SPECS, CellStore, engine
+from bms.acquisition import random_walk
+from bms.aging import AgingModel
+from bms.estimation import SocEstimator
+from bms.export import iter_frames, write_export
+from bms.figures import FigureCache
+from bms.integrator import AdaptiveStep
+from bms.noise import Gaussian, NoiseModel, Spikes, Uniform
+from bms.pack import PackModel
+from bms.rules import DEFAULT_RULESET
+from bms.scheduler import Scheduler, make_profile
+from bms.table import select_cells, status_frame
+from bms.telemetry import TelemetryWriter
+from bms.thermal import ThermalModel
+
+
+def make_store(n, seed=0):
+    """Bench of ``n`` cells with varied readings, half LFP and half NMC, in eight groups."""
+    rng = np.random.default_rng(seed)
+    store = CellStore(capacity=n)
+    for i in range(n):
+        cell_type = ("lfp", "nmc")[i % 2]
+        spec = CELL_SPECS[cell_type]
+        store.add(
+            f"cell_{i + 1}_{cell_type}",
+            cell_type,
+            voltage=rng.uniform(spec["min_v"], spec["max_v"]),
+            current=rng.uniform(0, 5),
+            temp=rng.uniform(25, 40),
+            health=rng.uniform(85, 100),
+            cycles=int(rng.integers(0, 1000)),
+            group=i % 8,
+        )
+    DEFAULT_RULESET(store)
+    return store
+
+
+def refresh_noise(seed=0):
+    # The "Refresh Data" update of battery_dashboard.py
+    return NoiseModel(
+        {"temp": (Gaussian(2.0), Spikes(0.05, 5.0)), "voltage": Uniform(-0.1, 0.1)},
+        seed,
+        bounds={"temp": (20, 45), "voltage": ("min_voltage", "max_voltage")},
+        stream=1
+    )
+
+
+def scenarios(n):
+    """``(name, fn)`` pairs for a bench of ``n`` cells."""
+    store = make_store(n)
+    running = make_store(n)
+    engine.start_task(running, np.arange(n), 1, engine.make_task("CC_CV", duration=1e9))
+    churn = make_store(n)
+    adaptive = AdaptiveStep()
+
+    # One CC_CV -> IDLE -> CC_CD profile per ten cells, staggered so transitions keep happening
+    profiled = make_store(n)
+    scheduler = Scheduler()
+    profiled_keys = profiled.keys
+    for task_id, start in enumerate(range(0, n, 10), 1):
+        duration = 5.0 + task_id % 50
+        steps = [engine.make_task(task_type, duration=duration) for task_type in engine.TASK_TYPES]
+        scheduler.submit(profiled, task_id, make_profile(steps, repeat=1000), profiled_keys[start:start + 10])
+
+    refresh = refresh_noise()
+    walk = random_walk(0)
+    aging = AgingModel()
+    thermal = ThermalModel()
+    # Every group of the running bench as a pack of five parallel strings
+    pack = PackModel()
+    for group, count in running.counts("group").items():
+        if count % 5 == 0:
+            pack.configure(group, count // 5, 5, ("passive", "active")[group % 2])
+    estimator = SocEstimator()
+    figures = FigureCache()
+    measured = FigureCache(measure=True)
+    keys = store.keys
+
+    def voltage_bar(cache):
+        return cache.render("voltage", [("bar", {"x": keys, "y": store.voltage})], {"height": 400})
+
+    def add_remove():
+        churn.remove(churn.registry.keys[0])
+        churn.add(f"cell_{churn.next_id}_lfp", "lfp", group=churn.next_id % 8)
+
+    def status_table():
+        return status_frame(store, select_cells(store, DEFAULT_RULESET)[:100], DEFAULT_RULESET)
+
+    return [
+        ("refresh_data", lambda: refresh(store)),
+        ("random_walk", lambda: walk(store, 0.1)),
+        ("engine_step", lambda: engine.step(running, 0.1)),
+        ("adaptive_step", lambda: adaptive(running, 0.1)),
+        ("adaptive_hour", lambda: adaptive(running.copy(), 3600.0)),
+        ("scheduler", lambda: scheduler(profiled, 0.1)),
+        ("pack", lambda: pack(running, 0.1)),
+        ("thermal", lambda: thermal(running, 0.1)),
+        ("aging", lambda: aging(running, 0.1)),
+        ("soc_estimator", lambda: estimator(running, 0.1)),
+        ("rules", lambda: DEFAULT_RULESET(store)),
+        ("snapshot", store.copy),
+        ("status_table_page", status_table),
+        ("filter_type_group", lambda: select_cells(store, DEFAULT_RULESET, types=("lfp",), groups=(3,))),
+        ("add_remove", add_remove),
+        ("status_table_full", lambda: status_frame(store, np.arange(n), DEFAULT_RULESET)),
+        ("figure_cold", lambda: voltage_bar(FigureCache())),
+        ("figure_warm", lambda: voltage_bar(figures)),
+        ("figure_warm_measured", lambda: voltage_bar(measured)),
+    ]
+
+
+class ExportFixture:
+    """Telemetry partition of ``samples`` rows for ``n`` cells in a temp directory."""
+
+    def __init__(self, n, samples=60):
+        self.root = tempfile.mkdtemp(prefix="bms-bench-")
+        store = make_store(n)
+        writer = TelemetryWriter(self.root, "bench", 1)
+        for t in range(samples):
+            writer.append(store, float(t))
+        writer.close()
+
+    def export_csv(self):
+        path = os.path.join(self.root, "export.csv")
+        return write_export(path, iter_frames(self.root, "bench", 1), "csv")
+
+    def close(self):
+        shutil.rmtree(self.root, ignore_errors=True)
@@ -0,0 +1,67 @@
+"""Run the benchmark suite and write a JSON report.
+
+    python -m benchmarks.run                          # everything, default sizes
+    python -m benchmarks.run --suite micro --cells 10000 --repeat 20
+"""
+import argparse
+import os
+
+# Keep the apps' telemetry out of the working tree (read when bms.telemetry is imported)
+os.environ.setdefault("BMS_TELEMETRY_DIR", os.path.join("benchmarks", "telemetry"))
+
+from benchmarks import micro
+from benchmarks.harness import measure, write_report
+
+CELL_COUNTS = (1, 16, 1000, 10000)
+
+
+def run(suites, cell_counts, repeat=5, export_samples=60):
+    results = []
+
+    def record(suite, name, n, fn):
+        result = {"suite": suite, "name": name, "cells": n, **measure(fn, repeat)}
+        print(f"{suite:10} {name:32} {n:6d} cells  {result['median_s'] * 1000:10.2f} ms"
+              f"  {result['peak_bytes'] / 2**20:8.2f} MiB", flush=True)
+        results.append(result)
+
+    for n in cell_counts:
+        if "micro" in suites:
+            for name, fn in micro.scenarios(n):
+                record("micro", name, n, fn)
+            fixture = micro.ExportFixture(n, export_samples)
+            try:
+                record("micro", "export_csv", n, fixture.export_csv)
+            finally:
+                fixture.close()
+        if "instrument" in suites:
+            from benchmarks.instruments import InstrumentFixture
+            fixture = InstrumentFixture(n)
+            try:
+                for name, fn in fixture.scenarios():
+                    record("instrument", name, n, fn)
+            finally:
+                fixture.close()
+        if "app" in suites:
+            from benchmarks import apps
+            for name, fn in apps.scenarios(n):
+                record("app", name, n, fn)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark render, simulation and export hot paths.")
+    parser.add_argument("--suite", nargs="+", choices=("micro", "instrument", "app"),
+                        default=("micro", "instrument", "app"))
+    parser.add_argument("--cells", nargs="+", type=int, default=CELL_COUNTS)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--export-samples", type=int, default=60, help="telemetry samples exported per run")
+    parser.add_argument("--output", default=os.path.join("benchmarks", "results.json"))
+    args = parser.parse_args(argv)
+
+    results = run(args.suite, args.cells, args.repeat, args.export_samples)
+    write_report(args.output, results)
+    print(f"Wrote {len(results)} results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
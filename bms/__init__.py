@@ -0,0 +1,5 @@
+"""Core data structures shared by the battery dashboards."""
+from bms.cell_store import FIELDS, STATUSES, CellStore
+from bms.chemistry import CELL_SPECS, CELL_TYPES
+
+__all__ = ["CELL_SPECS", "CELL_TYPES", "FIELDS", "STATUSES", "CellStore"]
@@ -0,0 +1,234 @@
+"""Background acquisition loop that runs independently of Streamlit reruns.
+
+The loop owns a ``CellStore`` and advances it on its own thread at a fixed
+sample rate. Every tick is handed to the registered sinks (history buffers,
+telemetry writers, ...) so no sample depends on how quickly the page renders.
+One loop per bench is shared by every viewer: sessions only read copies
+through ``snapshot`` and ``history_snapshot``, and every change goes through
+``submit``, which runs commands one at a time on the loop's thread. With
+``set_checkpoint`` the whole bench is checkpointed periodically and on
+``stop``, and ``restore_checkpoint`` resumes it after a restart. A tick that
+raises does not stop the thread: the exception is kept in ``error`` for the
+page to show, and the loop keeps serving commands.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import nullcontext
+
+from bms import checkpoint, engine
+from bms.noise import NoiseModel, Uniform
+
+
+def random_walk(seed=None):
+    """Step jittering the voltage of cells that are not running a task; ``bms.thermal`` owns ``temp``."""
+    return NoiseModel(
+        {"voltage": Uniform(-0.05, 0.05)},
+        seed,
+        bounds={"voltage": ("min_voltage", "max_voltage")},
+        idle_only=True
+    )
+
+
+class AcquisitionLoop:
+    """Producer thread stepping ``store`` ``sample_rate`` times per second.
+
+    ``steps`` are callables ``step(store, dt)`` applied in order on every
+    tick; ``sinks`` are callables ``sink(store, t)`` invoked afterwards with
+    the lock still held, so they see a consistent sample. When ``history``
+    is given it is registered as the first sink. ``tasks`` holds the task
+    records shown by the UI, keyed ``task_<id>``; like the store, it is only
+    changed by commands. When ``profiler`` is set, every tick is recorded as
+    its ``simulation.tick`` section. ``components`` names stateful objects
+    used by commands rather than steps (a refresh noise model, say) whose
+    state belongs in checkpoints too.
+    """
+
+    def __init__(self, store, sample_rate=10.0, steps=(engine.step,), history=None):
+        self.store = store
+        self.sample_rate = sample_rate
+        self.steps = list(steps)
+        self.history = history
+        self.sinks = [history.append] if history is not None else []
+        self.telemetry = None
+        self.profiler = None
+        self.lock = threading.RLock()
+        self.tasks = {}
+        self.next_task_id = 1
+        self.components = {}
+        self.checkpoint_path = None
+        self.checkpoint_every = 30.0
+        self.checkpoint_meta = {}
+        self.checkpoint_error = None
+        self.error = None
+        self.errors = 0
+        self.last_checkpoint_time = None
+        self._next_checkpoint = None
+        self.samples = 0
+        self.commands = 0
+        self.last_sample_time = None
+        self._generation = 0
+        self._snapshot = None
+        self._commands = queue.SimpleQueue()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return self
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="bms-acquisition", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=1.0):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self._apply_commands()
+        if self.checkpoint_path is not None:
+            self.save_checkpoint()
+        self.set_telemetry(None)
+
+    def set_telemetry(self, writer):
+        """Route samples to ``writer`` (a ``TelemetryWriter``), closing the previous one."""
+        with self.lock:
+            if self.telemetry is not None:
+                self.sinks.remove(self.telemetry.append)
+                self.telemetry.close()
+            self.telemetry = writer
+            if writer is not None:
+                self.sinks.append(writer.append)
+
+    def set_checkpoint(self, path, every=30.0, **meta):
+        """Checkpoint to ``path`` every ``every`` seconds and on ``stop``; ``meta`` goes in the header."""
+        with self.lock:
+            self.checkpoint_path = path
+            self.checkpoint_every = every
+            self.checkpoint_meta = meta
+            self._next_checkpoint = time.time() + every
+
+    def save_checkpoint(self):
+        """Write a checkpoint now; a failure is kept in ``checkpoint_error`` instead of raised."""
+        section = self.profiler.section("checkpoint.save") if self.profiler is not None else nullcontext()
+        try:
+            with section:
+                checkpoint.save(self.checkpoint_path, self, **self.checkpoint_meta)
+            self.checkpoint_error = None
+        except Exception as e:
+            self.checkpoint_error = e
+        self.last_checkpoint_time = time.time()
+        self._next_checkpoint = self.last_checkpoint_time + self.checkpoint_every
+
+    def restore_checkpoint(self, path):
+        """Resume from the checkpoint at ``path``; returns False when there is none to read."""
+        try:
+            saved = checkpoint.load(path)
+        except (OSError, checkpoint.CheckpointError):
+            return False
+        checkpoint.restore(self, saved)
+        return True
+
+    def replace_store(self, store):
+        """Swap in a freshly configured bench."""
+        with self.lock:
+            self.store = store
+            self._generation += 1
+
+    def submit(self, command, *args, timeout=5.0):
+        """Run ``command(loop, *args)`` between ticks and return its result.
+
+        Commands from every session share one queue and run in submission
+        order on the loop's thread (or right away when the loop is stopped),
+        so concurrent controls never interleave.
+        """
+        future = Future()
+        self._commands.put((future, command, args))
+        if self.running:
+            self._wake.set()
+        else:
+            self._apply_commands()
+        return future.result(timeout)
+
+    def snapshot(self):
+        """Read-only copy of the live store for rendering.
+
+        The copy is shared by every caller until the next tick or command,
+        so the cost of a rerun does not grow with the number of viewers.
+        Callers must not modify it.
+        """
+        with self.lock:
+            if self._snapshot is None or self._snapshot[0] != self._generation:
+                self._snapshot = (self._generation, self.store.copy())
+            return self._snapshot[1]
+
+    def task_snapshot(self):
+        """Copy of ``tasks`` for rendering."""
+        with self.lock:
+            return {key: dict(task) for key, task in self.tasks.items()}
+
+    def history_snapshot(self, channel, seconds):
+        """Copy ``(keys, times, values)`` of one history channel over the last ``seconds``."""
+        with self.lock:
+            times, values = self.history.channel(channel, seconds)
+            return list(self.history.keys), times.copy(), values.copy()
+
+    def tick(self, dt):
+        """Take one sample; normally called from the loop thread."""
+        section = self.profiler.section("simulation.tick") if self.profiler is not None else nullcontext()
+        with self.lock, section:
+            for step in self.steps:
+                step(self.store, dt)
+            t = time.time()
+            for sink in self.sinks:
+                sink(self.store, t)
+            self.samples += 1
+            self.last_sample_time = t
+            self._generation += 1
+            if self.checkpoint_path is not None and t >= self._next_checkpoint:
+                self.save_checkpoint()
+
+    def _apply_commands(self):
+        with self.lock:
+            while True:
+                try:
+                    future, command, args = self._commands.get_nowait()
+                except queue.Empty:
+                    return
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    future.set_result(command(self, *args))
+                except Exception as e:
+                    future.set_exception(e)
+                self.commands += 1
+                self._generation += 1
+
+    def _run(self):
+        next_tick = time.monotonic()
+        while not self._stop.is_set():
+            period = 1.0 / self.sample_rate
+            next_tick += period
+            # Serve commands while waiting for the next tick
+            while not self._stop.is_set() and self._wake.wait(max(0.0, next_tick - time.monotonic())):
+                self._wake.clear()
+                self._apply_commands()
+            if self._stop.is_set():
+                break
+            self._apply_commands()
+            try:
+                self.tick(period)
+            except Exception as e:
+                self.error = e
+                self.errors += 1
+            # Resynchronise after a long stall instead of replaying a burst
+            if time.monotonic() - next_tick > 1.0:
+                next_tick = time.monotonic()
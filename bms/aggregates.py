@@ -0,0 +1,142 @@
+"""Incrementally maintained bench aggregates.
+
+``Aggregates`` keeps running sums, extremes and threshold counters for a
+``CellStore``. The store reports every add, remove and write, and each report
+only touches the affected cells, so reading a headline number is O(1) however
+many cells are on the bench. Extremes are recomputed lazily, and only when
+the cell holding one of them is removed or moves inwards.
+"""
+import numpy as np
+
+# Columns whose sum, mean, minimum and maximum are maintained
+TRACKED = ("voltage", "current", "temp", "capacity", "health", "cycles", "soc", "soc_est")
+
+# Sums of per-cell expressions over tracked columns
+DERIVED = {
+    "power": (("voltage", "current"), np.multiply),
+    "abs_current": (("current",), np.abs),
+}
+
+# Number of cells past a threshold
+THRESHOLDS = {
+    "hot": ("temp", np.greater, 35),
+    "unhealthy": ("health", np.less, 80),
+    "aged": ("cycles", np.greater, 800),
+}
+
+# Rebuild the sums from scratch after this many writes to shed rounding drift
+RESYNC_WRITES = 1000
+
+
+class Aggregates:
+    """O(1) reads of bench-wide sums, means, extremes and threshold counts."""
+
+    def __init__(self, store):
+        self._store = store
+        self.refresh()
+
+    def copy(self, store):
+        other = Aggregates.__new__(Aggregates)
+        other._store = store
+        other._sums = dict(self._sums)
+        other._mins = dict(self._mins)
+        other._maxs = dict(self._maxs)
+        other._over = dict(self._over)
+        other._writes = self._writes
+        return other
+
+    def total(self, name):
+        """Sum of a tracked column or derived expression."""
+        return self._sums[name]
+
+    def mean(self, name):
+        n = len(self._store)
+        return self._sums[name] / n if n else float("nan")
+
+    def minimum(self, name):
+        if self._mins[name] is None:
+            self._mins[name] = self._column(name).min() if len(self._store) else float("nan")
+        return self._mins[name]
+
+    def maximum(self, name):
+        if self._maxs[name] is None:
+            self._maxs[name] = self._column(name).max() if len(self._store) else float("nan")
+        return self._maxs[name]
+
+    def over(self, threshold):
+        """Number of cells past the named threshold (see ``THRESHOLDS``)."""
+        return self._over[threshold]
+
+    def refresh(self):
+        """Recompute everything from the store's columns."""
+        self._sums = {name: float(self._column(name).sum()) for name in TRACKED}
+        for name, (deps, fn) in DERIVED.items():
+            self._sums[name] = float(fn(*(self._column(dep) for dep in deps)).sum())
+        self._mins = dict.fromkeys(TRACKED)
+        self._maxs = dict.fromkeys(TRACKED)
+        self._over = {
+            name: int(np.count_nonzero(op(self._column(field), limit)))
+            for name, (field, op, limit) in THRESHOLDS.items()
+        }
+        self._writes = 0
+
+    def on_add(self, i):
+        self._apply(i, 1)
+
+    def on_remove(self, i):
+        self._apply(i, -1)
+        for name in TRACKED:
+            value = self._column(name)[i]
+            if value == self._mins[name]:
+                self._mins[name] = None
+            if value == self._maxs[name]:
+                self._maxs[name] = None
+
+    def on_write(self, name, index, old, new):
+        """Account for ``column[index]`` changing from ``old`` to ``new``."""
+        if name not in TRACKED:
+            return
+        self._sums[name] += float(np.sum(new) - np.sum(old))
+        for derived, (deps, fn) in DERIVED.items():
+            if name in deps:
+                cols = [self._column(dep)[index] for dep in deps]
+                before = [old if dep == name else col for dep, col in zip(deps, cols)]
+                self._sums[derived] += float(np.sum(fn(*cols)) - np.sum(fn(*before)))
+        for threshold, (field, op, limit) in THRESHOLDS.items():
+            if field == name:
+                self._over[threshold] += int(np.count_nonzero(op(new, limit)) - np.count_nonzero(op(old, limit)))
+
+        if np.size(new):
+            lo, hi = np.min(new), np.max(new)
+            current = self._mins[name]
+            if current is not None and lo <= current:
+                self._mins[name] = lo
+            elif current is not None and np.min(old) <= current:
+                self._mins[name] = None
+            current = self._maxs[name]
+            if current is not None and hi >= current:
+                self._maxs[name] = hi
+            elif current is not None and np.max(old) >= current:
+                self._maxs[name] = None
+
+        self._writes += 1
+        if self._writes >= RESYNC_WRITES:
+            self.refresh()
+
+    def _apply(self, i, sign):
+        for name in TRACKED:
+            self._sums[name] += sign * float(self._column(name)[i])
+        for name, (deps, fn) in DERIVED.items():
+            self._sums[name] += sign * float(fn(*(self._column(dep)[i] for dep in deps)))
+        for name, (field, op, limit) in THRESHOLDS.items():
+            self._over[name] += sign * int(op(self._column(field)[i], limit))
+        if sign > 0:
+            for name in TRACKED:
+                value = self._column(name)[i]
+                if self._mins[name] is not None and value < self._mins[name]:
+                    self._mins[name] = value
+                if self._maxs[name] is not None and value > self._maxs[name]:
+                    self._maxs[name] = value
+
+    def _column(self, name):
+        return self._store._data[name][:len(self._store)]
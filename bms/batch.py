@@ -0,0 +1,238 @@
+"""Headless batch runner for task profiles.
+
+Runs a bench definition and its task queue through ``bms.engine`` in
+simulated time, as fast as the CPU allows and without a Streamlit session,
+then writes the recorded telemetry and a JSON summary to an output
+directory::
+
+    python -m bms.batch bench.json -o batch_results --dt 1
+
+With ``--adaptive`` the cells are integrated by ``bms.integrator``, which
+ends every phase at its exact cutoff time whatever the step, so hour-long
+profiles run with ``--dt 60`` or coarser.
+
+A bench definition is a JSON document::
+
+    {
+        "name": "Bench A",
+        "group": 1,
+        "ambient": 25.0,
+        "pack": {"series": 3, "parallel": 3, "balancing": "passive"},
+        "cells": [
+            {"type": "lfp", "count": 8, "soc": 0.1},
+            {"type": "nmc", "temp": 30.0}
+        ],
+        "tasks": [
+            {"task_type": "CC_CV", "cc_value": 2.0, "cv_voltage": 3.6},
+            {"task_type": "IDLE", "duration": 600},
+            {"task_type": "CC_CD", "cells": ["cell_1_lfp"], "voltage": 2.5}
+        ]
+    }
+
+Cells are keyed ``cell_<n>_<type>`` like in the dashboards, belong to the
+bench's ``group`` unless an entry sets its own and start at the ``ambient``
+temperature (25 °C by default) unless they set ``temp``; a task without
+``cells`` runs on every cell. With ``pack`` the bench's group is wired as a
+series/parallel pack (see ``bms.pack``) and its metrics land in the summary.
+Each cell works through the queue in order: a task starts once all of its
+cells have finished the tasks queued before it.
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from bms import CellStore, engine
+from bms.aging import AgingModel
+from bms.chemistry import CELL_TYPES, ocv
+from bms.integrator import AdaptiveStep
+from bms.pack import PackModel
+from bms.rules import DEFAULT_RULESET
+from bms.telemetry import TelemetryWriter
+from bms.thermal import ThermalModel
+
+
+def load_bench(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def build_store(bench):
+    """``CellStore`` holding the cells of a bench definition."""
+    store = CellStore()
+    for group in bench["cells"]:
+        cell_type = group["type"]
+        values = {name: value for name, value in group.items() if name not in ("type", "count")}
+        values.setdefault("group", bench.get("group", 0))
+        values.setdefault("temp", bench.get("ambient", 25.0))
+        if "soc" in values and "voltage" not in values:
+            values["voltage"] = ocv(CELL_TYPES.index(cell_type), values["soc"]).item()
+        for _ in range(group.get("count", 1)):
+            store.add(f"cell_{store.next_id}_{cell_type}", cell_type, **values)
+    return store
+
+
+def build_queue(bench, store):
+    """Task dicts of the bench's queue, with missing ``cells`` set to the whole bench."""
+    queue = []
+    for entry in bench.get("tasks", ()):
+        params = dict(entry)
+        task_type = params.pop("task_type")
+        cells = params.pop("cells", None) or store.keys
+        missing = [key for key in cells if key not in store]
+        if missing:
+            raise KeyError(f"Unknown cells in {task_type} task: {', '.join(missing)}")
+        queue.append(engine.make_task(task_type, cells, **params))
+    return queue
+
+
+def run_batch(store, tasks, dt=1.0, record_every=10.0, sinks=(), max_seconds=None, start_time=0.0, aging=None,
+              step=engine.step, thermal=None, pack=None):
+    """Run ``tasks`` on ``store`` until the queue drains; returns per-task results.
+
+    ``sinks`` are called as ``sink(store, t)`` every ``record_every``
+    simulated seconds (and once more at the end), with alarms evaluated just
+    before, so recording costs nothing between samples. ``pack`` (a
+    ``PackModel``), ``thermal`` (a ``ThermalModel``) and ``aging`` (an
+    ``AgingModel``) are stepped after every engine step when given. ``step``
+    advances the cells; with ``AdaptiveStep`` phases end at their exact
+    cutoff times whatever ``dt``, so a coarse ``dt`` only delays the start
+    of queued tasks.
+    """
+    indices = {task_id: np.array([store.index(key) for key in task["cells"]], dtype=np.intp)
+               for task_id, task in enumerate(tasks, 1)}
+    results = {task_id: {"task_type": task["task_type"], "cells": task["cells"], "start": None, "end": None}
+               for task_id, task in enumerate(tasks, 1)}
+    pending = list(enumerate(tasks, 1))
+    running = []
+    busy = np.zeros(len(store), dtype=bool)
+
+    def record(t):
+        DEFAULT_RULESET(store)
+        for sink in sinks:
+            sink(store, start_time + t)
+        return t
+
+    t = 0.0
+    steps = 0
+    next_record = 0.0
+    recorded = None
+    while True:
+        # Start every task whose cells are free and not claimed by an earlier queued task
+        claimed = busy.copy()
+        waiting = []
+        for task_id, task in pending:
+            cells = indices[task_id]
+            if claimed[cells].any():
+                waiting.append((task_id, task))
+            else:
+                engine.start_task(store, cells, task_id, task)
+                busy[cells] = True
+                results[task_id]["start"] = t
+                running.append(task_id)
+            claimed[cells] = True
+        pending = waiting
+
+        if t >= next_record:
+            recorded = record(t)
+            next_record += record_every
+        if not running or (max_seconds is not None and t >= max_seconds):
+            break
+
+        step(store, dt)
+        if pack is not None:
+            pack(store, dt)
+        if thermal is not None:
+            thermal(store, dt)
+        if aging is not None:
+            aging(store, dt)
+        t += dt
+        steps += 1
+
+        counts = engine.running_counts(store)
+        for task_id in [task_id for task_id in running if task_id not in counts]:
+            running.remove(task_id)
+            busy[indices[task_id]] = False
+            results[task_id]["end"] = t
+
+    if recorded != t:
+        record(t)
+    return {"sim_seconds": t, "steps": steps, "tasks": list(results.values())}
+
+
+def cell_summary(store):
+    """Final state of every cell, as JSON-ready lists."""
+    return {
+        "keys": store.keys,
+        "types": store.types.tolist(),
+        "soc": store.soc.round(4).tolist(),
+        "voltage": store.voltage.round(4).tolist(),
+        "temp": store.temp.round(2).tolist(),
+        "health": store.health.round(4).tolist(),
+        "cycles": store.cycles.tolist(),
+        "ah_throughput": store.ah_throughput.round(4).tolist(),
+        "status": DEFAULT_RULESET.statuses(store.alarms).tolist(),
+    }
+
+
+def run_bench(bench, output, dt=1.0, record_every=10.0, max_seconds=None, adaptive=False):
+    """Run one bench definition and write its telemetry and ``summary.json`` under ``output``."""
+    name = bench.get("name", "Batch")
+    group = bench.get("group", 1)
+    store = build_store(bench)
+    tasks = build_queue(bench, store)
+    pack = PackModel()
+    if "pack" in bench:
+        pack.configure(group, **bench["pack"])
+
+    os.makedirs(output, exist_ok=True)
+    writer = TelemetryWriter(output, name, group)
+    started = time.perf_counter()
+    try:
+        result = run_batch(store, tasks, dt, record_every, (writer.append,), max_seconds,
+                           start_time=time.time(), aging=AgingModel(),
+                           step=AdaptiveStep() if adaptive else engine.step,
+                           thermal=ThermalModel(bench.get("ambient", 25.0)), pack=pack)
+    finally:
+        writer.close()
+    wall_seconds = time.perf_counter() - started
+
+    summary = {
+        "bench_name": name,
+        "group_number": group,
+        "dt": dt,
+        "adaptive": adaptive,
+        "wall_seconds": wall_seconds,
+        "speedup": result["sim_seconds"] / wall_seconds if wall_seconds else None,
+        **result,
+        "packs": pack.snapshot(),
+        "cells": cell_summary(store),
+    }
+    with open(os.path.join(writer.path, "summary.json"), "w") as f:
+        json.dump(summary, f, indent=2)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a bench's task queue headlessly in simulated time.")
+    parser.add_argument("bench", nargs="+", help="bench definition JSON file(s)")
+    parser.add_argument("-o", "--output", default="batch_results", help="telemetry root for the results")
+    parser.add_argument("--dt", type=float, default=1.0, help="simulation time step in seconds")
+    parser.add_argument("--record-every", type=float, default=10.0, help="simulated seconds between samples")
+    parser.add_argument("--max-seconds", type=float, help="stop after this much simulated time")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="integrate with adaptive substeps and exact cutoff times (allows a coarse --dt)")
+    args = parser.parse_args(argv)
+
+    for path in args.bench:
+        summary = run_bench(load_bench(path), args.output, args.dt, args.record_every, args.max_seconds,
+                            args.adaptive)
+        print(f"{summary['bench_name']}: {len(summary['cells']['keys'])} cells, "
+              f"{len(summary['tasks'])} tasks, {summary['sim_seconds']:.0f}s simulated "
+              f"in {summary['wall_seconds']:.2f}s ({summary['speedup']:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,396 @@
+"""Many benches stepped in parallel by a pool of worker processes.
+
+``BenchManager`` shards benches across worker processes, balancing them by
+cell count. Each worker owns the ``CellStore`` of its benches, steps them on
+its own clock and publishes every tick into one shared-memory block per
+bench: a sequence counter, a fixed row of bench-wide summary numbers, and
+every ``CellStore`` field. Readers in the dashboard process copy a block
+under a seqlock (retrying while the counter is odd or changes), so they never
+see a half-written tick and never do any simulation work themselves.
+
+Workers are fresh interpreters running ``main`` of this module and talk to
+the manager over a ``multiprocessing.connection`` pipe, so starting them
+touches no state of the parent process.
+"""
+import atexit
+import copy
+import os
+import pickle
+import subprocess
+import sys
+import threading
+import time
+import traceback
+from multiprocessing import resource_tracker, shared_memory
+from multiprocessing.connection import Client, Listener, wait
+
+import numpy as np
+
+from bms import engine
+from bms.cell_store import FIELDS, CellStore
+from bms.noise import NoiseModel, default_seed
+from bms.rules import DEFAULT_RULESET
+
+# Directory holding the ``bms`` package, put on the workers' import path
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Bench-wide numbers each worker publishes alongside the cell columns
+SUMMARY = (
+    "time", "sim_seconds", "steps", "step_ms", "cells", "running", "alarms",
+    "voltage_mean", "current_total", "temp_mean", "temp_max", "soc_mean", "health_mean",
+)
+
+
+class SnapshotBlock:
+    """Shared-memory layout of one bench: ``seq``, ``SUMMARY`` and every field of ``FIELDS``."""
+
+    def __init__(self, cells, name=None, create=False):
+        self.cells = cells
+        offsets = {}
+        size = 8 + 8 * len(SUMMARY)
+        for field, dtype in FIELDS.items():
+            offsets[field] = size
+            size += -(-max(cells, 1) * np.dtype(dtype).itemsize // 8) * 8
+        self.shm = shared_memory.SharedMemory(name=name, create=create, size=size)
+        if not create:
+            # The creator unlinks the segment; a worker's own resource tracker must not
+            resource_tracker.unregister(self.shm._name, "shared_memory")
+        buf = self.shm.buf
+        self._seq = np.ndarray((1,), np.int64, buf, 0)
+        self._summary = np.ndarray((len(SUMMARY),), np.float64, buf, 8)
+        self._columns = {field: np.ndarray((cells,), dtype, buf, offsets[field]) for field, dtype in FIELDS.items()}
+        if create:
+            self._seq[0] = 0
+            self._summary[:] = np.nan
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def publish(self, store, summary):
+        self._seq[0] += 1
+        for field, column in self._columns.items():
+            column[:] = store._data[field][:self.cells]
+        self._summary[:] = [summary[key] for key in SUMMARY]
+        self._seq[0] += 1
+
+    def read(self, columns=True, retries=100):
+        """Consistent ``(summary, columns)`` copy of the last published tick."""
+        for _ in range(retries):
+            seq = self._seq[0]
+            if seq % 2 == 0:
+                summary = dict(zip(SUMMARY, self._summary.tolist()))
+                data = {field: column.copy() for field, column in self._columns.items()} if columns else None
+                if self._seq[0] == seq:
+                    return summary, data
+            time.sleep(0)
+        raise TimeoutError("Bench snapshot kept changing while being read")
+
+    def close(self):
+        # Views must go before the mapping can be closed
+        self._seq = self._summary = self._columns = None
+        self.shm.close()
+
+
+def summarize(store, sim_seconds, steps, step_ms):
+    stats = store.stats
+    running = store.active & (store.phase >= engine.PHASE_CC) & (store.phase <= engine.PHASE_IDLE)
+    return {
+        "time": time.time(),
+        "sim_seconds": sim_seconds,
+        "steps": steps,
+        "step_ms": step_ms,
+        "cells": len(store),
+        "running": np.count_nonzero(running),
+        "alarms": np.count_nonzero(store.alarms),
+        "voltage_mean": stats.mean("voltage"),
+        "current_total": stats.total("current"),
+        "temp_mean": stats.mean("temp"),
+        "temp_max": stats.maximum("temp"),
+        "soc_mean": stats.mean("soc"),
+        "health_mean": stats.mean("health"),
+    }
+
+
+class _Bench:
+    """Worker-side state of one bench, with its own copy of the steps since some keep per-cell state.
+
+    Noise models among the steps are reseeded with ``seed`` so that every
+    bench draws its own sequence.
+    """
+
+    def __init__(self, store, block, steps, seed):
+        self.store = store
+        self.block = block
+        self.pipeline = copy.deepcopy(steps)
+        for step in self.pipeline:
+            if isinstance(step, NoiseModel):
+                step.reseed(seed)
+        self.sim_seconds = 0.0
+        self.steps = 0
+        self.failed = False
+
+
+def run_worker(conn):
+    """Worker loop: apply commands from ``conn``, step every owned bench, publish.
+
+    The first message is ``("init", sample_rate, realtime, steps)``. A
+    command or step that raises is reported back as ``("error", bench_id,
+    traceback)``; a bench whose step failed is no longer stepped.
+    """
+    _, sample_rate, realtime, steps = conn.recv()
+    benches = {}
+    period = 1.0 / sample_rate
+    next_tick = time.monotonic()
+    while True:
+        # Idle workers block until there is work
+        while not benches or conn.poll():
+            try:
+                op, bench_id, *args = conn.recv()
+            except EOFError:
+                op, bench_id = "stop", None
+            if op == "stop":
+                for bench in benches.values():
+                    bench.block.close()
+                return
+            try:
+                if op == "add":
+                    store, block_name, seed = args
+                    bench = benches[bench_id] = _Bench(store, SnapshotBlock(len(store), block_name), steps, seed)
+                    bench.block.publish(store, summarize(store, 0.0, 0, 0.0))
+                elif op == "remove":
+                    benches.pop(bench_id).block.close()
+                elif op == "start_task":
+                    indices, task_id, task = args
+                    engine.start_task(benches[bench_id].store, indices, task_id, task)
+                elif op == "set_active":
+                    engine.set_active(benches[bench_id].store, *args)
+                elif op == "stop_task":
+                    engine.stop_task(benches[bench_id].store, *args)
+            except Exception:
+                conn.send(("error", bench_id, traceback.format_exc()))
+            next_tick = time.monotonic()
+
+        for bench_id, bench in benches.items():
+            if bench.failed:
+                continue
+            started = time.perf_counter()
+            try:
+                for step in bench.pipeline:
+                    step(bench.store, period)
+            except Exception:
+                bench.failed = True
+                conn.send(("error", bench_id, traceback.format_exc()))
+                continue
+            bench.sim_seconds += period
+            bench.steps += 1
+            step_ms = (time.perf_counter() - started) * 1000
+            bench.block.publish(bench.store, summarize(bench.store, bench.sim_seconds, bench.steps, step_ms))
+
+        if realtime:
+            next_tick += period
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            elif delay < -1.0:
+                next_tick = time.monotonic()
+
+
+def main():
+    """Entry point of a worker process started by ``BenchManager``.
+
+    The address of the manager's listener and its key arrive pickled on stdin.
+    """
+    address, authkey = pickle.load(sys.stdin.buffer)
+    with Client(address, authkey=authkey) as conn:
+        conn.send(os.getpid())
+        run_worker(conn)
+
+
+class BenchManager:
+    """Owns the worker pool and the shared-memory blocks of every bench.
+
+    Benches are addressed by ``"<name> · group <n>"``. Workers are started
+    lazily with the first bench, as fresh interpreters running this module.
+    With ``realtime=False`` workers step their benches back to back instead of
+    once per ``1 / sample_rate`` seconds. Every bench gets its own noise seed,
+    spawned from ``seed``. A command or step that fails in a worker, or a
+    worker that dies, leaves its traceback in ``errors`` under the bench id.
+    """
+
+    def __init__(self, workers=None, sample_rate=10.0, realtime=True, steps=(engine.step, DEFAULT_RULESET), seed=None):
+        self.workers = workers or os.cpu_count()
+        self.sample_rate = sample_rate
+        self.realtime = realtime
+        self.steps = tuple(steps)
+        self.seed = default_seed() if seed is None else int(seed)
+        self.benches = {}
+        self.errors = {}
+        self._seeds = np.random.SeedSequence(self.seed)
+        self._lock = threading.Lock()
+        self._processes = []
+        self._connections = []
+        self._load = []
+        self._next_task_id = 1
+        atexit.register(self.shutdown)
+
+    @staticmethod
+    def bench_id(bench_name, group_number):
+        return f"{bench_name} · group {int(group_number)}"
+
+    def add_bench(self, bench_name, group_number, store):
+        """Hand a copy of ``store`` to the least loaded worker; replaces a bench of the same id."""
+        bench_id = self.bench_id(bench_name, group_number)
+        with self._lock:
+            self._start_workers()
+            if bench_id in self.benches:
+                self._remove(bench_id)
+            worker = int(np.argmin(self._load))
+            block = SnapshotBlock(len(store), create=True)
+            block.publish(store, summarize(store, 0.0, 0, 0.0))
+            seed = int(self._seeds.spawn(1)[0].generate_state(1)[0])
+            self.benches[bench_id] = {
+                "bench_name": bench_name,
+                "group_number": int(group_number),
+                "worker": worker,
+                "seed": seed,
+                "keys": store.keys,
+                "block": block,
+            }
+            self.errors.pop(bench_id, None)
+            self._load[worker] += len(store)
+            self._send(worker, ("add", bench_id, store.copy(), block.name, seed))
+        return bench_id
+
+    def remove_bench(self, bench_id):
+        with self._lock:
+            self._remove(bench_id)
+
+    def start_task(self, bench_id, cells, task):
+        """Run ``task`` on the cells (keys) of a pooled bench; returns the task id."""
+        bench = self.benches[bench_id]
+        index = {key: i for i, key in enumerate(bench["keys"])}
+        indices = np.array([index[key] for key in cells], dtype=np.intp)
+        with self._lock:
+            task_id = self._next_task_id
+            self._next_task_id += 1
+            self._send(bench["worker"], ("start_task", bench_id, indices, task_id, task))
+        return task_id
+
+    def set_active(self, bench_id, task_id, active):
+        with self._lock:
+            self._send(self.benches[bench_id]["worker"], ("set_active", bench_id, task_id, active))
+
+    def stop_task(self, bench_id, task_id):
+        with self._lock:
+            self._send(self.benches[bench_id]["worker"], ("stop_task", bench_id, task_id))
+
+    def snapshot(self, bench_id):
+        """``CellStore`` copy of the bench's last published tick."""
+        with self._lock:
+            self._collect()
+            bench = self.benches[bench_id]
+            _, columns = bench["block"].read()
+        return CellStore.from_columns(bench["keys"], columns)
+
+    def overview(self):
+        """One summary dict per bench, read from the headers only."""
+        rows = []
+        with self._lock:
+            self._collect()
+            for bench_id, bench in self.benches.items():
+                summary, _ = bench["block"].read(columns=False)
+                error = self.errors.get(bench_id)
+                rows.append({"bench": bench_id, "worker": bench["worker"], **summary,
+                             "error": error.strip().splitlines()[-1] if error else None})
+        return rows
+
+    def shutdown(self, timeout=5.0):
+        with self._lock:
+            for worker in range(len(self._connections)):
+                self._send(worker, ("stop", None))
+            for process in self._processes:
+                try:
+                    process.wait(timeout)
+                except subprocess.TimeoutExpired:
+                    process.terminate()
+                    process.wait()
+            for conn in self._connections:
+                conn.close()
+            for bench in self.benches.values():
+                bench["block"].close()
+                bench["block"].shm.unlink()
+            self.benches.clear()
+            self._processes, self._connections, self._load = [], [], []
+
+    def _start_workers(self, timeout=30.0):
+        if self._processes:
+            return
+        # Workers are plain interpreters running ``main`` of this module, so
+        # nothing of the parent (under Streamlit, the app script) is re-imported
+        authkey = os.urandom(32)
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")])))
+        with Listener(authkey=authkey) as listener:
+            for _ in range(self.workers):
+                process = subprocess.Popen([sys.executable, "-m", "bms.benches"], stdin=subprocess.PIPE, env=env)
+                pickle.dump((listener.address, authkey), process.stdin)
+                process.stdin.close()
+                self._processes.append(process)
+            # Accept in a thread so a worker that dies before connecting cannot hang the dashboard
+            accepted = []
+            acceptor = threading.Thread(target=lambda: accepted.extend(listener.accept() for _ in self._processes),
+                                        daemon=True)
+            acceptor.start()
+            acceptor.join(timeout)
+        if len(accepted) < self.workers:
+            for process in self._processes:
+                process.kill()
+                process.wait()
+            for conn in accepted:
+                conn.close()
+            self._processes = []
+            raise RuntimeError(f"Only {len(accepted)} of {self.workers} bench workers started")
+        # Workers connect in any order; the first thing each one sends is its pid
+        pids = {conn.recv(): conn for conn in accepted}
+        self._connections = [pids[process.pid] for process in self._processes]
+        for conn in self._connections:
+            conn.send(("init", self.sample_rate, self.realtime, self.steps))
+        self._load = [0] * self.workers
+
+    def _send(self, worker, message):
+        try:
+            self._connections[worker].send(message)
+        except OSError:
+            # A dead worker; ``_collect`` reports it for its benches
+            pass
+
+    def _collect(self):
+        """Record errors reported by the workers and benches orphaned by a dead one."""
+        for conn in wait(self._connections, timeout=0):
+            try:
+                while conn.poll():
+                    _, bench_id, error = conn.recv()
+                    if bench_id in self.benches:
+                        self.errors[bench_id] = error
+            except (EOFError, OSError):
+                pass
+        for worker, process in enumerate(self._processes):
+            code = process.poll()
+            if code is None:
+                continue
+            for bench_id, bench in self.benches.items():
+                if bench["worker"] == worker:
+                    self.errors.setdefault(bench_id, f"Bench worker {worker} exited with code {code}")
+
+    def _remove(self, bench_id):
+        bench = self.benches.pop(bench_id)
+        self.errors.pop(bench_id, None)
+        self._load[bench["worker"]] -= len(bench["keys"])
+        self._send(bench["worker"], ("remove", bench_id))
+        # The worker unmaps its side once it handles "remove"; the segment goes with the last mapping
+        bench["block"].close()
+        bench["block"].shm.unlink()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+"""Columnar cell store shared by both dashboards.
+
+Every cell field lives in its own preallocated NumPy array, so bench-wide
+aggregates are single vectorized reductions instead of Python lists rebuilt
+from a dict of dicts on every rerun.
+"""
+import numpy as np
+
+from bms.aggregates import TRACKED, Aggregates
+from bms.chemistry import CELL_SPECS, CELL_TYPES, soc_from_ocv
+from bms.registry import INDEXED, CellRegistry
+
+# Operating states, in status-code order
+STATUSES = ("Idle", "Charging", "Discharging")
+
+# One array per field; the dtype fixes the number of bytes stored per cell
+FIELDS = {
+    # Stable identity, see bms.registry
+    "cell_id": np.int64,
+    "group": np.int32,
+    "voltage": np.float64,
+    "current": np.float64,
+    "temp": np.float64,
+    "capacity": np.float64,
+    "health": np.float64,
+    "cycles": np.int32,
+    "min_voltage": np.float64,
+    "max_voltage": np.float64,
+    "type_code": np.int8,
+    "status_code": np.int8,
+    "alarms": np.uint32,
+    # Simulation state, see bms.engine
+    "soc": np.float64,
+    "v_rc": np.float64,
+    "task_id": np.int32,
+    "phase": np.int8,
+    "active": np.bool_,
+    "cc_value": np.float64,
+    "cv_voltage": np.float64,
+    "i_limit": np.float64,
+    "v_cutoff": np.float64,
+    "ah_limit": np.float64,
+    "duration": np.float64,
+    "elapsed": np.float64,
+    "ah_throughput": np.float64,
+    # Position in a multi-step profile, see bms.scheduler
+    "profile_step": np.int32,
+    # State of charge and health estimates, see bms.estimation
+    "soc_est": np.float64,
+    "soc_std": np.float64,
+    "soh_est": np.float64,
+    "soh_std": np.float64,
+}
+
+
+def _column(name):
+    """Property exposing the live ``[:len(store)]`` view of one field.
+
+    Views of aggregated and indexed fields are read-only so every change
+    goes through ``CellStore.write`` (assigning the property does that too).
+    """
+    def getter(self):
+        view = self._data[name][:self._size]
+        if name in TRACKED or name in INDEXED:
+            view.flags.writeable = False
+        return view
+
+    def setter(self, values):
+        self.write(name, values)
+
+    return property(getter, setter)
+
+
+class CellStore:
+    """Struct-of-arrays storage for every cell on a bench.
+
+    Cells are addressed by their display key (``cell_1_lfp``), by their
+    stable ``cell_id`` or by their row index. Field properties return views
+    of the first ``len(store)`` rows without copying. Fields covered by
+    ``stats`` (an ``Aggregates``) or by the secondary indexes of
+    ``registry`` (a ``CellRegistry``) are read-only views and are changed
+    with ``write`` or by assigning the whole property, which keeps both
+    current. Removing a cell moves the last row into its place, so row order
+    is not insertion order; ``version`` changes whenever cells are added or
+    removed, so consumers keyed by row can tell when to re-map.
+    """
+
+    cell_id = _column("cell_id")
+    group = _column("group")
+    voltage = _column("voltage")
+    current = _column("current")
+    temp = _column("temp")
+    capacity = _column("capacity")
+    health = _column("health")
+    cycles = _column("cycles")
+    min_voltage = _column("min_voltage")
+    max_voltage = _column("max_voltage")
+    type_code = _column("type_code")
+    status_code = _column("status_code")
+    alarms = _column("alarms")
+    soc = _column("soc")
+    v_rc = _column("v_rc")
+    task_id = _column("task_id")
+    phase = _column("phase")
+    active = _column("active")
+    cc_value = _column("cc_value")
+    cv_voltage = _column("cv_voltage")
+    i_limit = _column("i_limit")
+    v_cutoff = _column("v_cutoff")
+    ah_limit = _column("ah_limit")
+    duration = _column("duration")
+    elapsed = _column("elapsed")
+    ah_throughput = _column("ah_throughput")
+    profile_step = _column("profile_step")
+    soc_est = _column("soc_est")
+    soc_std = _column("soc_std")
+    soh_est = _column("soh_est")
+    soh_std = _column("soh_std")
+
+    def __init__(self, capacity=16):
+        self._size = 0
+        self.version = 0
+        self._data = {name: np.zeros(max(capacity, 1), dtype) for name, dtype in FIELDS.items()}
+        self.registry = CellRegistry(capacity)
+        self.stats = Aggregates(self)
+
+    @classmethod
+    def from_columns(cls, keys, columns):
+        """Store of ``keys`` whose fields are copied from ``columns`` (name -> array)."""
+        store = cls(capacity=len(keys))
+        for name, array in store._data.items():
+            array[:len(keys)] = columns[name]
+        store._size = len(keys)
+        store.registry = CellRegistry.rebuild(keys, store.cell_id, store._data)
+        store.version += 1
+        store.stats.refresh()
+        return store
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, key):
+        return key in self.registry.rows
+
+    @property
+    def keys(self):
+        return list(self.registry.keys)
+
+    @property
+    def next_id(self):
+        """Id the next added cell will get; ids are never reused."""
+        return self.registry.next_id
+
+    @property
+    def types(self):
+        """Chemistry name of every cell, decoded from ``type_code``."""
+        return np.asarray(CELL_TYPES)[self.type_code]
+
+    @property
+    def statuses(self):
+        """Operating state of every cell, decoded from ``status_code``."""
+        return np.asarray(STATUSES)[self.status_code]
+
+    @property
+    def nbytes_per_cell(self):
+        return sum(np.dtype(dtype).itemsize for dtype in FIELDS.values())
+
+    def index(self, key):
+        return self.registry.rows[key]
+
+    def index_of_id(self, cell_id):
+        return self.registry.id_rows[cell_id]
+
+    def rows_where(self, name, *values):
+        """Sorted rows whose indexed field ``name`` holds any of ``values``."""
+        return self.registry.indexes[name].rows(*values)
+
+    def counts(self, name):
+        """Number of cells per value of the indexed field ``name``."""
+        return self.registry.indexes[name].counts()
+
+    def add(self, key, cell_type, **values):
+        """Append one cell and return its row index.
+
+        The cell gets the next stable id unless ``cell_id`` is given.
+        """
+        if key in self.registry.rows:
+            raise KeyError(f"Cell {key!r} already exists")
+        cell_id = values.pop("cell_id", self.registry.next_id)
+        if cell_id in self.registry.id_rows:
+            raise KeyError(f"Cell id {cell_id} already exists")
+        if self._size == len(self._data["voltage"]):
+            self._grow(2 * self._size)
+
+        i = self._size
+        spec = CELL_SPECS[cell_type]
+        row = {
+            "voltage": spec["voltage"],
+            "capacity": spec["capacity"],
+            "min_voltage": spec["min_v"],
+            "max_voltage": spec["max_v"],
+            "health": 100.0,
+        }
+        row.update(values)
+        row["cell_id"] = cell_id
+        row["type_code"] = CELL_TYPES.index(cell_type)
+        if "soc" not in row:
+            row["soc"] = soc_from_ocv(row["type_code"], row["voltage"]).item()
+        row.setdefault("soc_est", row["soc"])
+        row.setdefault("soh_est", row["health"])
+        if "status" in row:
+            row["status_code"] = STATUSES.index(row.pop("status"))
+
+        for name, array in self._data.items():
+            array[i] = row.get(name, 0)
+        self.registry.add(key, cell_id, i, {name: self._data[name][i].item() for name in INDEXED})
+        self._size += 1
+        self.version += 1
+        self.stats.on_add(i)
+        return i
+
+    def remove(self, key):
+        """Delete one cell in O(1) by moving the last row into its place."""
+        i = self.registry.rows[key]
+        last = self._size - 1
+        self.stats.on_remove(i)
+        values = {name: self._data[name][i].item() for name in INDEXED}
+        last_values = {name: self._data[name][last].item() for name in INDEXED}
+        ids = self._data["cell_id"]
+        self.registry.remove(i, ids[i].item(), values, ids[last].item(), last_values)
+        for array in self._data.values():
+            array[i] = array[last]
+        self._size -= 1
+        self.version += 1
+        return i
+
+    def clear(self):
+        """Remove every cell; ids keep counting from where they were."""
+        next_id = self.registry.next_id
+        self._size = 0
+        self.registry = CellRegistry(len(self._data["voltage"]))
+        self.registry.next_id = next_id
+        self.version += 1
+        self.stats.refresh()
+
+    def copy(self):
+        """Independent copy trimmed to the current cells."""
+        other = CellStore(capacity=self._size)
+        for name, array in self._data.items():
+            other._data[name][:self._size] = array[:self._size]
+        other._size = self._size
+        other.registry = self.registry.copy()
+        other.version = self.version
+        other.stats = self.stats.copy(other)
+        return other
+
+    def write(self, name, values, index=slice(None)):
+        """Set ``name[index] = values`` and update the running aggregates."""
+        column = self._data[name][:self._size]
+        old = column[index].copy()
+        column[index] = values
+        self.stats.on_write(name, index, old, column[index])
+        if name in INDEXED:
+            rows = np.atleast_1d(np.arange(self._size)[index])
+            new = np.broadcast_to(column[index], rows.shape)
+            self.registry.indexes[name].change(rows, np.atleast_1d(old), new)
+
+    def row(self, key):
+        """Return one cell as a plain dict, for per-cell widgets."""
+        i = self.registry.rows[key]
+        cell = {name: self._data[name][i].item() for name in FIELDS}
+        cell["type"] = CELL_TYPES[cell["type_code"]]
+        cell["status"] = STATUSES[cell["status_code"]]
+        return cell
+
+    def _grow(self, capacity):
+        for name, array in self._data.items():
+            grown = np.zeros(max(capacity, 1), array.dtype)
+            grown[:self._size] = array[:self._size]
+            self._data[name] = grown
+        self.registry.grow(max(capacity, 1))
@@ -0,0 +1,221 @@
+"""Versioned binary checkpoints of a whole bench, for warm restarts.
+
+A checkpoint holds everything needed to resume an ``AcquisitionLoop`` where
+it stopped: every ``CellStore`` column (which carries each cell's task
+binding, phase and progress, see ``bms.engine``), the task records, the loop
+settings, and the state of every step or component exposing ``get_state``
+and ``set_state`` (noise generators, aging, SOC estimation). The rolling
+history buffer is not saved; stored telemetry covers that. A file is::
+
+    b"BMSCKPT\\0"     magic
+    u32              format version
+    u32              length of the JSON header
+    header           metadata plus dtype, shape and offset of every array
+    arrays           raw, each aligned to 8 bytes
+    u32              CRC-32 of everything above
+
+Writes go to a temporary file next to the target, are fsynced and renamed
+over it, so a crash leaves the previous checkpoint or the new one, never a
+torn file. Reading is a single ``read`` and one ``frombuffer`` per array.
+"""
+import glob
+import json
+import os
+import struct
+import tempfile
+import time
+import zlib
+
+import numpy as np
+
+from bms.cell_store import FIELDS, CellStore
+from bms.telemetry import partition_path
+
+DEFAULT_ROOT = os.environ.get("BMS_CHECKPOINT_DIR", "checkpoints")
+FILENAME = "checkpoint.bin"
+
+MAGIC = b"BMSCKPT\0"
+VERSION = 1
+_PREAMBLE = struct.Struct("<8sII")
+_CRC = struct.Struct("<I")
+
+
+class CheckpointError(ValueError):
+    """The file is not a readable checkpoint."""
+
+
+def checkpoint_path(root, bench_name, group_number):
+    return os.path.join(partition_path(root, bench_name, group_number), FILENAME)
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Cannot checkpoint {type(value).__name__}")
+
+
+def _stateful(loop):
+    """Name -> object of every step and component whose state is checkpointed."""
+    objects = dict(loop.components)
+    for i, step in enumerate(loop.steps):
+        if hasattr(step, "get_state") and not any(step is obj for obj in loop.components.values()):
+            objects[f"step_{i}"] = step
+    return objects
+
+
+def save(path, loop, **meta):
+    """Atomically write a checkpoint of ``loop`` to ``path``; ``meta`` is stored in the header."""
+    arrays = {}
+    with loop.lock:
+        store = loop.store
+        n = len(store)
+        for name in FIELDS:
+            arrays[f"store.{name}"] = store._data[name][:n]
+        states = {}
+        for name, obj in _stateful(loop).items():
+            state = {}
+            for key, value in obj.get_state().items():
+                if isinstance(value, np.ndarray):
+                    arrays[f"{name}.{key}"] = value
+                else:
+                    state[key] = value
+            states[name] = {"type": type(obj).__name__, "state": state}
+        header = {
+            "meta": dict(meta, time=time.time(), cells=n),
+            "keys": store.keys,
+            "next_id": store.next_id,
+            "tasks": loop.tasks,
+            "next_task_id": loop.next_task_id,
+            "sample_rate": loop.sample_rate,
+            "samples": loop.samples,
+            "states": states,
+            "arrays": {},
+        }
+        offset = 0
+        for name, array in arrays.items():
+            header["arrays"][name] = [array.dtype.str, list(array.shape), offset]
+            offset += -(-array.nbytes // 8) * 8
+        encoded = json.dumps(header, default=_json_default).encode()
+        start = -(-(_PREAMBLE.size + len(encoded)) // 8) * 8
+
+        buf = bytearray(start + offset + _CRC.size)
+        _PREAMBLE.pack_into(buf, 0, MAGIC, VERSION, len(encoded))
+        buf[_PREAMBLE.size:_PREAMBLE.size + len(encoded)] = encoded
+        for name, array in arrays.items():
+            at = start + header["arrays"][name][2]
+            buf[at:at + array.nbytes] = np.ascontiguousarray(array).tobytes()
+
+    _CRC.pack_into(buf, len(buf) - _CRC.size, zlib.crc32(memoryview(buf)[:-_CRC.size]))
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=".checkpoint-", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(buf)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return path
+
+
+class Checkpoint:
+    """Header and arrays of a checkpoint file."""
+
+    def __init__(self, header, arrays):
+        self.header = header
+        self.arrays = arrays
+
+    @property
+    def meta(self):
+        return self.header["meta"]
+
+    def store(self):
+        """``CellStore`` of the checkpointed cells; fields newer than the file start at zero."""
+        keys = self.header["keys"]
+        columns = {name: self.arrays.get(f"store.{name}", np.zeros(len(keys), dtype))
+                   for name, dtype in FIELDS.items()}
+        store = CellStore.from_columns(keys, columns)
+        store.registry.next_id = max(store.registry.next_id, self.header["next_id"])
+        return store
+
+    def state(self, name):
+        """``(type name, state dict)`` saved for one step or component, or ``None``."""
+        saved = self.header["states"].get(name)
+        if saved is None:
+            return None
+        state = dict(saved["state"])
+        prefix = f"{name}."
+        for key, array in self.arrays.items():
+            if key.startswith(prefix):
+                state[key[len(prefix):]] = array
+        return saved["type"], state
+
+
+def load(path):
+    """Read and verify a checkpoint; raises ``CheckpointError`` if it is damaged or too new."""
+    with open(path, "rb") as f:
+        buf = f.read()
+    if len(buf) < _PREAMBLE.size + _CRC.size:
+        raise CheckpointError(f"{path} is truncated")
+    magic, version, length = _PREAMBLE.unpack_from(buf)
+    if magic != MAGIC:
+        raise CheckpointError(f"{path} is not a checkpoint")
+    if version > VERSION:
+        raise CheckpointError(f"{path} has format version {version}, newer than {VERSION}")
+    (crc,) = _CRC.unpack_from(buf, len(buf) - _CRC.size)
+    if zlib.crc32(memoryview(buf)[:-_CRC.size]) != crc:
+        raise CheckpointError(f"{path} is corrupt")
+
+    header = json.loads(buf[_PREAMBLE.size:_PREAMBLE.size + length])
+    start = -(-(_PREAMBLE.size + length) // 8) * 8
+    arrays = {}
+    for name, (dtype, shape, offset) in header["arrays"].items():
+        dtype = np.dtype(dtype)
+        count = int(np.prod(shape))
+        array = np.frombuffer(buf, dtype, count, start + offset).reshape(shape)
+        arrays[name] = array.astype(dtype.newbyteorder("="), copy=True)
+    return Checkpoint(header, arrays)
+
+
+def restore(loop, checkpoint):
+    """Put ``loop`` back in the checkpointed state; steps are matched by position and type."""
+    store = checkpoint.store()
+    with loop.lock:
+        loop.replace_store(store)
+        loop.tasks = checkpoint.header["tasks"]
+        loop.next_task_id = checkpoint.header["next_task_id"]
+        loop.sample_rate = checkpoint.header["sample_rate"]
+        loop.samples = checkpoint.header["samples"]
+        for name, obj in _stateful(loop).items():
+            saved = checkpoint.state(name)
+            if saved is not None and saved[0] == type(obj).__name__:
+                obj.set_state(saved[1], store)
+    return loop
+
+
+def read_meta(path):
+    """Header ``meta`` of a checkpoint, without reading its arrays."""
+    with open(path, "rb") as f:
+        preamble = f.read(_PREAMBLE.size)
+        if len(preamble) < _PREAMBLE.size:
+            raise CheckpointError(f"{path} is truncated")
+        magic, version, length = _PREAMBLE.unpack(preamble)
+        if magic != MAGIC or version > VERSION:
+            raise CheckpointError(f"{path} is not a readable checkpoint")
+        return json.loads(f.read(length))["meta"]
+
+
+def latest(root=DEFAULT_ROOT):
+    """``meta`` of the most recently written checkpoint of a bench with cells, or ``None``."""
+    paths = glob.glob(os.path.join(root, "*", "group_*", FILENAME))
+    for path in sorted(paths, key=os.path.getmtime, reverse=True):
+        try:
+            meta = read_meta(path)
+        except (OSError, ValueError):
+            continue
+        if meta.get("cells"):
+            return meta
+    return None
@@ -0,0 +1,107 @@
+"""Per-chemistry specifications and equivalent-circuit model parameters.
+
+Each chemistry is modelled as an OCV(SOC) source in series with an ohmic
+resistance ``r0`` and one RC pair (``r1``, time constant ``tau``) that gives
+the relaxation seen during rest. Parameters are compiled into arrays indexed
+by type code so the model can be evaluated for a mixed bench in one pass;
+the capacity-fade parameters used by ``bms.aging`` and the thermal
+parameters used by ``bms.thermal`` are compiled the same way.
+"""
+import numpy as np
+
+# Chemistries known to the dashboards, in type-code order
+CELL_TYPES = ("lfp", "li-ion", "nmc", "lto")
+
+# Cell specifications based on type
+CELL_SPECS = {
+    "lfp": {"voltage": 3.2, "min_v": 2.8, "max_v": 3.6, "capacity": 100},
+    "li-ion": {"voltage": 3.7, "min_v": 3.2, "max_v": 4.2, "capacity": 120},
+    "nmc": {"voltage": 3.6, "min_v": 3.0, "max_v": 4.0, "capacity": 110},
+    "lto": {"voltage": 2.4, "min_v": 1.5, "max_v": 2.8, "capacity": 80},
+}
+
+# Open-circuit voltage sampled at SOC = 0%, 10%, ..., 100%
+OCV_CURVES = {
+    "lfp": [2.80, 3.15, 3.22, 3.25, 3.27, 3.29, 3.30, 3.31, 3.33, 3.37, 3.60],
+    "li-ion": [3.20, 3.45, 3.55, 3.62, 3.67, 3.72, 3.78, 3.86, 3.95, 4.06, 4.20],
+    "nmc": [3.00, 3.30, 3.42, 3.50, 3.56, 3.61, 3.67, 3.75, 3.83, 3.91, 4.00],
+    "lto": [1.50, 2.10, 2.20, 2.25, 2.29, 2.32, 2.35, 2.39, 2.45, 2.56, 2.80],
+}
+
+# Ohmic resistance and RC pair (ohm, ohm, seconds)
+ECM_PARAMS = {
+    "lfp": {"r0": 0.0015, "r1": 0.0010, "tau": 40.0},
+    "li-ion": {"r0": 0.0020, "r1": 0.0015, "tau": 30.0},
+    "nmc": {"r0": 0.0018, "r1": 0.0012, "tau": 35.0},
+    "lto": {"r0": 0.0010, "r1": 0.0006, "tau": 20.0},
+}
+
+# Capacity fade, see bms.aging: calendar fade ``k_cal`` (% per sqrt(day)) at 25 °C and
+# 50% SOC, full cycles ``n100`` to the end-of-life fade with Wöhler exponent ``beta``
+# for partial depths, and the Arrhenius activation energy ``ea`` (J/mol)
+AGING_PARAMS = {
+    "lfp": {"k_cal": 0.25, "n100": 3000, "beta": 1.3, "ea": 30000.0},
+    "li-ion": {"k_cal": 0.45, "n100": 800, "beta": 1.5, "ea": 40000.0},
+    "nmc": {"k_cal": 0.40, "n100": 1500, "beta": 1.5, "ea": 35000.0},
+    "lto": {"k_cal": 0.10, "n100": 10000, "beta": 1.1, "ea": 25000.0},
+}
+
+# Lumped thermal mass ``heat_capacity`` (J/K), thermal runaway ``onset`` temperature (°C)
+# and ``runaway_heat`` (J) released by a fully charged cell once it goes
+THERMAL_PARAMS = {
+    "lfp": {"heat_capacity": 2200.0, "onset": 210.0, "runaway_heat": 1.2e6},
+    "li-ion": {"heat_capacity": 2400.0, "onset": 150.0, "runaway_heat": 2.6e6},
+    "nmc": {"heat_capacity": 2300.0, "onset": 170.0, "runaway_heat": 2.2e6},
+    "lto": {"heat_capacity": 1900.0, "onset": 250.0, "runaway_heat": 0.6e6},
+}
+
+SOC_POINTS = len(OCV_CURVES["lfp"]) - 1
+SOC_GRID = np.linspace(0.0, 1.0, SOC_POINTS + 1)
+
+# Model tables indexed by type code
+OCV_TABLE = np.array([OCV_CURVES[t] for t in CELL_TYPES], dtype=np.float64)
+R0 = np.array([ECM_PARAMS[t]["r0"] for t in CELL_TYPES])
+R1 = np.array([ECM_PARAMS[t]["r1"] for t in CELL_TYPES])
+TAU = np.array([ECM_PARAMS[t]["tau"] for t in CELL_TYPES])
+CAPACITY_AH = np.array([CELL_SPECS[t]["capacity"] for t in CELL_TYPES], dtype=np.float64)
+K_CAL = np.array([AGING_PARAMS[t]["k_cal"] for t in CELL_TYPES])
+N100 = np.array([AGING_PARAMS[t]["n100"] for t in CELL_TYPES], dtype=np.float64)
+BETA = np.array([AGING_PARAMS[t]["beta"] for t in CELL_TYPES])
+EA = np.array([AGING_PARAMS[t]["ea"] for t in CELL_TYPES])
+HEAT_CAPACITY = np.array([THERMAL_PARAMS[t]["heat_capacity"] for t in CELL_TYPES])
+ONSET = np.array([THERMAL_PARAMS[t]["onset"] for t in CELL_TYPES])
+RUNAWAY_HEAT = np.array([THERMAL_PARAMS[t]["runaway_heat"] for t in CELL_TYPES])
+
+_OCV_FLAT = OCV_TABLE.ravel()
+
+
+def _segment(type_code, soc):
+    x = np.clip(soc, 0.0, 1.0) * SOC_POINTS
+    lo = np.minimum(x.astype(np.intp), SOC_POINTS - 1)
+    base = np.asarray(type_code, dtype=np.intp) * (SOC_POINTS + 1) + lo
+    return base, x - lo
+
+
+def ocv(type_code, soc):
+    """Open-circuit voltage for every cell, linearly interpolated."""
+    base, frac = _segment(type_code, soc)
+    lo = _OCV_FLAT[base]
+    return lo + (_OCV_FLAT[base + 1] - lo) * frac
+
+
+def docv_dsoc(type_code, soc):
+    """Slope of the OCV curve (V per unit SOC) at every cell's SOC."""
+    base, _ = _segment(type_code, soc)
+    return (_OCV_FLAT[base + 1] - _OCV_FLAT[base]) * SOC_POINTS
+
+
+def soc_from_ocv(type_code, voltage):
+    """Invert the OCV curve; used to seed SOC from a resting voltage."""
+    type_code = np.asarray(type_code)
+    voltage = np.asarray(voltage, dtype=np.float64)
+    soc = np.empty(np.broadcast(type_code, voltage).shape)
+    type_code, voltage = np.broadcast_arrays(type_code, voltage)
+    for code, curve in enumerate(OCV_TABLE):
+        mask = type_code == code
+        soc[mask] = np.interp(voltage[mask], curve, SOC_GRID)
+    return soc
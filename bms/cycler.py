@@ -0,0 +1,160 @@
+"""Loopback stand-in for a battery cycler, backed by the simulation model.
+
+``SimulatedCycler`` serves the ``bms.scpi`` protocol over TCP from a
+``CellStore`` that it steps with ``bms.engine`` on its own clock, one cell per
+channel. It lets the drivers in ``bms.drivers`` be exercised for latency and
+throughput without hardware::
+
+    python -m bms.cycler --channels 256 --port 5025
+"""
+import argparse
+import asyncio
+import time
+
+import numpy as np
+
+from bms import CELL_SPECS, CellStore, engine, scpi
+from bms.rules import DEFAULT_RULESET
+
+
+class SimulatedCycler:
+    """Asyncio TCP server exposing every cell of ``store`` as a channel.
+
+    ``latency`` delays every reply, to emulate a slow instrument.
+    """
+
+    def __init__(self, store, host="127.0.0.1", port=0, sample_rate=10.0,
+                 steps=(engine.step, DEFAULT_RULESET), latency=0.0):
+        self.store = store
+        self.host = host
+        self.port = port
+        self.sample_rate = sample_rate
+        self.steps = tuple(steps)
+        self.latency = latency
+        self.requests = 0
+        self._next_task_id = 1
+        self._server = None
+        self._ticker = None
+        self._clients = set()
+
+    @property
+    def address(self):
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._serve, self.host, self.port)
+        self._ticker = asyncio.create_task(self._tick())
+        return self.address
+
+    async def stop(self):
+        self._ticker.cancel()
+        self._server.close()
+        for client in list(self._clients):
+            client.cancel()
+        await asyncio.gather(*self._clients, return_exceptions=True)
+        await self._server.wait_closed()
+
+    async def serve_forever(self):
+        await self.start()
+        try:
+            await self._server.serve_forever()
+        finally:
+            self._ticker.cancel()
+
+    def execute(self, line):
+        """Reply to one command line."""
+        try:
+            return self._dispatch(*scpi.split_command(line))
+        except (scpi.ProtocolError, ValueError, KeyError, IndexError) as e:
+            return f"ERR {e}"
+
+    def _dispatch(self, header, arguments):
+        store = self.store
+        if header == "*IDN?":
+            return "BMS,SimulatedCycler,0,1.0"
+        if header == "SYST:CHAN?":
+            return str(len(store))
+        if header == "MEAS:ALL?":
+            rows = self._rows(arguments)
+            return scpi.format_values(np.column_stack([getattr(store, name)[rows] for name in scpi.MEASUREMENTS]))
+        if header.startswith("MEAS:") and header.endswith("?"):
+            name = scpi.MEASUREMENT_HEADERS[header[len("MEAS:"):-1]]
+            return scpi.format_values(getattr(store, name)[self._rows(arguments)])
+        if header == "TASK:STAR":
+            task_type, params = scpi.parse_task(arguments)
+            rows = self._rows(arguments)
+            task_id = self._next_task_id
+            self._next_task_id += 1
+            engine.start_task(store, rows, task_id, engine.make_task(task_type, **params))
+            return str(task_id)
+        if header in ("TASK:PAUS", "TASK:RES"):
+            engine.set_active(store, int(arguments), header == "TASK:RES")
+            return "OK"
+        if header == "TASK:STOP":
+            engine.stop_task(store, int(arguments))
+            return "OK"
+        raise scpi.ProtocolError(f"Unknown command {header}")
+
+    def _rows(self, arguments):
+        channels = scpi.parse_channels(arguments)
+        if channels.size and (channels.min() < 1 or channels.max() > len(self.store)):
+            raise scpi.ProtocolError(f"Channels must be within 1:{len(self.store)}")
+        return channels - 1
+
+    async def _serve(self, reader, writer):
+        client = asyncio.current_task()
+        self._clients.add(client)
+        try:
+            while line := await reader.readline():
+                if self.latency:
+                    await asyncio.sleep(self.latency)
+                self.requests += 1
+                writer.write(self.execute(line.decode()).encode() + b"\n")
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            # Cancelled by stop(); the connection is simply dropped
+            pass
+        finally:
+            self._clients.discard(client)
+            writer.close()
+
+    async def _tick(self):
+        period = 1.0 / self.sample_rate
+        next_tick = time.monotonic()
+        while True:
+            next_tick += period
+            await asyncio.sleep(max(0.0, next_tick - time.monotonic()))
+            for step in self.steps:
+                step(self.store, period)
+
+
+def simulated_bench(channels, cell_type="lfp"):
+    """``CellStore`` of ``channels`` identical fresh cells."""
+    store = CellStore(capacity=channels)
+    spec = CELL_SPECS[cell_type]
+    for channel in range(1, channels + 1):
+        store.add(f"cell_{channel}_{cell_type}", cell_type, temp=25.0, voltage=spec["voltage"])
+    return store
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a simulated cycler on a local TCP port.")
+    parser.add_argument("--channels", type=int, default=64)
+    parser.add_argument("--chemistry", default="lfp", choices=sorted(CELL_SPECS))
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5025)
+    parser.add_argument("--sample-rate", type=float, default=10.0)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every reply")
+    args = parser.parse_args(argv)
+
+    cycler = SimulatedCycler(simulated_bench(args.channels, args.chemistry), args.host, args.port,
+                             args.sample_rate, latency=args.latency)
+    print(f"Simulated cycler with {args.channels} channels on {args.host}:{args.port}")
+    try:
+        asyncio.run(cycler.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
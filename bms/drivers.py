@@ -0,0 +1,269 @@
+"""Asyncio drivers for cycler channels.
+
+``ConnectionPool`` keeps a bounded set of TCP connections to one instrument,
+each carrying one request at a time, and drops connections that time out,
+fail or are cancelled mid-request; the timeout covers sending a request as
+well as waiting for its reply. ``CyclerDriver`` speaks ``bms.scpi`` over the
+pool and splits channel reads into batches that go out concurrently.
+``ChannelPoller`` polls a set of channels on an interval and applies
+per-channel backpressure: a channel whose subscriber queue is full is left
+out of the next request rather than buffering readings nobody consumes.
+``InstrumentSource`` runs a poller on a background event loop and is an
+``AcquisitionLoop`` step, so measured values can replace the simulated ones.
+"""
+import asyncio
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+import numpy as np
+
+from bms import scpi
+
+
+class InstrumentError(RuntimeError):
+    """The instrument answered a command with ``ERR``."""
+
+
+class Connection:
+    """One TCP connection; requests on it are serialized."""
+
+    def __init__(self, host, port, timeout=1.0):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._reader = None
+        self._writer = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def closed(self):
+        return self._writer is None or self._writer.is_closing()
+
+    async def open(self):
+        self._reader, self._writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port), self.timeout
+        )
+        return self
+
+    async def query(self, command):
+        async with self._lock:
+            # A stalled instrument can block the write as well as the reply
+            line = await asyncio.wait_for(self._exchange(command), self.timeout)
+        if not line:
+            raise ConnectionError("Instrument closed the connection")
+        reply = line.decode().rstrip("\r\n")
+        if reply.startswith("ERR"):
+            raise InstrumentError(f"{command.split()[0]}: {reply[4:]}")
+        return reply
+
+    async def _exchange(self, command):
+        self._writer.write(command.encode() + b"\n")
+        await self._writer.drain()
+        return await self._reader.readline()
+
+    async def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except ConnectionError:
+                pass
+            self._writer = None
+
+
+class ConnectionPool:
+    """At most ``size`` connections to one instrument, opened on demand."""
+
+    def __init__(self, host, port, size=4, timeout=1.0):
+        self.host = host
+        self.port = port
+        self.size = size
+        self.timeout = timeout
+        self._idle = []
+        self._slots = asyncio.Semaphore(size)
+        self.opened = 0
+
+    @asynccontextmanager
+    async def acquire(self):
+        async with self._slots:
+            connection = self._idle.pop() if self._idle else None
+            if connection is None or connection.closed:
+                connection = await Connection(self.host, self.port, self.timeout).open()
+                self.opened += 1
+            reusable = False
+            try:
+                yield connection
+                reusable = True
+            except InstrumentError:
+                # The instrument answered, so the link is still in step
+                reusable = True
+                raise
+            finally:
+                if reusable:
+                    self._idle.append(connection)
+                else:
+                    # A late or unparsed reply may still arrive, so the connection cannot be reused
+                    await connection.close()
+
+    async def query(self, command):
+        async with self.acquire() as connection:
+            return await connection.query(command)
+
+    async def close(self):
+        while self._idle:
+            await self._idle.pop().close()
+
+
+class CyclerDriver:
+    """Channel-level operations on a cycler reached through ``pool``."""
+
+    def __init__(self, pool, batch_size=64):
+        self.pool = pool
+        self.batch_size = batch_size
+
+    async def identify(self):
+        return await self.pool.query("*IDN?")
+
+    async def channel_count(self):
+        return int(await self.pool.query("SYST:CHAN?"))
+
+    async def measure(self, channels):
+        """``(len(channels), 4)`` array of voltage, current, temp and soc.
+
+        Channels are read in batches of ``batch_size`` sent concurrently over
+        the pool; a channel listed more than once is read once.
+        """
+        channels, rows = np.unique(np.asarray(channels, dtype=np.intp), return_inverse=True)
+        batches = [channels[i:i + self.batch_size] for i in range(0, len(channels), self.batch_size)]
+        replies = await asyncio.gather(*(
+            self.pool.query(f"MEAS:ALL? {scpi.format_channels(batch)}") for batch in batches
+        ))
+        readings = np.empty((len(channels), len(scpi.MEASUREMENTS)))
+        if replies:
+            readings[:] = np.concatenate([scpi.parse_values(r, len(scpi.MEASUREMENTS)) for r in replies])
+        return readings[rows.reshape(-1)]
+
+    async def start_task(self, channels, task):
+        params = {k: v for k, v in task.items() if k not in ("task_type", "cells") and isinstance(v, (int, float))}
+        return int(await self.pool.query(scpi.format_task(task["task_type"], params, channels)))
+
+    async def pause_task(self, task_id):
+        await self.pool.query(f"TASK:PAUS {task_id}")
+
+    async def resume_task(self, task_id):
+        await self.pool.query(f"TASK:RES {task_id}")
+
+    async def stop_task(self, task_id):
+        await self.pool.query(f"TASK:STOP {task_id}")
+
+
+class ChannelPoller:
+    """Polls ``channels`` every ``interval`` seconds into ``latest``.
+
+    ``subscribe(channel)`` returns a bounded queue of ``(time, reading)``;
+    while it is full that channel is not polled. Request latencies of the
+    last ``window`` polls are kept in ``latencies``.
+    """
+
+    def __init__(self, driver, channels, interval=0.1, depth=8, window=1000):
+        self.driver = driver
+        self.channels = np.asarray(channels, dtype=np.intp)
+        self.interval = interval
+        self.depth = depth
+        self.latest = np.full((len(self.channels), len(scpi.MEASUREMENTS)), np.nan)
+        self.latest_time = np.full(len(self.channels), np.nan)
+        self.latencies = deque(maxlen=window)
+        self.polls = 0
+        self.errors = 0
+        self.skipped = 0
+        self._queues = {}
+
+    def subscribe(self, channel):
+        return self._queues.setdefault(int(channel), asyncio.Queue(self.depth))
+
+    async def poll_once(self):
+        ready = np.array([c not in self._queues or not self._queues[c].full() for c in self.channels.tolist()],
+                         dtype=bool)
+        self.skipped += int(np.count_nonzero(~ready))
+        channels = self.channels[ready]
+        if not channels.size:
+            return
+        started = time.perf_counter()
+        readings = await self.driver.measure(channels)
+        self.latencies.append(time.perf_counter() - started)
+        t = time.time()
+        self.latest[ready] = readings
+        self.latest_time[ready] = t
+        self.polls += 1
+        for channel, reading in zip(channels.tolist(), readings):
+            if channel in self._queues:
+                self._queues[channel].put_nowait((t, reading))
+
+    async def run(self):
+        next_poll = time.monotonic()
+        while True:
+            try:
+                await self.poll_once()
+            except (asyncio.TimeoutError, ConnectionError, OSError, InstrumentError, scpi.ProtocolError):
+                self.errors += 1
+            next_poll += self.interval
+            await asyncio.sleep(max(0.0, next_poll - time.monotonic()))
+            if time.monotonic() - next_poll > 1.0:
+                next_poll = time.monotonic()
+
+
+class InstrumentSource:
+    """Acquisition step feeding measured channels into the store's rows.
+
+    Row ``i`` of the store takes the readings of ``channels[i]``. The poller
+    runs on its own event loop thread, so ``__call__`` only copies the latest
+    readings.
+    """
+
+    def __init__(self, host, port, channels, interval=0.1, pool_size=4, timeout=1.0, batch_size=64):
+        self.host = host
+        self.port = port
+        self.channels = list(channels)
+        self.interval = interval
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.batch_size = batch_size
+        self.poller = None
+        self._loop = None
+        self._thread = None
+
+    def start(self):
+        ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(ready,), name="bms-instrument", daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self
+
+    def stop(self, timeout=1.0):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._task.cancel)
+            self._thread.join(timeout)
+            self._loop = None
+
+    def __call__(self, store, dt=None):
+        latest = self.poller.latest.copy()
+        n = min(len(store), len(latest))
+        seen = ~np.isnan(latest[:n, 0])
+        for k, name in enumerate(scpi.MEASUREMENTS):
+            store.write(name, latest[:n, k][seen], np.flatnonzero(seen))
+
+    def _run(self, ready):
+        loop = self._loop = asyncio.new_event_loop()
+        pool = ConnectionPool(self.host, self.port, self.pool_size, self.timeout)
+        self.poller = ChannelPoller(CyclerDriver(pool, self.batch_size), self.channels, self.interval)
+        self._task = loop.create_task(self.poller.run())
+        ready.set()
+        try:
+            loop.run_until_complete(self._task)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            loop.run_until_complete(pool.close())
+            loop.close()
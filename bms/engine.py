@@ -0,0 +1,201 @@
+"""Vectorized execution of CC_CV, CC_CD and IDLE tasks.
+
+Task setpoints are copied onto every assigned cell of a ``CellStore`` and
+``step`` then advances all running cells in one batched time step against
+the equivalent-circuit model in ``bms.chemistry``:
+
+* CC    - charge at ``cc_value`` until the terminal voltage reaches ``cv_voltage``
+* CV    - hold ``cv_voltage`` while the current tapers down to ``i_limit``
+* CD    - discharge at ``cc_value`` until the terminal voltage falls to ``v_cutoff``
+* IDLE  - zero current, the RC branch relaxes towards the open-circuit voltage
+
+Any phase also ends once its task ``duration`` elapses, when set the
+``ah_limit`` capacity has been moved, or the cell is completely full or
+empty. Positive current charges the cell. A cell that is not running a task
+rests: ``step`` keeps its ``current`` at zero and lets its RC branch relax,
+so steps that read the store later in the tick (``bms.thermal``,
+``bms.estimation``) see only currents the model actually integrated.
+"""
+import numpy as np
+
+from bms.chemistry import CAPACITY_AH, R0, R1, TAU, ocv
+
+TASK_TYPES = ("CC_CV", "IDLE", "CC_CD")
+
+# Setpoints of each task type and their defaults (the task form's initial values)
+TASK_DEFAULTS = {
+    "CC_CV": {"cc_value": 2.0, "cv_voltage": 4.0, "current": 1.0, "capacity": 10.0, "duration": 3600},
+    "IDLE": {"duration": 1800},
+    "CC_CD": {"cc_value": 2.0, "voltage": 2.8, "capacity": 10.0, "duration": 3600},
+}
+
+# Per-cell phase codes; the running phases are contiguous
+PHASE_NONE, PHASE_CC, PHASE_CV, PHASE_CD, PHASE_IDLE, PHASE_DONE = range(6)
+
+# Operating status shown for each phase (indexes into bms.cell_store.STATUSES)
+_PHASE_STATUS = np.array([0, 1, 1, 2, 0, 0], dtype=np.int8)
+
+
+def task_id_from_key(task_key):
+    return int(task_key.rsplit("_", 1)[1])
+
+
+def make_task(task_type, cells=(), **params):
+    """A ``tasks_data``-style task dict with unset setpoints defaulted."""
+    if task_type not in TASK_TYPES:
+        raise ValueError(f"Unknown task type {task_type!r}")
+    unknown = set(params) - set(TASK_DEFAULTS[task_type])
+    if unknown:
+        raise ValueError(f"{task_type} takes no {', '.join(sorted(unknown))}")
+    task = {"task_type": task_type, **TASK_DEFAULTS[task_type], **params}
+    task["cells"] = list(cells)
+    return task
+
+
+def start_task(store, indices, task_id, task):
+    """Bind ``task`` (a ``tasks_data`` entry) to the cells at ``indices``."""
+    indices = np.asarray(indices, dtype=np.intp)
+    task_type = task["task_type"]
+    if task_type not in TASK_TYPES:
+        raise ValueError(f"Unknown task type {task_type!r}")
+
+    store.task_id[indices] = task_id
+    store.phase[indices] = {"CC_CV": PHASE_CC, "IDLE": PHASE_IDLE, "CC_CD": PHASE_CD}[task_type]
+    store.active[indices] = True
+    store.cc_value[indices] = abs(task.get("cc_value", 0.0))
+    store.cv_voltage[indices] = task.get("cv_voltage", 0.0)
+    store.i_limit[indices] = abs(task.get("current", 0.0))
+    store.v_cutoff[indices] = task.get("voltage", 0.0)
+    store.ah_limit[indices] = task.get("capacity", 0.0)
+    store.duration[indices] = task["duration"]
+    store.elapsed[indices] = 0.0
+    store.ah_throughput[indices] = 0.0
+
+
+def set_active(store, task_id, active):
+    """Pause (``active=False``) or resume every cell bound to ``task_id``."""
+    cells = store.task_id == task_id
+    store.active[cells] = active
+    if not active:
+        store.write("current", 0.0, cells)
+        store.write("status_code", 0, cells)
+
+
+def stop_task(store, task_id):
+    """Unbind ``task_id`` from its cells and leave them idle."""
+    _stop_cells(store, store.task_id == task_id)
+
+
+def stop_all(store):
+    """Emergency stop: unbind every task and zero every current."""
+    _stop_cells(store, slice(None))
+
+
+def _stop_cells(store, cells):
+    store.task_id[cells] = 0
+    store.phase[cells] = PHASE_NONE
+    store.active[cells] = False
+    store.write("current", 0.0, cells)
+    store.write("status_code", 0, cells)
+
+
+def sync_task_status(store, tasks):
+    """Mark ``Running`` records of ``tasks`` whose cells have all finished as ``Completed``."""
+    running = running_counts(store)
+    for task_key, task in tasks.items():
+        if task["status"] == "Running" and task_id_from_key(task_key) not in running:
+            task["status"] = "Completed"
+
+
+def running_counts(store):
+    """Map task id to the number of its cells still running."""
+    running = store.active & (store.phase >= PHASE_CC) & (store.phase <= PHASE_IDLE)
+    counts = np.bincount(store.task_id[running])
+    return {int(t): int(c) for t, c in enumerate(counts) if c}
+
+
+def rest_idle(store, run, dt):
+    """Let cells outside the ``run`` mask rest for ``dt`` seconds.
+
+    No current flows through them and their RC voltage relaxes; the terminal
+    voltage moves by the same amount, keeping any offset noise put on it.
+    """
+    idle = ~run & (store.current != 0.0)
+    if idle.any():
+        store.write("current", 0.0, idle)
+    idle = np.flatnonzero(~run & (store.v_rc != 0.0))
+    if idle.size:
+        v_rc = store.v_rc[idle]
+        relaxed = v_rc * np.exp(-dt / TAU[store.type_code[idle]])
+        relaxed[np.abs(relaxed) < 1e-6] = 0.0
+        store.v_rc[idle] = relaxed
+        store.write("voltage", store.voltage[idle] + relaxed - v_rc, idle)
+
+
+def step(store, dt):
+    """Advance every running cell by ``dt`` seconds.
+
+    Returns the row indices of cells whose phase finished during this step.
+    """
+    phase = store.phase
+    run = store.active & (phase >= PHASE_CC) & (phase <= PHASE_IDLE)
+    if not run.any():
+        rest_idle(store, run, dt)
+        return np.empty(0, dtype=np.intp)
+
+    tc = store.type_code
+    soc = store.soc
+    v_rc = store.v_rc
+    r0, r1 = R0[tc], R1[tc]
+    decay = np.exp(-dt / TAU[tc])
+    r1_gain = r1 * (1.0 - decay)
+    v_rest = ocv(tc, soc) + v_rc * decay
+
+    # CC hands over to CV as soon as the next step would exceed cv_voltage
+    cc = store.cc_value
+    to_cv = run & (phase == PHASE_CC) & (v_rest + cc * (r0 + r1_gain) >= store.cv_voltage)
+    phase[to_cv] = PHASE_CV
+
+    cv_current = np.clip((store.cv_voltage - v_rest) / (r0 + r1_gain), 0.0, cc)
+    current = np.select(
+        [phase == PHASE_CC, phase == PHASE_CV, phase == PHASE_CD],
+        [cc, cv_current, -cc],
+        default=0.0
+    )
+    current = np.where(run, current, 0.0)
+
+    capacity_ah = CAPACITY_AH[tc] * np.clip(store.health, 1.0, 100.0) / 100.0
+    new_soc = np.clip(soc + current * dt / (3600.0 * capacity_ah), 0.0, 1.0)
+    new_v_rc = v_rc * decay + r1_gain * current
+    voltage = ocv(tc, new_soc) + current * r0 + new_v_rc
+
+    # Resting cells carry no current, so their RC voltage simply relaxes
+    voltage = np.where(run, voltage, store.voltage + new_v_rc - v_rc)
+    store.current = current
+    store.soc = np.where(run, new_soc, soc)
+    store.v_rc = new_v_rc
+    store.voltage = voltage
+    store.elapsed[run] += dt
+    store.ah_throughput[run] += np.abs(current[run]) * dt / 3600.0
+
+    finished = run & (
+        (store.elapsed >= store.duration)
+        | ((store.ah_limit > 0) & (store.ah_throughput >= store.ah_limit))
+        | ((phase == PHASE_CV) & (current <= store.i_limit))
+        | ((phase == PHASE_CD) & ((voltage <= store.v_cutoff) | (new_soc <= 0.0)))
+        | (((phase == PHASE_CC) | (phase == PHASE_CV)) & (new_soc >= 1.0))
+    )
+    phase[finished] = PHASE_DONE
+    store.write("current", 0.0, finished)
+    store.write("voltage", voltage[finished] - current[finished] * r0[finished], finished)
+    store.write("status_code", _PHASE_STATUS[phase[run]], run)
+    return np.flatnonzero(finished)
+
+
+def advance(store, seconds, dt=0.1, max_steps=100):
+    """Advance by ``seconds`` of wall time, coarsening ``dt`` to bound the work."""
+    if seconds <= 0:
+        return np.empty(0, dtype=np.intp)
+    steps = int(min(np.ceil(seconds / dt), max_steps))
+    finished = [step(store, seconds / steps) for _ in range(steps)]
+    return np.unique(np.concatenate(finished))
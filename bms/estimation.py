@@ -0,0 +1,203 @@
+"""Batched Kalman filters estimating state of charge and state of health.
+
+The SOC filter is an extended Kalman filter tracking ``x = (soc, v_rc)`` of
+every cell over the equivalent-circuit model of ``bms.chemistry``, observing
+only what a cycler measures: terminal voltage and current. Each tick
+predicts with coulomb counting and the RC relaxation, then corrects with the
+voltage residual through the local slope of the OCV curve.
+
+The capacity used for coulomb counting is the estimate of a second, slow
+filter with one scalar state per cell, started from the cell's ``health``.
+Once a cell has carried no current for long enough that its RC branch has
+relaxed, its voltage gives an SOC reading through the OCV curve, and the
+last reading of a rest becomes the cell's anchor. When a later rest lies
+``soh_window`` SOC away from the anchor, the charge moved in between divided
+by that SOC difference is one measurement of the capacity; its variance
+follows from both readings and the current noise, so flat stretches of the
+OCV curve count for little. ``soh_est`` and ``soh_std`` report the result in
+percent of nameplate capacity, like ``health``.
+
+All cells are filtered together: SOC states are one ``(cells, 2)`` array and
+their covariances one ``(cells, 2, 2)`` array, the capacity filter one value
+per cell, so a tick is a fixed number of batched array operations and its
+cost is linear in the number of cells.
+"""
+import numpy as np
+
+from bms.chemistry import CAPACITY_AH, R0, R1, TAU, docv_dsoc, ocv, soc_from_ocv
+
+# Per-cell arrays of the capacity filter: the estimate (Ah) and its variance,
+# the SOC anchor of the last rest and its variance, the charge (Ah) moved
+# since then and its variance, whether the cell has an anchor yet, whether
+# it was taken during the rest the cell is in now, and the seconds spent
+# without current so far
+SOH_STATE = ("capacity", "capacity_var", "anchor", "anchor_var", "charge", "charge_var", "anchored", "settled",
+             "rest_time")
+
+# Capacity measurements further than this many standard deviations off are dropped
+GATE = 3.0
+
+
+class SocEstimator:
+    """Acquisition step ``(store, dt)`` writing ``soc_est``, ``soc_std``, ``soh_est`` and ``soh_std``.
+
+    ``voltage_noise`` and ``current_noise`` are the standard deviations of
+    the measurements (V, A); ``soc_noise`` and ``rc_noise`` the process noise
+    per sqrt(second), and ``soh_noise`` that of the capacity, as a fraction
+    of nameplate per sqrt(second). New cells start from the SOC their
+    voltage implies on the OCV curve, with ``initial_soc_std`` uncertainty,
+    and from their ``health`` with ``initial_soh_std``. A cell rests once
+    its current has stayed below ``rest_current`` for ``settle`` time
+    constants of its RC pair.
+    """
+
+    def __init__(self, voltage_noise=0.01, current_noise=0.05, soc_noise=1e-5, rc_noise=1e-4, initial_soc_std=0.1,
+                 soh_noise=1e-6, initial_soh_std=0.1, soh_window=0.2, rest_current=0.01, settle=5.0):
+        self.voltage_noise = voltage_noise
+        self.current_noise = current_noise
+        self.soc_noise = soc_noise
+        self.rc_noise = rc_noise
+        self.initial_soc_std = initial_soc_std
+        self.soh_noise = soh_noise
+        self.initial_soh_std = initial_soh_std
+        self.soh_window = soh_window
+        self.rest_current = rest_current
+        self.settle = settle
+        self.keys = []
+        self._layout = None
+        self._store_id = None
+        self.x = np.zeros((0, 2))
+        self.P = np.zeros((0, 2, 2))
+        for name in SOH_STATE:
+            setattr(self, name, np.zeros(0, dtype=bool if name in ("anchored", "settled") else np.float64))
+
+    def __call__(self, store, dt):
+        if self._layout != (id(store), store.version):
+            self._follow(store)
+        if not len(store):
+            return
+        x, P = self.x, self.P
+        tc = store.type_code
+        current = store.current
+        decay = np.exp(-dt / TAU[tc])
+        capacity_as = 3600.0 * self.capacity
+
+        # Predict: x' = F x + B i, with F = diag(1, decay)
+        x[:, 0] = np.clip(x[:, 0] + current * dt / capacity_as, 0.0, 1.0)
+        x[:, 1] = x[:, 1] * decay + R1[tc] * (1.0 - decay) * current
+        P[:, 0, 0] += (self.current_noise * dt / capacity_as) ** 2 + self.soc_noise ** 2 * dt
+        P[:, 0, 1] *= decay
+        P[:, 1, 0] *= decay
+        P[:, 1, 1] = P[:, 1, 1] * decay ** 2 + self.rc_noise ** 2 * dt
+
+        # Update with the terminal voltage, linearized as H = (dOCV/dSOC, 1)
+        H = np.column_stack([docv_dsoc(tc, x[:, 0]), np.ones(len(x))])
+        residual = store.voltage - (ocv(tc, x[:, 0]) + current * R0[tc] + x[:, 1])
+        PHt = np.einsum("nij,nj->ni", P, H)
+        S = np.einsum("ni,ni->n", H, PHt) + self.voltage_noise ** 2
+        K = PHt / S[:, None]
+        x += K * residual[:, None]
+        P -= K[:, :, None] * PHt[:, None, :]
+        x[:, 0] = np.clip(x[:, 0], 0.0, 1.0)
+
+        self._update_capacity(store, tc, current, dt)
+
+        nameplate = CAPACITY_AH[tc]
+        store.write("soc_est", x[:, 0])
+        store.soc_std[:] = np.sqrt(np.maximum(P[:, 0, 0], 0.0))
+        store.soh_est[:] = 100.0 * self.capacity / nameplate
+        store.soh_std[:] = 100.0 * np.sqrt(self.capacity_var) / nameplate
+
+    def _update_capacity(self, store, tc, current, dt):
+        """Advance the capacity filter by one tick, measuring it where a rest ends an excursion."""
+        self.capacity_var += (self.soh_noise * CAPACITY_AH[tc]) ** 2 * dt
+        self.charge += current * dt / 3600.0
+        self.charge_var += (self.current_noise * dt / 3600.0) ** 2
+        self.rest_time = np.where(np.abs(current) < self.rest_current, self.rest_time + dt, 0.0)
+        resting = self.rest_time >= self.settle * TAU[tc]
+        self.settled &= resting
+
+        # SOC read off the OCV curve by resting cells, away from its clipped ends
+        rest = np.flatnonzero(resting)
+        soc = soc_from_ocv(tc[rest], store.voltage[rest] - current[rest] * R0[tc[rest]])
+        inside = (soc > 0.0) & (soc < 1.0)
+        rest, soc = rest[inside], soc[inside]
+        if not rest.size:
+            return
+        var = (self.voltage_noise / np.maximum(docv_dsoc(tc[rest], soc), 1e-6)) ** 2
+
+        # Charge moved between two rests far enough apart measures the capacity
+        fresh = ~self.settled[rest]
+        moved = fresh & self.anchored[rest] & (np.abs(soc - self.anchor[rest]) >= self.soh_window)
+        m = rest[moved]
+        delta = soc[moved] - self.anchor[m]
+        measured = self.charge[m] / delta
+        noise = (self.charge_var[m] + measured ** 2 * (self.anchor_var[m] + var[moved])) / delta ** 2
+        innovation = measured - self.capacity[m]
+        total = self.capacity_var[m] + noise
+        gain = np.where(innovation ** 2 <= GATE ** 2 * total, self.capacity_var[m] / total, 0.0)
+        self.capacity[m] += gain * innovation
+        self.capacity_var[m] *= 1.0 - gain
+
+        # The anchor follows the latest reading of a rest that started one; a
+        # rest too close to the anchor keeps counting charge from it instead
+        follow = self.settled[rest] | moved | ~self.anchored[rest]
+        j = rest[follow]
+        self.anchor[j], self.anchor_var[j] = soc[follow], var[follow]
+        self.charge[j], self.charge_var[j] = 0.0, 0.0
+        self.anchored[j] = True
+        self.settled[j] = True
+
+    def get_state(self):
+        return {"keys": self.keys, "x": self.x, "P": self.P, **{name: getattr(self, name) for name in SOH_STATE}}
+
+    def set_state(self, state, store):
+        """Resume from ``get_state`` output; the next tick re-maps it onto ``store`` by key.
+
+        A state saved without the capacity filter restarts it from ``health``.
+        """
+        self.x = state["x"]
+        self.P = state["P"]
+        for name in SOH_STATE:
+            setattr(self, name, state.get(name))
+        self.keys = list(state["keys"])
+        self._store_id = id(store)
+        self._layout = None
+
+    def _follow(self, store):
+        """Re-map filter state after cells were added or removed, or the store replaced."""
+        new_keys = store.keys
+        n = len(new_keys)
+        if self._store_id == id(store):
+            rows = {key: i for i, key in enumerate(self.keys)}
+            src = np.array([rows.get(key, -1) for key in new_keys], dtype=np.intp)
+        else:
+            src = np.full(n, -1, dtype=np.intp)
+        kept = src >= 0
+
+        x = np.zeros((n, 2))
+        P = np.zeros((n, 2, 2))
+        x[kept] = self.x[src[kept]]
+        P[kept] = self.P[src[kept]]
+        fresh = ~kept
+        x[fresh, 0] = soc_from_ocv(store.type_code[fresh], store.voltage[fresh])
+        P[fresh, 0, 0] = self.initial_soc_std ** 2
+        P[fresh, 1, 1] = self.voltage_noise ** 2
+        self.x, self.P = x, P
+
+        restart = any(getattr(self, name) is None for name in SOH_STATE)
+        if restart:
+            kept = np.zeros(n, dtype=bool)
+        for name in SOH_STATE:
+            values = np.zeros(n, dtype=bool if name in ("anchored", "settled") else np.float64)
+            if not restart:
+                values[kept] = getattr(self, name)[src[kept]]
+            setattr(self, name, values)
+        fresh = ~kept
+        nameplate = CAPACITY_AH[store.type_code[fresh]]
+        self.capacity[fresh] = nameplate * np.clip(store.health[fresh], 1.0, 100.0) / 100.0
+        self.capacity_var[fresh] = (self.initial_soh_std * nameplate) ** 2
+
+        self.keys = new_keys
+        self._store_id = id(store)
+        self._layout = (id(store), store.version)
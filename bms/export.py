@@ -0,0 +1,164 @@
+"""Streaming export of recorded test history to CSV or Parquet.
+
+``iter_frames`` walks the telemetry chunks of one bench and yields long-format
+DataFrames (one row per cell per sample) of at most ``chunk_rows`` rows, read
+straight from the memory-mapped columns. The CSV and Parquet encoders consume
+that generator piece by piece, so peak memory is bounded by the chunk size
+rather than by the length of the test. Parquet support needs ``pyarrow``;
+``available_formats`` leaves it out when that is not installed.
+"""
+import importlib.util
+import io
+import os
+
+import numpy as np
+import pandas as pd
+
+from bms.telemetry import CHANNELS, open_chunks
+
+# Directory exports are written to and served from
+DEFAULT_ROOT = os.environ.get("BMS_EXPORT_DIR", "exports")
+
+FORMATS = {
+    "csv": {"extension": "csv", "mime": "text/csv"},
+    "parquet": {"extension": "parquet", "mime": "application/vnd.apache.parquet"},
+}
+
+
+def available_formats():
+    """Keys of ``FORMATS`` whose encoder can be imported here."""
+    return [fmt for fmt in FORMATS if fmt != "parquet" or importlib.util.find_spec("pyarrow") is not None]
+
+
+def empty_frame(channels=CHANNELS):
+    """Zero-row frame with the columns and dtypes ``iter_frames`` yields."""
+    frame = {
+        "time": pd.to_datetime(np.empty(0), unit="s"),
+        "cell": pd.Categorical([]),
+        "type": pd.Categorical([]),
+    }
+    for name in channels:
+        frame[name] = np.empty(0, dtype=np.float32)
+    return pd.DataFrame(frame)
+
+
+def iter_frames(root, bench_name, group_number, cells=None, chemistries=None, start=None, end=None,
+                channels=CHANNELS, chunk_rows=200_000):
+    """Yield the filtered sample history as numeric long-format DataFrames."""
+    cells = set(cells) if cells else None
+    chemistries = set(chemistries) if chemistries else None
+
+    for chunk in open_chunks(root, bench_name, group_number, start, end):
+        selected = np.array([
+            (cells is None or key in cells) and (chemistries is None or cell_type in chemistries)
+            for key, cell_type in zip(chunk.keys, chunk.types)
+        ], dtype=bool)
+        if not selected.any():
+            continue
+        keys = np.asarray(chunk.keys)[selected]
+        types = np.asarray(chunk.types)[selected]
+        columns = [name for name in channels if name in chunk.channels]
+
+        lo = 0 if start is None else np.searchsorted(chunk.times, start)
+        hi = chunk.rows if end is None else np.searchsorted(chunk.times, end, side="right")
+        step = max(1, chunk_rows // len(keys))
+        for row in range(lo, hi, step):
+            rows = slice(row, min(row + step, hi))
+            samples = rows.stop - rows.start
+            frame = {
+                "time": pd.to_datetime(np.repeat(chunk.times[rows], len(keys)), unit="s"),
+                "cell": pd.Categorical(np.tile(keys, samples), categories=keys),
+                "type": pd.Categorical(np.tile(types, samples), categories=np.unique(types)),
+            }
+            for name in columns:
+                frame[name] = chunk.column(name)[rows][:, selected].ravel()
+            yield pd.DataFrame(frame)
+
+
+def iter_csv(frames):
+    """Encode frames as CSV, one bytes block per frame."""
+    header = True
+    for frame in frames:
+        yield frame.to_csv(index=False, header=header).encode()
+        header = False
+
+
+class _Drain(io.RawIOBase):
+    """Write-only stream whose buffered output is taken with ``drain``."""
+
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b"".join(self._parts)
+        self._parts = []
+        return data
+
+
+def iter_parquet(frames, channels=CHANNELS):
+    """Encode frames as one Parquet file, one row group per frame.
+
+    Without any frames the file still holds an empty table with the columns
+    of ``channels``, so it stays readable.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    sink = _Drain()
+    writer = None
+    try:
+        for frame in frames:
+            frame = frame.astype({"cell": str, "type": str})
+            if writer is None:
+                table = pa.Table.from_pandas(frame, preserve_index=False)
+                writer = pq.ParquetWriter(sink, table.schema)
+            else:
+                table = pa.Table.from_pandas(frame, schema=writer.schema, preserve_index=False)
+            writer.write_table(table)
+            yield sink.drain()
+        if writer is None:
+            frame = empty_frame(channels).astype({"cell": "string", "type": "string"})
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            writer = pq.ParquetWriter(sink, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+    yield sink.drain()
+
+
+def iter_export(frames, fmt="csv", channels=CHANNELS):
+    """Byte blocks of ``frames`` encoded as ``fmt`` (``"csv"`` or ``"parquet"``)."""
+    if fmt == "csv":
+        return iter_csv(frames)
+    if fmt == "parquet":
+        return iter_parquet(frames, channels)
+    raise ValueError(f"Unknown export format {fmt!r}")
+
+
+def write_export(path, frames, fmt="csv", channels=CHANNELS):
+    """Stream an export to ``path``; returns the number of bytes written.
+
+    ``channels`` must match the ``iter_frames`` call; it gives the columns of
+    an empty Parquet export.
+    """
+    written = 0
+    tmp_path = f"{path}.part"
+    with open(tmp_path, "wb") as f:
+        for block in iter_export(frames, fmt, channels):
+            f.write(block)
+            written += len(block)
+    os.replace(tmp_path, path)
+    return written
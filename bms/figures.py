@@ -0,0 +1,69 @@
+"""Cached Plotly figures whose trace data is swapped in place between ticks.
+
+``FigureCache.render`` keeps one ``go.Figure`` per chart name. As long as a
+chart keeps the same trace types, later calls only replace the data arrays
+(and the layout when it actually changed) instead of rebuilding the figure.
+Scatter traces switch to WebGL (``Scattergl``) once they carry more than
+``webgl_threshold`` points. With ``measure`` on, the serialized size of every
+rendered frame is recorded in ``payload_bytes``; that serializes the whole
+figure, so it is off unless a profiler or benchmark asks for it.
+"""
+import plotly.graph_objects as go
+import plotly.io as pio
+
+WEBGL_THRESHOLD = 1000
+
+_TRACES = {
+    "bar": go.Bar,
+    "pie": go.Pie,
+    "scatter": go.Scatter,
+    "scattergl": go.Scattergl,
+}
+
+
+class FigureCache:
+    """Per-session store of reusable figures, keyed by chart name."""
+
+    def __init__(self, webgl_threshold=WEBGL_THRESHOLD, measure=False):
+        self.webgl_threshold = webgl_threshold
+        self.measure = measure
+        self.payload_bytes = {}
+        self._figures = {}
+
+    def render(self, name, traces, layout):
+        """Return the figure for ``name`` holding ``traces``.
+
+        ``traces`` is a list of ``(kind, properties)`` pairs where ``kind``
+        is ``"bar"``, ``"scatter"`` or ``"pie"``.
+        """
+        kinds = tuple(self._kind(kind, props) for kind, props in traces)
+        cached = self._figures.get(name)
+        if cached is None or cached[0] != kinds:
+            figure = go.Figure(data=[_TRACES[kind](**props) for kind, (_, props) in zip(kinds, traces)])
+            figure.update_layout(**layout)
+            self._figures[name] = (kinds, layout, figure)
+        else:
+            _, cached_layout, figure = cached
+            with figure.batch_update():
+                for trace, (_, props) in zip(figure.data, traces):
+                    trace.update(props, overwrite=True)
+                if layout != cached_layout:
+                    figure.update_layout(**layout)
+            self._figures[name] = (kinds, layout, figure)
+
+        if self.measure:
+            self.payload_bytes[name] = len(pio.to_json(figure, validate=False))
+        return figure
+
+    @property
+    def total_payload_bytes(self):
+        return sum(self.payload_bytes.values())
+
+    def clear(self):
+        self._figures.clear()
+        self.payload_bytes.clear()
+
+    def _kind(self, kind, props):
+        if kind == "scatter" and len(props.get("x", ())) > self.webgl_threshold:
+            return "scattergl"
+        return kind
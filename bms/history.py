@@ -0,0 +1,127 @@
+"""Preallocated ring buffer holding the recent time series of every cell.
+
+Samples are stored in a ``(cells, 2 * samples, channels)`` array and every
+sample is written twice, at ``head`` and ``head + samples``. Any window of up
+to ``samples`` consecutive samples is therefore one contiguous slice, so
+windowed reads are zero-copy views and appends are O(1) per tick. The number
+of samples kept is derived from ``max_bytes``, which bounds memory no matter
+how long a run lasts; on a large bench that can be less than the windows a
+dashboard asks for, which ``full`` lets callers notice.
+"""
+import numpy as np
+
+CHANNELS = ("voltage", "current", "temp", "soc")
+
+
+class HistoryBuffer:
+    """Ring buffer of the last ``samples`` ticks for every cell.
+
+    ``append`` has the sink signature expected by ``AcquisitionLoop`` and
+    follows cells being added or removed from the store it is fed.
+    """
+
+    def __init__(self, cell_capacity=16, channels=CHANNELS, max_bytes=64 * 1024 ** 2, dtype=np.float32):
+        self.channels = tuple(channels)
+        self.max_bytes = max_bytes
+        self.dtype = np.dtype(dtype)
+        self.keys = []
+        self._layout = None
+        self._allocate(max(cell_capacity, 1))
+
+    @property
+    def samples(self):
+        """Maximum number of samples retained per cell."""
+        return self._times.shape[0] // 2
+
+    @property
+    def count(self):
+        """Number of samples currently held."""
+        return min(self._written, self.samples)
+
+    @property
+    def full(self):
+        """Whether old samples have been overwritten, so a long enough window gets all ``samples`` only."""
+        return self._written > self.samples
+
+    @property
+    def nbytes(self):
+        return self._data.nbytes + self._times.nbytes
+
+    def clear(self):
+        self._head = -1
+        self._written = 0
+
+    def append(self, store, t):
+        """Record one sample of ``store`` taken at time ``t``."""
+        if self._layout != (id(store), store.version):
+            self._follow(store)
+        n = len(self.keys)
+        self._head = (self._head + 1) % self.samples
+        for k, name in enumerate(self.channels):
+            values = getattr(store, name)
+            self._data[:n, self._head, k] = values
+            self._data[:n, self._head + self.samples, k] = values
+        self._times[self._head] = self._times[self._head + self.samples] = t
+        self._written += 1
+
+    def last(self, count):
+        """Views ``(times, data)`` of the most recent ``count`` samples.
+
+        ``data`` has shape ``(cells, count, channels)``. Both are views into
+        the buffer and are overwritten as new samples arrive.
+        """
+        count = min(count, self.count)
+        end = self._head + self.samples + 1
+        return self._times[end - count:end], self._data[:len(self.keys), end - count:end]
+
+    def window(self, seconds, now=None):
+        """Views of the samples taken within the last ``seconds``."""
+        times, _ = self.last(self.count)
+        if now is None:
+            now = times[-1] if len(times) else 0.0
+        count = len(times) - np.searchsorted(times, now - seconds)
+        return self.last(count)
+
+    def channel(self, name, seconds):
+        """``(times, values)`` of one channel over the last ``seconds``."""
+        times, data = self.window(seconds)
+        return times, data[:, :, self.channels.index(name)]
+
+    def _allocate(self, cell_capacity):
+        per_sample = 2 * (cell_capacity * len(self.channels) * self.dtype.itemsize + 8)
+        samples = self.max_bytes // per_sample
+        if samples < 1:
+            raise ValueError(f"max_bytes={self.max_bytes} cannot hold one sample of {cell_capacity} cells")
+        self._data = np.full((cell_capacity, 2 * samples, len(self.channels)), np.nan, self.dtype)
+        self._times = np.zeros(2 * samples)
+        self.clear()
+
+    def _follow(self, store):
+        """Re-map rows after cells were added, removed or the store replaced."""
+        old_keys = self.keys
+        old_times, old_data = self.last(self.count)
+        old_times, old_data = old_times.copy(), old_data.copy()
+
+        new_keys = store.keys
+        if len(new_keys) > self._data.shape[0]:
+            self._allocate(max(len(new_keys), 2 * self._data.shape[0]))
+        else:
+            self._data[:] = np.nan
+            self.clear()
+
+        # Carry over the history of cells that are still present
+        kept = min(len(old_times), self.samples)
+        if kept:
+            rows = {key: i for i, key in enumerate(old_keys)}
+            src = np.array([rows.get(key, -1) for key in new_keys], dtype=np.intp)
+            present = src >= 0
+            block = np.full((len(new_keys), kept, len(self.channels)), np.nan, self.dtype)
+            block[present] = old_data[src[present], len(old_times) - kept:]
+            self._data[:len(new_keys), :kept] = block
+            self._data[:len(new_keys), self.samples:self.samples + kept] = block
+            self._times[:kept] = self._times[self.samples:self.samples + kept] = old_times[-kept:]
+            self._head = kept - 1
+            self._written = kept
+
+        self.keys = new_keys
+        self._layout = (id(store), store.version)
@@ -0,0 +1,233 @@
+"""Adaptive-step integration of running cells with exact cutoff events.
+
+``AdaptiveStep`` is a drop-in for ``engine.step``: it advances every running
+cell by ``dt`` seconds, but splits that interval per cell into substeps that
+end exactly where something changes (a phase cutoff, or an OCV breakpoint),
+so the phase transitions land at the instant their condition is met instead
+of at the next tick, and a quiet cell covers an hour in one substep.
+
+Within one substep the equivalent-circuit model has a closed form:
+
+* CC, CD and IDLE hold the current constant, so SOC moves linearly and the
+  RC voltage relaxes exponentially.
+* CV holds the terminal voltage. On one linear segment of the OCV curve the
+  SOC and RC voltage then follow a linear 2x2 system, solved exactly with
+  its two (real, negative) eigenvalues; a substep stops at the segment's
+  end and the next one continues on the following segment.
+
+Cutoffs that are linear in time (``duration``, ``ah_limit`` in CC and CD,
+the SOC limits) are computed directly; the terminal voltage reaching
+``cv_voltage`` or ``v_cutoff`` and the CV current tapering to ``i_limit``
+are located by bisection on the closed form to within ``time_tol``. Every
+pass of the loop moves each unfinished cell by its own substep, so the work
+is a handful of array operations per pass over the cells still going, and
+the number of passes is set by the cell crossing the most events.
+
+As ``dt`` shrinks ``engine.step`` converges to the same trajectories.
+"""
+import numpy as np
+
+from bms.chemistry import CAPACITY_AH, OCV_TABLE, R0, R1, SOC_POINTS, TAU, ocv
+from bms.engine import _PHASE_STATUS, PHASE_CC, PHASE_CD, PHASE_CV, PHASE_DONE, PHASE_IDLE, rest_idle
+
+
+def _phi(rate, t):
+    """``(exp(rate * t) - 1) / rate``, which is ``t`` for a zero rate."""
+    safe = np.where(rate != 0, rate, 1.0)
+    return np.where(rate != 0, np.expm1(rate * t) / safe, t)
+
+
+class AdaptiveStep:
+    """Step ``(store, dt)`` like ``engine.step``; returns the rows whose phase finished.
+
+    Event times are located to within ``time_tol`` seconds. ``max_passes``
+    caps the substeps per cell and call (a cell left short of ``dt``
+    continues on the next call); ``passes`` holds the count used by the last
+    call.
+    """
+
+    def __init__(self, time_tol=1e-3, max_passes=64):
+        self.time_tol = time_tol
+        self.max_passes = max_passes
+        self.passes = 0
+
+    def __call__(self, store, dt):
+        phase = store.phase
+        running = store.active & (phase >= PHASE_CC) & (phase <= PHASE_IDLE)
+        rest_idle(store, running, dt)
+        run = np.flatnonzero(running)
+        self.passes = 0
+        if not run.size:
+            return np.empty(0, dtype=np.intp)
+
+        tc = store.type_code[run]
+        s = {
+            "tc": tc,
+            "r0": R0[tc],
+            "r1": R1[tc],
+            "tau": TAU[tc],
+            "q": 3600.0 * CAPACITY_AH[tc] * np.clip(store.health[run], 1.0, 100.0) / 100.0,
+            "cc": store.cc_value[run],
+            "cv": store.cv_voltage[run],
+            "i_limit": store.i_limit[run],
+            "v_cutoff": store.v_cutoff[run],
+            "ah_limit": store.ah_limit[run],
+            "duration": store.duration[run],
+            "soc": store.soc[run].copy(),
+            "v_rc": store.v_rc[run].copy(),
+            "phase": phase[run].copy(),
+            "elapsed": store.elapsed[run].copy(),
+            "ah": store.ah_throughput[run].copy(),
+            "current": np.zeros(run.size),
+            "left": np.full(run.size, float(dt)),
+        }
+
+        while self.passes < self.max_passes:
+            going = np.flatnonzero((s["left"] > 0) & (s["phase"] != PHASE_DONE))
+            if not going.size:
+                break
+            self.passes += 1
+            held = s["phase"][going] == PHASE_CV
+            if not held.all():
+                self._constant(s, going[~held])
+            if held.any():
+                self._held(s, going[held])
+
+        done = s["phase"] == PHASE_DONE
+        s["current"][done] = 0.0
+        voltage = ocv(tc, s["soc"]) + s["current"] * s["r0"] + s["v_rc"]
+        phase[run] = s["phase"]
+        store.v_rc[run] = s["v_rc"]
+        store.elapsed[run] = s["elapsed"]
+        store.ah_throughput[run] = s["ah"]
+        store.write("soc", s["soc"], run)
+        store.write("voltage", voltage, run)
+        store.write("current", s["current"], run)
+        store.write("status_code", _PHASE_STATUS[s["phase"]], run)
+        return run[done]
+
+    def _first(self, hit, horizon):
+        """Earliest ``t`` in ``[0, horizon]`` with ``hit(t, j)`` true, ``inf`` where there is none.
+
+        ``hit`` must stay true once it turns true after ``t = 0``; ``j``
+        selects the cells it is evaluated for.
+        """
+        when = np.full(horizon.size, np.inf)
+        now = hit(np.zeros(horizon.size), slice(None))
+        when[now] = 0.0
+        j = np.flatnonzero(~now)
+        j = j[hit(horizon[j], j)]
+        a, b = np.zeros(j.size), horizon[j]
+        while np.any(b - a > self.time_tol):
+            mid = 0.5 * (a + b)
+            over = hit(mid, j)
+            b = np.where(over, mid, b)
+            a = np.where(over, a, mid)
+        when[j] = b
+        return when
+
+    def _constant(self, s, i):
+        """Move CC, CD and IDLE cells ``i`` to their next event or the end of the step."""
+        ph = s["phase"][i]
+        current = np.select([ph == PHASE_CC, ph == PHASE_CD], [s["cc"][i], -s["cc"][i]], 0.0)
+        magnitude = np.abs(current)
+        tc, r0, r1, tau, q = s["tc"][i], s["r0"][i], s["r1"][i], s["tau"][i], s["q"][i]
+        soc, v_rc, left = s["soc"][i], s["v_rc"][i], s["left"][i]
+
+        # Cutoffs linear in time
+        limit = np.maximum(s["duration"][i] - s["elapsed"][i], 0.0)
+        ah_limit = s["ah_limit"][i]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            limit = np.minimum(limit, np.where(
+                (ah_limit > 0) & (magnitude > 0),
+                np.maximum(ah_limit - s["ah"][i], 0.0) * 3600.0 / magnitude, np.inf))
+            limit = np.minimum(limit, np.select(
+                [current > 0, current < 0], [(1.0 - soc) * q / current, soc * q / -current], np.inf))
+
+        # Terminal voltage reaching cv_voltage while charging, v_cutoff while discharging
+        target = np.where(ph == PHASE_CC, s["cv"][i], s["v_cutoff"][i])
+        sign = np.where(ph == PHASE_CC, 1.0, -1.0)
+        watch = ph != PHASE_IDLE
+
+        def crossed(t, j):
+            decay = np.exp(-t / tau[j])
+            rc = v_rc[j] * decay + r1[j] * current[j] * (1.0 - decay)
+            voltage = ocv(tc[j], soc[j] + current[j] * t / q[j]) + current[j] * r0[j] + rc
+            return watch[j] & (sign[j] * (voltage - target[j]) >= 0)
+
+        crossing = self._first(crossed, np.minimum(left, limit))
+
+        t = np.minimum(left, np.minimum(limit, crossing))
+        decay = np.exp(-t / tau)
+        s["soc"][i] = np.clip(soc + current * t / q, 0.0, 1.0)
+        s["v_rc"][i] = v_rc * decay + r1 * current * (1.0 - decay)
+        s["elapsed"][i] += t
+        s["ah"][i] += magnitude * t / 3600.0
+        s["left"][i] = left - t
+        s["current"][i] = current
+
+        # CC hands over to CV at the crossing; any other event ends the phase
+        ended = limit <= np.minimum(left, crossing)
+        to_cv = ~ended & (crossing <= left) & (ph == PHASE_CC)
+        s["phase"][i[to_cv]] = PHASE_CV
+        s["phase"][i[ended | (~to_cv & (crossing <= left))]] = PHASE_DONE
+
+    def _held(self, s, i):
+        """Move CV cells ``i`` to their next event, the end of their OCV segment or of the step."""
+        tc, r0, r1, tau, q = s["tc"][i], s["r0"][i], s["r1"][i], s["tau"][i], s["q"][i]
+        soc, v_rc, cv, i_limit = s["soc"][i], s["v_rc"][i], s["cv"][i], s["i_limit"][i]
+
+        # Linear OCV segment the cell is on: ocv = base + slope * (soc - start)
+        segment = np.minimum((soc * SOC_POINTS).astype(np.intp), SOC_POINTS - 1)
+        segment += (segment < SOC_POINTS - 1) & (soc >= (segment + 1) / SOC_POINTS)
+        start, end = segment / SOC_POINTS, (segment + 1) / SOC_POINTS
+        base = OCV_TABLE[tc, segment]
+        slope = (OCV_TABLE[tc, segment + 1] - base) * SOC_POINTS
+
+        def held_current(x, rc, j=slice(None)):
+            return (cv[j] - base[j] - slope[j] * (x - start[j]) - rc) / r0[j]
+
+        # d(soc, v_rc)/dt = -[[a, b], [c, d]] (soc, v_rc) + const
+        a, b = slope / (q * r0), 1.0 / (q * r0)
+        c, d = r1 * slope / (r0 * tau), (r1 / r0 + 1.0) / tau
+        root = np.sqrt((a - d) ** 2 + 4.0 * b * c)
+        l1, l2 = 0.5 * (root - a - d), 0.5 * (-root - a - d)
+        current = held_current(soc, v_rc)
+        w0, w1 = current / q, (r1 * current - v_rc) / tau
+        mw0, mw1 = -a * w0 - b * w1, -c * w0 - d * w1
+
+        def state(t, j=slice(None)):
+            # Sylvester's formula on the two eigenvalues, applied to the initial slope
+            k1, k2 = _phi(l1[j], t) / root[j], _phi(l2[j], t) / root[j]
+            x = soc[j] + k1 * (mw0[j] - l2[j] * w0[j]) - k2 * (mw0[j] - l1[j] * w0[j])
+            rc = v_rc[j] + k1 * (mw1[j] - l2[j] * w1[j]) - k2 * (mw1[j] - l1[j] * w1[j])
+            return x, rc
+
+        # SOC only rises under CV, so the Ah limit and the segment end are SOC targets
+        ah_limit = s["ah_limit"][i]
+        ah_soc = np.where(ah_limit > 0, soc + np.maximum(ah_limit - s["ah"][i], 0.0) * 3600.0 / q, np.inf)
+        soc_target = np.minimum(end, ah_soc)
+
+        def event(t, j):
+            x, rc = state(t, j)
+            return (x >= soc_target[j]) | (held_current(x, rc, j) <= i_limit[j])
+
+        left = s["left"][i]
+        remaining = np.maximum(s["duration"][i] - s["elapsed"][i], 0.0)
+        when = self._first(event, np.minimum(left, remaining))
+        hit = np.isfinite(when)
+        t = np.where(hit, when, np.minimum(left, remaining))
+
+        new_soc, new_v_rc = state(t)
+        new_current = held_current(new_soc, new_v_rc)
+        boundary = hit & (end < 1.0) & (end < ah_soc) & (new_soc >= end) & (new_current > i_limit)
+        new_soc = np.where(boundary, np.maximum(new_soc, end), np.clip(new_soc, 0.0, 1.0))
+        s["ah"][i] += np.maximum(new_soc - soc, 0.0) * q / 3600.0
+        s["soc"][i] = new_soc
+        s["v_rc"][i] = new_v_rc
+        s["elapsed"][i] += t
+        s["left"][i] = left - t
+        s["current"][i] = np.clip(new_current, 0.0, s["cc"][i])
+
+        ended = (hit & ~boundary) | (~hit & (remaining <= left))
+        s["phase"][i[ended]] = PHASE_DONE
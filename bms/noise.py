@@ -0,0 +1,130 @@
+"""Seeded, vectorized noise for simulated readings.
+
+A ``NoiseModel`` perturbs channels of a ``CellStore`` with a list of noise
+models per channel. Every variate an update needs, for every channel and
+cell, is drawn from the model's ``numpy.random.Generator`` in a single
+``random((draws, cells))`` call and then shaped by the models, so an update
+is a few array operations whatever the size of the bench. Given the same
+seed and the same sequence of updates, a run replays exactly.
+
+The seed defaults to ``BMS_NOISE_SEED`` when set, otherwise to fresh
+entropy; either way it is kept in ``seed`` so the run can be replayed.
+"""
+import os
+
+import numpy as np
+
+
+def _normal(u):
+    # Box-Muller on two uniform rows; 1 - u keeps the logarithm finite
+    return np.sqrt(-2.0 * np.log1p(-u[0])) * np.cos(2 * np.pi * u[1])
+
+
+class Uniform:
+    """Uniform step in ``[low, high]`` per second of ``dt``, scaled like a random walk."""
+
+    draws = 1
+
+    def __init__(self, low, high):
+        self.low = low
+        self.high = high
+
+    def __call__(self, u, dt):
+        return (self.low + (self.high - self.low) * u[0]) * np.sqrt(dt)
+
+
+class Gaussian:
+    """Zero-mean Gaussian step with ``sigma`` per second of ``dt``, scaled like a random walk."""
+
+    draws = 2
+
+    def __init__(self, sigma):
+        self.sigma = sigma
+
+    def __call__(self, u, dt):
+        return self.sigma * np.sqrt(dt) * _normal(u)
+
+
+class Drift:
+    """Steady drift of ``rate`` per second plus an optional Gaussian wander."""
+
+    draws = 2
+
+    def __init__(self, rate, sigma=0.0):
+        self.rate = rate
+        self.sigma = sigma
+
+    def __call__(self, u, dt):
+        return self.rate * dt + self.sigma * np.sqrt(dt) * _normal(u)
+
+
+class Spikes:
+    """Jumps of ``±magnitude`` arriving at ``rate`` per second, independently per cell."""
+
+    draws = 2
+
+    def __init__(self, rate, magnitude):
+        self.rate = rate
+        self.magnitude = magnitude
+
+    def __call__(self, u, dt):
+        hit = u[0] < -np.expm1(-self.rate * dt)
+        return np.where(hit, np.where(u[1] < 0.5, -self.magnitude, self.magnitude), 0.0)
+
+
+def default_seed():
+    seed = os.environ.get("BMS_NOISE_SEED")
+    return int(seed) if seed else int(np.random.SeedSequence().entropy % 2 ** 32)
+
+
+class NoiseModel:
+    """Step ``(store, dt)`` adding seeded noise to channels of a store.
+
+    ``channels`` maps a ``CellStore`` field to one noise model or a tuple of
+    models whose steps are summed. ``bounds`` maps a field to ``(low,
+    high)``, each a number or the name of a per-cell field such as
+    ``"min_voltage"``. With ``idle_only`` cells running a task are left
+    alone. Models sharing a seed draw independent sequences when given
+    different ``stream`` numbers.
+    """
+
+    def __init__(self, channels, seed=None, bounds=None, idle_only=False, stream=0):
+        self.channels = {name: models if isinstance(models, tuple) else (models,)
+                         for name, models in channels.items()}
+        self.bounds = dict(bounds or {})
+        self.idle_only = idle_only
+        self.stream = stream
+        self.draws = sum(model.draws for models in self.channels.values() for model in models)
+        self.reseed(default_seed() if seed is None else seed)
+
+    def reseed(self, seed):
+        """Restart the sequence from ``seed``."""
+        self.seed = int(seed)
+        self.rng = np.random.default_rng([self.stream, self.seed])
+        self.updates = 0
+
+    def get_state(self):
+        return {"seed": self.seed, "updates": self.updates, "rng": self.rng.bit_generator.state}
+
+    def set_state(self, state, store=None):
+        self.reseed(state["seed"])
+        self.rng.bit_generator.state = state["rng"]
+        self.updates = state["updates"]
+
+    def __call__(self, store, dt=1.0):
+        rows = ~store.active if self.idle_only else slice(None)
+        n = np.count_nonzero(rows) if self.idle_only else len(store)
+        if not n:
+            return
+        u = self.rng.random((self.draws, n))
+        k = 0
+        for name, models in self.channels.items():
+            values = getattr(store, name)[rows]
+            for model in models:
+                values = values + model(u[k:k + model.draws], dt)
+                k += model.draws
+            if name in self.bounds:
+                low, high = (getattr(store, b)[rows] if isinstance(b, str) else b for b in self.bounds[name])
+                values = np.clip(values, low, high)
+            store.write(name, values, rows)
+        self.updates += 1
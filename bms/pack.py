@@ -0,0 +1,179 @@
+"""Series/parallel pack topology of cell groups, with cell balancing.
+
+A group configured as ``SsPp`` is a pack of ``parallel`` strings, each of
+``series`` cells in series; in cell id order the first ``series`` cells form
+the first string, and so on. Every string is a Thevenin source: the sum of
+its cells' OCV and RC voltages behind the sum of their ``r0``. The strings
+share the pack terminals, so with string EMFs ``E`` and resistances ``R``::
+
+    V = (I + sum(E / R)) / sum(1 / R)        string current (V - E) / R
+
+where ``I`` is the pack current, taken as what the cells' tasks drive
+through the pack. Strings with different EMFs therefore carry unequal
+currents, and circulate current between themselves at rest. ``PackModel``
+runs after the engine step and moves each cell from the current its task
+drove to its string's current, then applies balancing inside each pack:
+
+* passive - cells more than ``threshold`` SOC above the pack's lowest cell
+  bleed ``bleed_current`` into a resistor
+* active - while the pack's SOC spread exceeds ``threshold``, charge is
+  shuttled from cells above the pack mean to cells below it, up to
+  ``transfer_current`` per cell and with ``efficiency`` losses
+
+Cells are ordered pack by pack and string by string once per layout, so a
+tick is a fixed number of segment reductions (``np.add.reduceat`` and its
+``minimum``/``maximum`` siblings) over the pack cells, with no loop over
+packs or strings. A group whose cell count does not match its topology is
+left out until it does.
+"""
+import numpy as np
+
+from bms.chemistry import CAPACITY_AH, R0, R1, TAU, ocv
+from bms.engine import PHASE_CC, PHASE_IDLE
+
+BALANCING = ("none", "passive", "active")
+
+# Per-pack values reported by ``PackModel.snapshot``
+METRICS = ("voltage", "current", "string_current", "voltage_spread", "soc_spread", "balancing_cells")
+
+
+class PackModel:
+    """Acquisition step ``(store, dt)`` wiring configured groups into packs.
+
+    ``topologies`` maps a group to its ``{"series", "parallel",
+    "balancing"}``. After every tick ``voltage``, ``current``,
+    ``voltage_spread`` and ``soc_spread`` hold one value per pack in
+    ``groups`` and ``string_current`` one per string; ``snapshot`` gathers
+    them per pack for display.
+    """
+
+    def __init__(self, bleed_current=0.1, transfer_current=1.0, efficiency=0.9, threshold=0.005):
+        self.bleed_current = bleed_current
+        self.transfer_current = transfer_current
+        self.efficiency = efficiency
+        self.threshold = threshold
+        self.topologies = {}
+        self._layout = None
+        self._reset(0)
+
+    def configure(self, group, series, parallel, balancing="none"):
+        """Treat ``group`` as ``parallel`` strings of ``series`` cells."""
+        if series < 1 or parallel < 1:
+            raise ValueError("A pack needs at least one cell in series and one string")
+        if balancing not in BALANCING:
+            raise ValueError(f"Unknown balancing {balancing!r}")
+        self.topologies[int(group)] = {"series": int(series), "parallel": int(parallel), "balancing": balancing}
+        self._layout = None
+
+    def set_balancing(self, group, balancing):
+        self.configure(group, self.topologies[group]["series"], self.topologies[group]["parallel"], balancing)
+
+    def remove(self, group):
+        self.topologies.pop(group, None)
+        self._layout = None
+
+    def __call__(self, store, dt):
+        if self._layout != (id(store), store.version):
+            self._follow(store)
+        if not self.rows.size:
+            return
+        rows = self.rows
+        tc = store.type_code[rows]
+        soc, v_rc, phase = store.soc[rows], store.v_rc[rows], store.phase[rows]
+        r0 = R0[tc]
+        running = store.active[rows] & (phase >= PHASE_CC) & (phase <= PHASE_IDLE)
+        driven = np.where(running, store.current[rows], 0.0)
+
+        # Strings as Thevenin sources in parallel across the pack terminals
+        emf = np.add.reduceat(ocv(tc, soc) + v_rc, self.string_starts)
+        resistance = np.add.reduceat(r0, self.string_starts)
+        conductance = 1.0 / resistance
+        self.current = np.add.reduceat(driven, self.pack_starts) / self.series
+        self.voltage = ((self.current + np.add.reduceat(emf * conductance, self.pack_string_starts))
+                        / np.add.reduceat(conductance, self.pack_string_starts))
+        self.string_current = (self.voltage[self.string_pack] - emf) * conductance
+        current = self.string_current[self.cell_string]
+
+        # Balancing currents stay inside the pack
+        lowest = np.minimum.reduceat(soc, self.pack_starts)
+        self.soc_spread = np.maximum.reduceat(soc, self.pack_starts) - lowest
+        gap = (np.add.reduceat(soc, self.pack_starts) / self.size)[self.cell_pack] - soc
+        peak = np.maximum.reduceat(np.abs(gap), self.pack_starts)
+        mode = self.mode[self.cell_pack]
+        bleed = (mode == 1) & (soc - lowest[self.cell_pack] > self.threshold)
+        shuttle = (mode == 2) & (self.soc_spread > self.threshold)[self.cell_pack]
+        transfer = np.where(shuttle, self.transfer_current * gap / np.where(peak > 0, peak, 1.0)[self.cell_pack], 0.0)
+        self.balance = np.where(transfer > 0, self.efficiency * transfer, transfer) - self.bleed_current * bleed
+        current = current + self.balance
+
+        # The engine integrated ``driven``; add the difference
+        extra = current - driven
+        q = 3600.0 * CAPACITY_AH[tc] * np.clip(store.health[rows], 1.0, 100.0) / 100.0
+        soc = np.clip(soc + extra * dt / q, 0.0, 1.0)
+        decay = np.exp(-dt / TAU[tc])
+        v_rc = v_rc + R1[tc] * (1.0 - decay) * extra
+        voltage = ocv(tc, soc) + current * r0 + v_rc
+        self.voltage_spread = (np.maximum.reduceat(voltage, self.pack_starts)
+                               - np.minimum.reduceat(voltage, self.pack_starts))
+
+        store.v_rc[rows] = v_rc
+        store.write("soc", soc, rows)
+        store.write("current", current, rows)
+        store.write("voltage", voltage, rows)
+
+    def snapshot(self):
+        """One JSON-ready dict per configured group; metrics are ``None`` while it is incomplete."""
+        packs = {}
+        for k, group in enumerate(self.groups.tolist()):
+            strings = slice(self.pack_string_starts[k], self.pack_string_starts[k] + self.parallel[k])
+            cells = slice(self.pack_starts[k], self.pack_starts[k] + self.size[k])
+            packs[group] = {
+                "voltage": float(self.voltage[k]),
+                "current": float(self.current[k]),
+                "string_current": self.string_current[strings].tolist(),
+                "voltage_spread": float(self.voltage_spread[k]),
+                "soc_spread": float(self.soc_spread[k]),
+                "balancing_cells": int(np.count_nonzero(self.balance[cells])),
+            }
+        missing = dict.fromkeys(METRICS)
+        return [{"group": group, **topology, **packs.get(group, missing)}
+                for group, topology in sorted(self.topologies.items())]
+
+    def get_state(self):
+        return {"topologies": [[group, topology] for group, topology in self.topologies.items()]}
+
+    def set_state(self, state, store):
+        self.topologies = {group: topology for group, topology in state["topologies"]}
+        self._layout = None
+
+    def _reset(self, packs):
+        self.rows = np.empty(0, dtype=np.intp)
+        self.groups = np.empty(0, dtype=np.int64)
+        self.voltage, self.current = np.zeros(packs), np.zeros(packs)
+        self.voltage_spread, self.soc_spread = np.zeros(packs), np.zeros(packs)
+        self.string_current = np.empty(0)
+        self.balance = np.empty(0)
+
+    def _follow(self, store):
+        """Order the cells of complete packs pack by pack, string by string."""
+        self._layout = (id(store), store.version)
+        counts = store.counts("group")
+        complete = [group for group, topology in sorted(self.topologies.items())
+                    if counts.get(group, 0) == topology["series"] * topology["parallel"]]
+        self._reset(len(complete))
+        if not complete:
+            return
+        rows = store.rows_where("group", *complete)
+        self.rows = rows[np.lexsort((store.cell_id[rows], store.group[rows]))]
+        self.groups = np.array(complete, dtype=np.int64)
+        self.series = np.array([self.topologies[g]["series"] for g in complete], dtype=np.intp)
+        self.parallel = np.array([self.topologies[g]["parallel"] for g in complete], dtype=np.intp)
+        self.mode = np.array([BALANCING.index(self.topologies[g]["balancing"]) for g in complete], dtype=np.int8)
+        self.size = self.series * self.parallel
+
+        self.pack_starts = np.r_[0, np.cumsum(self.size)[:-1]]
+        self.pack_string_starts = np.r_[0, np.cumsum(self.parallel)[:-1]]
+        self.string_pack = np.repeat(np.arange(len(complete)), self.parallel)
+        self.string_starts = np.r_[0, np.cumsum(np.repeat(self.series, self.parallel))[:-1]]
+        self.cell_pack = np.repeat(np.arange(len(complete)), self.size)
+        self.cell_string = np.repeat(np.arange(len(self.string_pack)), self.series[self.string_pack])
@@ -0,0 +1,173 @@
+"""Per-section rerun profiling with rolling percentiles.
+
+``Profiler.section(name)`` times a block of a script (or the simulation
+tick) and records its wall time, and optionally the bytes it allocated,
+into a fixed-size ring buffer per section. Percentiles are computed over
+that rolling window, so the numbers describe recent reruns and memory
+stays bounded however long the app runs.
+
+Allocation tracking uses ``tracemalloc``, which slows Python down
+noticeably; it is off until ``track_allocations(True)`` is called.
+Allocations are the peak traced bytes above the level at which a section
+was entered, and nested sections are accounted correctly. Sections running
+concurrently on other threads can inflate each other's peaks, so treat
+allocation numbers as approximate.
+"""
+import json
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import numpy as np
+
+QUANTILES = (50, 95, 99)
+
+
+class _Window:
+    """Ring buffer of the last ``size`` ``(seconds, bytes)`` samples of one section."""
+
+    def __init__(self, size):
+        self.samples = np.full((size, 2), np.nan)
+        self.head = -1
+        self.count = 0
+        self.total_seconds = 0.0
+
+    def append(self, seconds, allocated):
+        self.head = (self.head + 1) % len(self.samples)
+        self.samples[self.head] = seconds, allocated
+        self.count += 1
+        self.total_seconds += seconds
+
+    def values(self):
+        return self.samples[:min(self.count, len(self.samples))]
+
+
+class Profiler:
+    """Rolling wall-time and allocation percentiles for named sections.
+
+    One profiler is meant to be shared by every session of an app and by
+    its acquisition thread; recording is thread-safe.
+    """
+
+    def __init__(self, window=512):
+        self.window = window
+        self.started = time.time()
+        self._sections = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._owns_tracemalloc = False
+
+    @property
+    def tracking_allocations(self):
+        return tracemalloc.is_tracing()
+
+    def track_allocations(self, enabled):
+        if enabled and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._owns_tracemalloc = True
+        elif not enabled and self._owns_tracemalloc:
+            tracemalloc.stop()
+            self._owns_tracemalloc = False
+
+    @contextmanager
+    def section(self, name):
+        """Time the enclosed block as section ``name``."""
+        stack = self._local.__dict__.setdefault("stack", [])
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            current, peak = tracemalloc.get_traced_memory()
+            if stack:
+                stack[-1][1] = max(stack[-1][1], peak)
+            tracemalloc.reset_peak()
+            stack.append([current, 0])
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - started
+            allocated = np.nan
+            if tracing and tracemalloc.is_tracing():
+                entered, child_peak = stack.pop()
+                peak = max(child_peak, tracemalloc.get_traced_memory()[1])
+                allocated = max(peak - entered, 0)
+                if stack:
+                    # Hand the peak on, since reset_peak() hid it from the enclosing section
+                    stack[-1][1] = max(stack[-1][1], peak)
+                tracemalloc.reset_peak()
+            elif tracing:
+                stack.pop()
+            self.record(name, seconds, allocated)
+
+    def record(self, name, seconds, allocated=np.nan):
+        with self._lock:
+            window = self._sections.get(name)
+            if window is None:
+                window = self._sections[name] = _Window(self.window)
+            window.append(seconds, allocated)
+
+    def reset(self):
+        with self._lock:
+            self._sections.clear()
+
+    def summary(self):
+        """One dict per section with counts and p50/p95/p99 of time (ms) and allocations (bytes)."""
+        with self._lock:
+            windows = {name: (window.values().copy(), window.count, window.total_seconds)
+                       for name, window in self._sections.items()}
+        rows = []
+        for name, (values, count, total_seconds) in sorted(windows.items()):
+            row = {"section": name, "count": count, "total_seconds": total_seconds, "window": len(values)}
+            ms = np.percentile(values[:, 0], QUANTILES) * 1000
+            allocated = values[:, 1]
+            if np.isnan(allocated).all():
+                kb = np.full(len(QUANTILES), np.nan)
+            else:
+                kb = np.nanpercentile(allocated, QUANTILES) / 1024
+            for q, t, a in zip(QUANTILES, ms, kb):
+                row[f"p{q}_ms"] = t
+                row[f"p{q}_kb"] = a
+            rows.append(row)
+        return rows
+
+    def to_json(self):
+        return json.dumps({
+            "started": self.started,
+            "time": time.time(),
+            "window": self.window,
+            "tracking_allocations": self.tracking_allocations,
+            "sections": [{k: (None if isinstance(v, float) and np.isnan(v) else v) for k, v in row.items()}
+                         for row in self.summary()],
+        }, indent=2)
+
+    def to_prometheus(self, prefix="bms_section"):
+        """Prometheus text exposition: one summary per section for time and allocations."""
+        rows = self.summary()
+        lines = [
+            f"# HELP {prefix}_seconds Wall time of a dashboard section over the rolling window.",
+            f"# TYPE {prefix}_seconds summary",
+        ]
+        for row in rows:
+            label = row["section"].replace("\\", "\\\\").replace('"', '\\"')
+            for q in QUANTILES:
+                lines.append(f'{prefix}_seconds{{section="{label}",quantile="{q / 100:g}"}} {row[f"p{q}_ms"] / 1000:.6g}')
+            lines.append(f'{prefix}_seconds_sum{{section="{label}"}} {row["total_seconds"]:.6g}')
+            lines.append(f'{prefix}_seconds_count{{section="{label}"}} {row["count"]}')
+        lines += [
+            f"# HELP {prefix}_allocated_bytes Peak bytes allocated by a dashboard section over the rolling window.",
+            f"# TYPE {prefix}_allocated_bytes summary",
+        ]
+        for row in rows:
+            if np.isnan(row["p50_kb"]):
+                continue
+            label = row["section"].replace("\\", "\\\\").replace('"', '\\"')
+            for q in QUANTILES:
+                lines.append(f'{prefix}_allocated_bytes{{section="{label}",quantile="{q / 100:g}"}} {row[f"p{q}_kb"] * 1024:.0f}')
+        return "\n".join(lines) + "\n"
+
+    def write(self, path, fmt="json"):
+        """Write the report to ``path`` as ``json`` or ``prometheus`` text."""
+        text = self.to_json() if fmt == "json" else self.to_prometheus()
+        with open(path, "w") as f:
+            f.write(text)
+        return path
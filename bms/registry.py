@@ -0,0 +1,154 @@
+"""Stable cell identity and secondary indexes for ``CellStore`` rows.
+
+Every cell gets a monotonic integer id that is never reused, so ids stay
+valid across removals, unlike row numbers or ids derived from the number of
+cells. ``CellRegistry`` maps keys and ids to rows and keeps one ``Index``
+per indexed column (chemistry, operating status and group). An index holds
+the rows of every value in its own list together with each row's slot in
+that list, so adding, removing or moving a row and changing its value are
+all O(1). Filtering by an indexed value and per-value counts never scan the
+bench.
+"""
+import numpy as np
+
+# Integer columns with a secondary index
+INDEXED = ("type_code", "status_code", "group")
+
+
+class Index:
+    """Rows grouped by the value of one integer column."""
+
+    def __init__(self, capacity=16):
+        self._members = {}
+        self._slot = np.zeros(max(capacity, 1), dtype=np.intp)
+
+    @classmethod
+    def build(cls, values):
+        """Index of a whole column at once, rows in ascending order within each value."""
+        values = np.asarray(values)
+        index = cls(len(values))
+        order = np.argsort(values, kind="stable")
+        uniques, starts, counts = np.unique(values[order], return_index=True, return_counts=True)
+        index._slot[order] = np.arange(len(values)) - np.repeat(starts, counts)
+        groups = np.split(order, starts[1:]) if len(values) else []
+        index._members = {value: rows.tolist() for value, rows in zip(uniques.tolist(), groups)}
+        return index
+
+    def copy(self):
+        other = Index.__new__(Index)
+        other._members = {value: list(rows) for value, rows in self._members.items()}
+        other._slot = self._slot.copy()
+        return other
+
+    def grow(self, capacity):
+        if capacity <= len(self._slot):
+            return
+        slot = np.zeros(capacity, dtype=np.intp)
+        slot[:len(self._slot)] = self._slot
+        self._slot = slot
+
+    def add(self, row, value):
+        rows = self._members.setdefault(value, [])
+        self._slot[row] = len(rows)
+        rows.append(row)
+
+    def remove(self, row, value):
+        rows = self._members[value]
+        last = rows.pop()
+        if last != row:
+            slot = self._slot[row]
+            rows[slot] = last
+            self._slot[last] = slot
+        if not rows:
+            del self._members[value]
+
+    def move(self, src, dst, value):
+        """Row ``src`` now lives at ``dst``."""
+        slot = self._slot[src]
+        self._members[value][slot] = dst
+        self._slot[dst] = slot
+
+    def change(self, rows, old, new):
+        """Re-file ``rows`` whose value went from ``old`` to ``new`` (arrays)."""
+        moved = np.flatnonzero(old != new)
+        for row, before, after in zip(rows[moved].tolist(), old[moved].tolist(), new[moved].tolist()):
+            self.remove(row, before)
+            self.add(row, after)
+
+    def rows(self, *values):
+        """Sorted rows holding any of ``values``."""
+        members = [self._members.get(value, ()) for value in values]
+        rows = np.fromiter((row for group in members for row in group), dtype=np.intp,
+                           count=sum(len(group) for group in members))
+        rows.sort()
+        return rows
+
+    def counts(self):
+        """Number of rows per value, for the values present."""
+        return {value: len(rows) for value, rows in sorted(self._members.items())}
+
+    def values(self):
+        return sorted(self._members)
+
+
+class CellRegistry:
+    """Keys, stable ids and secondary indexes of the rows of one store."""
+
+    def __init__(self, capacity=16):
+        self.next_id = 1
+        self.keys = []
+        self.rows = {}
+        self.id_rows = {}
+        self.indexes = {name: Index(capacity) for name in INDEXED}
+
+    def copy(self):
+        other = CellRegistry.__new__(CellRegistry)
+        other.next_id = self.next_id
+        other.keys = list(self.keys)
+        other.rows = dict(self.rows)
+        other.id_rows = dict(self.id_rows)
+        other.indexes = {name: index.copy() for name, index in self.indexes.items()}
+        return other
+
+    def grow(self, capacity):
+        for index in self.indexes.values():
+            index.grow(capacity)
+
+    def add(self, key, cell_id, row, values):
+        """Register ``key`` at ``row``; ``values`` maps every ``INDEXED`` column to its value."""
+        self.keys.append(key)
+        self.rows[key] = row
+        self.id_rows[cell_id] = row
+        self.next_id = max(self.next_id, cell_id + 1)
+        for name, index in self.indexes.items():
+            index.add(row, values[name])
+
+    def remove(self, row, cell_id, values, last_id, last_values):
+        """Unregister ``row`` and move the last row (id ``last_id``) into its place."""
+        last = len(self.keys) - 1
+        key = self.keys[row]
+        del self.rows[key]
+        del self.id_rows[cell_id]
+        for name, index in self.indexes.items():
+            index.remove(row, values[name])
+        if row != last:
+            moved = self.keys[last]
+            self.keys[row] = moved
+            self.rows[moved] = row
+            self.id_rows[last_id] = row
+            for name, index in self.indexes.items():
+                index.move(last, row, last_values[name])
+        self.keys.pop()
+        return key
+
+    @classmethod
+    def rebuild(cls, keys, ids, columns):
+        """Registry for rows ``keys`` with stable ``ids`` and indexed ``columns`` (name -> array)."""
+        n = len(keys)
+        registry = cls(capacity=n)
+        registry.keys = list(keys)
+        registry.rows = dict(zip(registry.keys, range(n)))
+        registry.id_rows = dict(zip(ids.tolist(), range(n)))
+        registry.next_id = int(ids.max()) + 1 if n else 1
+        registry.indexes = {name: Index.build(columns[name][:n]) for name in INDEXED}
+        return registry
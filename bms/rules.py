@@ -0,0 +1,116 @@
+"""Declarative threshold rules compiled to NumPy masks.
+
+A ``Rule`` compares one cell field against a threshold that is either a
+constant, a per-chemistry table, or another field scaled by a factor
+(``voltage >= max_voltage * 0.95``). A ``RuleSet`` evaluates every rule over
+every cell in one pass and packs the results into a per-cell bitmask (bit
+``r`` set when rule ``r`` matches), which both dashboards decode into status
+labels and bench-wide findings.
+"""
+import operator
+
+import numpy as np
+
+from bms.chemistry import CELL_TYPES
+
+_OPS = {">": operator.gt, ">=": operator.ge, "<": operator.lt, "<=": operator.le}
+
+
+class Rule:
+    """One threshold check; ``by_type`` overrides ``threshold`` per chemistry."""
+
+    def __init__(self, name, field, op, threshold=None, ref=None, scale=1.0, by_type=None,
+                 severity="warning", recommendation=None):
+        if op not in _OPS:
+            raise ValueError(f"Unknown operator {op!r}")
+        if (threshold is None) == (ref is None):
+            raise ValueError("Give exactly one of threshold or ref")
+        self.name = name
+        self.field = field
+        self.op = op
+        self.threshold = threshold
+        self.ref = ref
+        self.scale = scale
+        self.by_type = dict(by_type or {})
+        self.severity = severity
+        self.recommendation = recommendation
+
+    def limits(self, store):
+        """Threshold for every cell of ``store``."""
+        if self.ref is not None:
+            limit = getattr(store, self.ref) * self.scale
+            if self.by_type:
+                factors = np.array([self.by_type.get(t, 1.0) for t in CELL_TYPES])
+                limit = limit * factors[store.type_code]
+            return limit
+        if self.by_type:
+            table = np.array([self.by_type.get(t, self.threshold) for t in CELL_TYPES], dtype=np.float64)
+            return table[store.type_code]
+        return self.threshold
+
+    def __repr__(self):
+        rhs = f"{self.ref} * {self.scale}" if self.ref is not None else self.threshold
+        return f"Rule({self.name!r}: {self.field} {self.op} {rhs})"
+
+
+# Shared status and recommendation rules, in priority order
+DEFAULT_RULES = (
+    Rule("High Voltage", "voltage", ">=", ref="max_voltage", scale=0.95),
+    Rule("Low Voltage", "voltage", "<=", ref="min_voltage", scale=1.05, severity="critical"),
+    Rule("High Temperature", "temp", ">", 35,
+         recommendation="🌡️ Consider cooling system - some cells are running hot"),
+    Rule("Low Health", "health", "<", 80, severity="critical",
+         recommendation="🏥 Replace cells with health below 80%"),
+    Rule("High Cycles", "cycles", ">", 800,
+         recommendation="🔄 Monitor high-cycle cells closely"),
+)
+
+
+class RuleSet:
+    """Evaluates a rule table over a whole ``CellStore`` at once.
+
+    Calling the rule set as ``ruleset(store, dt)`` stores the bitmask in
+    ``store.alarms``, so it can run as an acquisition step on every tick.
+    """
+
+    def __init__(self, rules=DEFAULT_RULES, default="Normal"):
+        if len(rules) > 32:
+            raise ValueError("At most 32 rules fit in the alarm bitmask")
+        self.rules = tuple(rules)
+        self.labels = np.array((default,) + tuple(rule.name for rule in self.rules))
+        self.severities = dict(zip(self.labels, ("normal",) + tuple(r.severity for r in self.rules)))
+
+    def __call__(self, store, dt=None):
+        store.alarms = self.evaluate(store)
+
+    def evaluate(self, store):
+        """Bitmask of matching rules for every cell."""
+        bits = np.zeros(len(store), dtype=np.uint32)
+        for r, rule in enumerate(self.rules):
+            matched = _OPS[rule.op](getattr(store, rule.field), rule.limits(store))
+            bits |= matched.astype(np.uint32) << np.uint32(r)
+        return bits
+
+    def status_codes(self, bits):
+        """Index into ``labels`` of the highest-priority matching rule (0 = default)."""
+        bits = np.asarray(bits, dtype=np.int64)
+        lowest = bits & -bits
+        codes = np.zeros(bits.shape, dtype=np.int8)
+        matched = bits > 0
+        codes[matched] = np.log2(lowest[matched]).astype(np.int8) + 1
+        return codes
+
+    def statuses(self, bits):
+        return self.labels[self.status_codes(bits)]
+
+    def counts(self, bits):
+        """Number of cells matching each rule."""
+        bits = np.asarray(bits, dtype=np.uint32)
+        return [int(np.count_nonzero(bits & np.uint32(1 << r))) for r in range(len(self.rules))]
+
+    def findings(self, bits):
+        """``(rule, count)`` for every rule matched by at least one cell."""
+        return [(rule, count) for rule, count in zip(self.rules, self.counts(bits)) if count]
+
+
+DEFAULT_RULESET = RuleSet()
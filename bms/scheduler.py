@@ -0,0 +1,298 @@
+"""Event-driven execution of multi-step test profiles on groups of cells.
+
+A profile is a sequence of ``engine`` tasks (``CC_CV -> IDLE -> CC_CD``, say)
+repeated ``repeat`` times, assigned to a set of cells with a priority,
+optional dependencies on other profiles and an optional timeout. Each cell
+works through the sequence on its own: when ``engine.step`` reports a cell's
+phase finished, that cell alone is bound to its next step, and the profile
+completes once its last cell is through. Every cell's position in the
+sequence is kept in the store's ``profile_step`` column.
+
+``Scheduler`` does no work for a profile between its events. Step
+transitions are driven by the rows ``engine.step`` returns as finished,
+profiles waiting to start sit in a heap ordered by priority and submission,
+and timeouts sit in a heap of deadlines of which only the earliest is looked
+at per tick. Tens of thousands of concurrent profiles therefore cost only the
+engine step itself between events. Timeouts count running time only, and
+pausing keeps every cell's phase, elapsed time and throughput, so a resumed
+profile continues exactly where it stopped.
+"""
+import heapq
+
+import numpy as np
+
+from bms import engine
+
+# Profile states; Blocked profiles wait for dependencies, Queued ones for cells
+STATES = ("Blocked", "Queued", "Running", "Paused", "Completed", "Cancelled", "Timed out")
+FINAL = ("Completed", "Cancelled", "Timed out")
+
+
+def make_profile(steps, repeat=1, name=None):
+    """Profile dict of ``steps`` (``engine.make_task`` dicts or task types) run ``repeat`` times."""
+    steps = [engine.make_task(step) if isinstance(step, str) else dict(step) for step in steps]
+    if not steps:
+        raise ValueError("A profile needs at least one step")
+    for step in steps:
+        step.pop("cells", None)
+    if repeat < 1:
+        raise ValueError("repeat must be at least 1")
+    return {"name": name or " → ".join(step["task_type"] for step in steps), "steps": steps, "repeat": int(repeat)}
+
+
+class Scheduler:
+    """Acquisition step ``(store, dt)`` running profiles; replaces ``engine.step`` in a loop's steps.
+
+    ``jobs`` maps the task id bound to a profile's cells to its record, a
+    JSON-ready dict that the UI can show. Legacy single tasks started with
+    ``engine.start_task`` keep running, since every cell is stepped; a
+    profile waits for the cells they hold, and callers starting one should
+    check ``held`` first and call ``release`` after stopping one.
+    """
+
+    def __init__(self, step=engine.step):
+        self.step = step
+        self.now = 0.0
+        self.jobs = {}
+        self._seq = 0
+        self._ready = []
+        self._timers = []
+        self._busy = {}
+        self._dependents = {}
+        self._layout = None
+
+    def submit(self, store, task_id, profile, cells, priority=0, after=(), timeout=None):
+        """Queue ``profile`` on ``cells`` (keys) under ``task_id``; starts it as soon as it can.
+
+        Higher ``priority`` profiles claim contested cells first. The profile
+        starts only once every profile in ``after`` has completed, and is
+        cancelled if one of them fails. ``timeout`` stops it after that many
+        seconds of running time.
+        """
+        if task_id in self.jobs:
+            raise KeyError(f"Task id {task_id} is already scheduled")
+        missing = [dep for dep in after if dep not in self.jobs]
+        if missing:
+            raise KeyError(f"Unknown dependencies: {missing}")
+        self.jobs[task_id] = {
+            "name": profile["name"],
+            "steps": profile["steps"],
+            "repeat": profile["repeat"],
+            "cells": list(cells),
+            "priority": priority,
+            "after": list(after),
+            "timeout": timeout,
+            "status": "Blocked",
+            "seq": self._next_seq(),
+            "submitted": self.now,
+            "started": None,
+            "finished": None,
+            "deadline": None,
+            "time_left": timeout,
+            "remaining": 0,
+        }
+        self._unblock(store, task_id)
+        return task_id
+
+    def pause(self, store, task_id):
+        job = self.jobs[task_id]
+        if job["status"] != "Running":
+            return
+        engine.set_active(store, task_id, False)
+        job["status"] = "Paused"
+        if job["deadline"] is not None:
+            job["time_left"] = job["deadline"] - self.now
+            job["deadline"] = None
+
+    def resume(self, store, task_id):
+        job = self.jobs[task_id]
+        if job["status"] != "Paused":
+            return
+        engine.set_active(store, task_id, True)
+        job["status"] = "Running"
+        self._arm(task_id)
+
+    def cancel(self, store, task_id, status="Cancelled"):
+        """Stop a profile, free its cells and cancel the profiles depending on it."""
+        job = self.jobs[task_id]
+        if job["status"] in FINAL:
+            return
+        if job["status"] in ("Running", "Paused"):
+            engine.stop_task(store, task_id)
+        self._finish(store, task_id, status)
+
+    def remove(self, store, task_id):
+        """Cancel a profile if needed and forget it."""
+        self.cancel(store, task_id)
+        del self.jobs[task_id]
+        self._dependents.pop(task_id, None)
+
+    def held(self, cells):
+        """Keys among ``cells`` bound to a running or paused profile."""
+        return [key for key in cells if key in self._busy]
+
+    def release(self, store):
+        """Start queued profiles that were waiting for cells a single task has freed."""
+        if self._ready:
+            self._dispatch(store)
+
+    def progress(self, store, task_id):
+        """Number of cells at each step of the profile's sequence (``steps * repeat`` long)."""
+        job = self.jobs[task_id]
+        rows = np.flatnonzero(store.task_id == task_id)
+        total = len(job["steps"]) * job["repeat"]
+        return np.bincount(store.profile_step[rows], minlength=total)[:total]
+
+    def snapshot(self):
+        """Copy of ``jobs`` for rendering."""
+        return {task_id: dict(job) for task_id, job in self.jobs.items()}
+
+    def __call__(self, store, dt):
+        if self._layout != (id(store), store.version):
+            self._follow(store)
+        finished = self.step(store, dt)
+        self.now += dt
+        if finished is not None and len(finished):
+            self._advance(store, finished)
+        while self._timers and self._timers[0][0] <= self.now:
+            deadline, _, task_id = heapq.heappop(self._timers)
+            job = self.jobs.get(task_id)
+            if job is not None and job["status"] == "Running" and job["deadline"] == deadline:
+                self.cancel(store, task_id, "Timed out")
+        return finished
+
+    def get_state(self):
+        return {
+            "now": self.now,
+            "seq": self._seq,
+            "jobs": [[task_id, job] for task_id, job in self.jobs.items()],
+        }
+
+    def set_state(self, state, store):
+        self.now = state["now"]
+        self._seq = state["seq"]
+        self.jobs = {task_id: job for task_id, job in state["jobs"]}
+        self._ready, self._timers, self._busy, self._dependents = [], [], {}, {}
+        for task_id, job in self.jobs.items():
+            for dep in job["after"]:
+                self._dependents.setdefault(dep, []).append(task_id)
+            if job["status"] == "Queued":
+                heapq.heappush(self._ready, (-job["priority"], job["seq"], task_id))
+            elif job["status"] in ("Running", "Paused"):
+                self._busy.update(dict.fromkeys(job["cells"], task_id))
+                if job["deadline"] is not None:
+                    heapq.heappush(self._timers, (job["deadline"], job["seq"], task_id))
+        self._layout = None
+
+    def _next_seq(self):
+        self._seq += 1
+        return self._seq
+
+    def _unblock(self, store, task_id):
+        job = self.jobs[task_id]
+        deps = [self.jobs[dep]["status"] for dep in job["after"]]
+        if any(status in ("Cancelled", "Timed out") for status in deps):
+            self._finish(store, task_id, "Cancelled")
+            return
+        if any(status != "Completed" for status in deps):
+            for dep in job["after"]:
+                if self.jobs[dep]["status"] != "Completed" and task_id not in self._dependents.get(dep, ()):
+                    self._dependents.setdefault(dep, []).append(task_id)
+            return
+        job["status"] = "Queued"
+        heapq.heappush(self._ready, (-job["priority"], job["seq"], task_id))
+        self._dispatch(store)
+
+    def _dispatch(self, store):
+        """Start queued profiles in priority order; one waiting for cells holds them against lower ones.
+
+        Cells running a single task count as busy too.
+        """
+        claimed = set()
+        waiting = []
+        phase = store.phase
+        taken = (store.task_id != 0) & (phase >= engine.PHASE_CC) & (phase <= engine.PHASE_IDLE)
+        while self._ready:
+            entry = heapq.heappop(self._ready)
+            task_id = entry[2]
+            job = self.jobs.get(task_id)
+            if job is None or job["status"] != "Queued":
+                continue
+            cells = [key for key in job["cells"] if key in store]
+            if any(key in self._busy or key in claimed or taken[store.index(key)] for key in cells):
+                waiting.append(entry)
+                claimed.update(cells)
+            else:
+                self._start(store, task_id, cells)
+        for entry in waiting:
+            heapq.heappush(self._ready, entry)
+
+    def _start(self, store, task_id, cells):
+        job = self.jobs[task_id]
+        rows = np.array([store.index(key) for key in cells], dtype=np.intp)
+        job["status"] = "Running"
+        job["started"] = self.now
+        job["remaining"] = len(rows)
+        if not len(rows):
+            self._finish(store, task_id, "Completed")
+            return
+        self._busy.update(dict.fromkeys(cells, task_id))
+        store.profile_step[rows] = 0
+        engine.start_task(store, rows, task_id, job["steps"][0])
+        self._arm(task_id)
+
+    def _arm(self, task_id):
+        job = self.jobs[task_id]
+        if job["time_left"] is not None:
+            job["deadline"] = self.now + job["time_left"]
+            heapq.heappush(self._timers, (job["deadline"], self._next_seq(), task_id))
+
+    def _advance(self, store, finished):
+        """Move the cells that just finished a step on to their next one."""
+        ids = store.task_id[finished]
+        freed = False
+        for task_id in np.unique(ids).tolist():
+            job = self.jobs.get(task_id)
+            if job is None:
+                freed = True
+                continue
+            if job["status"] != "Running":
+                continue
+            rows = finished[ids == task_id]
+            nxt = store.profile_step[rows] + 1
+            total = len(job["steps"]) * job["repeat"]
+            more = nxt < total
+            for k in np.unique(nxt[more]).tolist():
+                group = rows[more][nxt[more] == k]
+                store.profile_step[group] = k
+                engine.start_task(store, group, task_id, job["steps"][k % len(job["steps"])])
+            job["remaining"] -= int(np.count_nonzero(~more))
+            if job["remaining"] <= 0:
+                self._finish(store, task_id, "Completed")
+        # A single task finishing frees its cells for queued profiles
+        if freed:
+            self.release(store)
+
+    def _finish(self, store, task_id, status):
+        job = self.jobs[task_id]
+        job["status"] = status
+        job["finished"] = self.now
+        job["deadline"] = None
+        for key in job["cells"]:
+            if self._busy.get(key) == task_id:
+                del self._busy[key]
+        for dependent in self._dependents.pop(task_id, ()):
+            if self.jobs.get(dependent, {}).get("status") == "Blocked":
+                self._unblock(store, dependent)
+        self._dispatch(store)
+
+    def _follow(self, store):
+        """Recount the cells left in running profiles after cells were added or removed."""
+        running = (store.phase >= engine.PHASE_CC) & (store.phase <= engine.PHASE_IDLE)
+        counts = np.bincount(store.task_id[running], minlength=1)
+        self._layout = (id(store), store.version)
+        for task_id, job in list(self.jobs.items()):
+            if job["status"] in ("Running", "Paused"):
+                job["remaining"] = int(counts[task_id]) if task_id < len(counts) else 0
+                if not job["remaining"]:
+                    self._finish(store, task_id, "Completed")
@@ -0,0 +1,101 @@
+"""The line protocol spoken between cycler drivers and instruments.
+
+A small SCPI-like dialect: one ASCII command per line, answered by exactly
+one line, so requests can be matched to replies without tags. Channels are
+1-based and addressed with SCPI channel lists such as ``(@1:8,12)``.
+
+    *IDN?                               identification string
+    SYST:CHAN?                          number of channels
+    MEAS:ALL? (@1:4)                    voltage,current,temp,soc for each channel, flattened
+    MEAS:VOLT? (@1:4)                   one measurement (VOLT, CURR, TEMP or SOC) per channel
+    TASK:STAR CC_CV,cc_value=2,(@1:4)   start a task on channels; replies with its task id
+    TASK:PAUS 3 / TASK:RES 3            pause or resume a task
+    TASK:STOP 3                         stop a task and leave its channels idle
+
+Commands without a reply value are answered ``OK``; failures are answered
+``ERR <message>``.
+"""
+import re
+
+import numpy as np
+
+# MEAS:ALL? column order
+MEASUREMENTS = ("voltage", "current", "temp", "soc")
+MEASUREMENT_HEADERS = {"VOLT": "voltage", "CURR": "current", "TEMP": "temp", "SOC": "soc"}
+
+_CHANNEL_LIST = re.compile(r"\(@([0-9:,\s]*)\)")
+
+
+class ProtocolError(ValueError):
+    """A malformed command or reply."""
+
+
+def format_channels(channels):
+    """SCPI channel list for 1-based ``channels``, with runs collapsed to ``a:b``."""
+    channels = sorted(set(int(c) for c in channels))
+    parts = []
+    start = prev = None
+    for channel in channels + [None]:
+        if start is not None and channel == prev + 1:
+            prev = channel
+            continue
+        if start is not None:
+            parts.append(str(start) if start == prev else f"{start}:{prev}")
+        start = prev = channel
+    return f"(@{','.join(parts)})"
+
+
+def parse_channels(text):
+    """Channel numbers of the first channel list in ``text``, in the order given."""
+    match = _CHANNEL_LIST.search(text)
+    if match is None:
+        raise ProtocolError("Missing channel list")
+    channels = []
+    for part in filter(None, (p.strip() for p in match.group(1).split(","))):
+        if ":" in part:
+            lo, hi = (int(x) for x in part.split(":"))
+            channels.extend(range(lo, hi + 1))
+        else:
+            channels.append(int(part))
+    return np.array(channels, dtype=np.intp)
+
+
+def split_command(line):
+    """``(header, arguments)`` of a command line; the header is upper-cased."""
+    header, _, arguments = line.strip().partition(" ")
+    return header.upper(), arguments.strip()
+
+
+def parse_task(arguments):
+    """``(task_type, params)`` from ``CC_CV,cc_value=2,duration=60,(@1:4)``."""
+    head = _CHANNEL_LIST.sub("", arguments)
+    fields = [f.strip() for f in head.split(",") if f.strip()]
+    if not fields:
+        raise ProtocolError("Missing task type")
+    params = {}
+    for field in fields[1:]:
+        name, sep, value = field.partition("=")
+        if not sep:
+            raise ProtocolError(f"Expected name=value, got {field!r}")
+        params[name.strip()] = float(value)
+    return fields[0].upper(), params
+
+
+def format_task(task_type, params, channels):
+    settings = "".join(f",{name}={value:g}" for name, value in params.items())
+    return f"TASK:STAR {task_type}{settings},{format_channels(channels)}"
+
+
+def format_values(values):
+    return ",".join(f"{v:.6g}" for v in np.asarray(values, dtype=np.float64).ravel())
+
+
+def parse_values(reply, columns=1):
+    """Numeric reply as a ``(channels, columns)`` array."""
+    try:
+        values = np.array(reply.split(","), dtype=np.float64) if reply else np.empty(0)
+    except ValueError:
+        raise ProtocolError(f"Non-numeric reply {reply[:40]!r}") from None
+    if values.size % columns:
+        raise ProtocolError(f"Reply of {values.size} values does not split into {columns} columns")
+    return values.reshape(-1, columns)
@@ -0,0 +1,59 @@
+"""Filtering and pagination for the cell status table.
+
+``select_cells`` starts from the rows the store's secondary indexes hold for
+the chosen types and groups, then narrows those candidates with the search
+box, status and range filters, so a narrow filter never scans the whole
+bench. ``status_frame`` then builds a DataFrame for just the visible page,
+keeping numeric columns numeric so the table can format them client-side
+instead of shipping pre-formatted strings or per-cell styles.
+"""
+import numpy as np
+import pandas as pd
+
+from bms.chemistry import CELL_TYPES
+
+STATUS_ICONS = {"normal": "🟢", "warning": "🟡", "critical": "🔴"}
+
+
+def select_cells(store, ruleset, search="", types=(), statuses=(), ranges=None, groups=()):
+    """Row indices of the cells passing every filter, ordered by cell id."""
+    rows = np.arange(len(store))
+    if types:
+        rows = store.rows_where("type_code", *(CELL_TYPES.index(t) for t in types))
+    if groups:
+        rows = np.intersect1d(rows, store.rows_where("group", *groups), assume_unique=True)
+    if search:
+        keys = np.char.lower(np.asarray(store.registry.keys, dtype=object)[rows].astype(str))
+        rows = rows[np.char.find(keys, search.strip().lower()) >= 0]
+    if statuses:
+        labels = ruleset.labels.tolist()
+        rows = rows[np.isin(ruleset.status_codes(store.alarms[rows]), [labels.index(s) for s in statuses])]
+    for field, (lo, hi) in (ranges or {}).items():
+        values = getattr(store, field)[rows]
+        rows = rows[(values >= lo) & (values <= hi)]
+    return rows[np.argsort(store.cell_id[rows], kind="stable")]
+
+
+def page_count(rows, page_size):
+    return max(1, -(-rows // page_size))
+
+
+def status_frame(store, indices, ruleset, capacity_unit="Ah"):
+    """Numeric status table for the cells at ``indices``."""
+    labels = ruleset.statuses(store.alarms[indices])
+    icons = np.array([STATUS_ICONS[ruleset.severities[label]] for label in ruleset.labels])
+    codes = ruleset.status_codes(store.alarms[indices])
+    return pd.DataFrame({
+        "Cell ID": np.asarray(store.keys, dtype=object)[indices],
+        "Type": np.char.upper(store.types[indices]),
+        "Group": store.group[indices],
+        "Voltage (V)": store.voltage[indices],
+        "Current (A)": store.current[indices],
+        "Temperature (°C)": store.temp[indices],
+        f"Capacity ({capacity_unit})": store.capacity[indices],
+        "SOC (%)": store.soc_est[indices] * 100,
+        "Health (%)": store.health[indices],
+        "Cycles": store.cycles[indices],
+        "State": store.statuses[indices],
+        "Status": np.char.add(np.char.add(icons[codes], " "), labels),
+    })
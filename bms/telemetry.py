@@ -0,0 +1,191 @@
+"""Append-only on-disk telemetry store with memory-mapped reads.
+
+Samples are partitioned by bench, group and time chunk::
+
+    <root>/<bench>/group_<n>/<chunk>/
+        meta.json        cell keys, chemistries, channel dtypes
+        time.bin         float64 sample timestamps
+        <channel>.bin    one fixed-width row of cells per sample
+
+Columns are raw native-endian arrays, so readers map them with ``np.memmap``
+and chart hours of history without loading it into RAM. A writer starts a new
+chunk when the current one spans ``chunk_seconds`` or the bench's cells
+change, so every chunk has a fixed row width. Nothing is ever rewritten;
+data written before a restart stays readable next to the new chunks.
+"""
+import json
+import os
+import re
+import uuid
+
+import numpy as np
+
+DEFAULT_ROOT = os.environ.get("BMS_TELEMETRY_DIR", "telemetry")
+
+CHANNELS = ("voltage", "current", "temp", "soc", "health")
+
+
+def safe_name(bench_name):
+    """``bench_name`` reduced to characters that are safe in a file name."""
+    name = re.sub(r"[^A-Za-z0-9._-]+", "_", bench_name).strip("_.")
+    return name or "bench"
+
+
+def partition_path(root, bench_name, group_number):
+    return os.path.join(root, safe_name(bench_name), f"group_{int(group_number)}")
+
+
+class TelemetryWriter:
+    """Sink appending every acquired sample of one bench to disk."""
+
+    def __init__(self, root, bench_name, group_number, channels=CHANNELS, chunk_seconds=3600.0,
+                 dtype=np.float32, flush_every=50):
+        self.path = partition_path(root, bench_name, group_number)
+        self.bench_name = bench_name
+        self.group_number = int(group_number)
+        self.channels = tuple(channels)
+        self.chunk_seconds = chunk_seconds
+        self.dtype = np.dtype(dtype)
+        self.flush_every = flush_every
+        self.chunk_path = None
+        self._files = {}
+        self._layout = None
+        self._chunk_start = None
+        self._pending = 0
+
+    def append(self, store, t):
+        """Write one sample of ``store`` taken at time ``t``."""
+        if not len(store):
+            return
+        if (self._layout != (id(store), store.version)
+                or t - self._chunk_start >= self.chunk_seconds):
+            self._open_chunk(store, t)
+        for name in self.channels:
+            self._files[name].write(getattr(store, name).astype(self.dtype))
+        # The timestamp goes last: a row only counts once its time is on disk
+        self._files["time"].write(np.float64(t).tobytes())
+        self._pending += 1
+        if self._pending >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        for f in self._files.values():
+            f.flush()
+        self._pending = 0
+
+    def close(self):
+        for f in self._files.values():
+            f.close()
+        self._files = {}
+        self._layout = None
+
+    def _open_chunk(self, store, t):
+        self.close()
+        self.chunk_path = os.path.join(self.path, f"{int(t * 1000):015d}-{uuid.uuid4().hex[:8]}")
+        os.makedirs(self.chunk_path)
+        meta = {
+            "version": 1,
+            "bench_name": self.bench_name,
+            "group_number": self.group_number,
+            "start": t,
+            "keys": store.keys,
+            "types": store.types.tolist(),
+            "channels": {name: self.dtype.str for name in self.channels},
+        }
+        with open(os.path.join(self.chunk_path, "meta.json"), "w") as f:
+            json.dump(meta, f)
+        self._files = {name: open(os.path.join(self.chunk_path, f"{name}.bin"), "ab")
+                       for name in ("time",) + self.channels}
+        self._layout = (id(store), store.version)
+        self._chunk_start = t
+
+
+class TelemetryChunk:
+    """Read-only, memory-mapped view of one chunk directory."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        self.keys = self.meta["keys"]
+        self.types = self.meta["types"]
+        self.channels = {name: np.dtype(dtype) for name, dtype in self.meta["channels"].items()}
+
+        # Rows whose timestamp and every column are fully on disk
+        rows = os.path.getsize(self._file("time")) // 8
+        width = max(len(self.keys), 1)
+        for name, dtype in self.channels.items():
+            rows = min(rows, os.path.getsize(self._file(name)) // (width * dtype.itemsize))
+        self.rows = rows
+        self.times = self._map("time", np.dtype(np.float64), (rows,))
+
+    @property
+    def start(self):
+        return self.times[0] if self.rows else self.meta["start"]
+
+    @property
+    def end(self):
+        return self.times[-1] if self.rows else self.meta["start"]
+
+    def column(self, name):
+        """Memory-mapped ``(samples, cells)`` array of one channel."""
+        return self._map(name, self.channels[name], (self.rows, len(self.keys)))
+
+    def _file(self, name):
+        return os.path.join(self.path, f"{name}.bin")
+
+    def _map(self, name, dtype, shape):
+        if not self.rows or not shape[-1]:
+            return np.empty(shape, dtype)
+        return np.memmap(self._file(name), dtype=dtype, mode="r", shape=shape)
+
+
+def list_partitions(root=DEFAULT_ROOT):
+    """All ``(bench, group_number)`` partitions found under ``root``."""
+    partitions = []
+    if not os.path.isdir(root):
+        return partitions
+    for bench in sorted(os.listdir(root)):
+        for group in sorted(os.listdir(os.path.join(root, bench))):
+            if group.startswith("group_"):
+                partitions.append((bench, int(group[len("group_"):])))
+    return partitions
+
+
+def open_chunks(root, bench_name, group_number, start=None, end=None):
+    """Chunks of one partition overlapping ``[start, end]``, oldest first."""
+    path = partition_path(root, bench_name, group_number)
+    if not os.path.isdir(path):
+        return []
+    chunks = []
+    for name in sorted(os.listdir(path)):
+        if not os.path.exists(os.path.join(path, name, "meta.json")):
+            continue
+        chunk = TelemetryChunk(os.path.join(path, name))
+        if start is not None and chunk.rows and chunk.end < start:
+            continue
+        if end is not None and chunk.start > end:
+            continue
+        chunks.append(chunk)
+    return chunks
+
+
+def load_channel(root, bench_name, group_number, channel, start=None, end=None, max_points=2000):
+    """Decimated ``(times, keys, values)`` per chunk of one channel.
+
+    Only every n-th row inside ``[start, end]`` is read from the memory maps,
+    so the result stays around ``max_points`` samples however long the range.
+    """
+    spans = []
+    for chunk in open_chunks(root, bench_name, group_number, start, end):
+        lo = 0 if start is None else np.searchsorted(chunk.times, start)
+        hi = chunk.rows if end is None else np.searchsorted(chunk.times, end, side="right")
+        if hi > lo:
+            spans.append((chunk, lo, hi))
+
+    total = sum(hi - lo for _, lo, hi in spans)
+    stride = max(1, -(-total // max_points))
+    return [
+        (np.array(chunk.times[lo:hi:stride]), chunk.keys, np.array(chunk.column(channel)[lo:hi:stride]))
+        for chunk, lo, hi in spans
+    ]
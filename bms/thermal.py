@@ -0,0 +1,195 @@
+"""Lumped thermal model of a bench, coupled through a sparse conductance matrix.
+
+Every cell is one thermal mass (``heat_capacity`` of ``bms.chemistry.THERMAL_PARAMS``)
+heated by its own losses, ``current**2 * r0`` in the ohmic resistance plus
+``v_rc**2 / r1`` in the RC pair of the equivalent circuit. Cells are laid out
+in a grid per group, in cell id order, and each conducts heat to the cells
+beside it (``contact`` W/K) and to the ambient air (``cooling`` W/K, plus
+``edge_cooling`` per side without a neighbour). With ``G`` the resulting
+conductance matrix, temperatures follow::
+
+    C dT/dt = G @ T + cooling * ambient + heat
+
+``G`` only changes when cells are added or removed, so it is built once per
+bench layout as a ``SparseMatrix`` and a tick is one sparse matrix-vector
+product, O(cells). The explicit update is split into substeps only when
+``dt`` is too long for it to stay monotone, which takes several minutes.
+
+A cell reaching its ``onset`` temperature goes into thermal runaway and
+releases ``runaway_heat`` (scaled by its SOC, with ``RESIDUAL`` of it even
+when empty) over ``burn_seconds``; its neighbours heat up in turn, so
+runaway can propagate through a pack.
+"""
+import numpy as np
+
+from bms.chemistry import HEAT_CAPACITY, ONSET, R0, R1, RUNAWAY_HEAT
+
+# Share of runaway_heat released by an empty cell
+RESIDUAL = 0.25
+
+
+class SparseMatrix:
+    """Square matrix in compressed sparse row form."""
+
+    def __init__(self, indptr, indices, data):
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self._rows = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+
+    @classmethod
+    def from_entries(cls, n, rows, cols, values):
+        """``n x n`` matrix with ``values`` at ``(rows, cols)``; repeated entries are summed."""
+        rows, cols = np.asarray(rows, dtype=np.intp), np.asarray(cols, dtype=np.intp)
+        flat, inverse = np.unique(rows * n + cols, return_inverse=True)
+        data = np.bincount(inverse, values, minlength=len(flat))
+        indptr = np.zeros(n + 1, dtype=np.intp)
+        np.cumsum(np.bincount(flat // n, minlength=n), out=indptr[1:])
+        return cls(indptr, flat % n, data)
+
+    def __len__(self):
+        return len(self.indptr) - 1
+
+    @property
+    def nnz(self):
+        return len(self.data)
+
+    def diagonal(self):
+        diagonal = np.zeros(len(self))
+        on = self.indices == self._rows
+        diagonal[self._rows[on]] = self.data[on]
+        return diagonal
+
+    def __matmul__(self, x):
+        return np.bincount(self._rows, self.data * x[self.indices], minlength=len(self))
+
+
+def grid_neighbours(group, cell_id, columns=None):
+    """``(a, b)`` rows of cells side by side, each group laid out in rows of ``columns``.
+
+    Cells are placed in cell id order; without ``columns`` every group is as
+    close to square as its size allows.
+    """
+    n = len(group)
+    if not n:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+    order = np.lexsort((cell_id, group))
+    sorted_group = group[order]
+    starts = np.flatnonzero(np.r_[True, sorted_group[1:] != sorted_group[:-1]])
+    sizes = np.diff(np.r_[starts, n])
+    widths = np.full(len(sizes), columns) if columns else np.ceil(np.sqrt(sizes)).astype(np.intp)
+    size, width = np.repeat(sizes, sizes), np.repeat(widths, sizes)
+    position = np.arange(n) - np.repeat(starts, sizes)
+    right = np.flatnonzero(((position + 1) % width != 0) & (position + 1 < size))
+    below = np.flatnonzero(position + width < size)
+    a = np.concatenate([order[right], order[below]])
+    b = np.concatenate([order[right + 1], order[below + width[below]]])
+    return a, b
+
+
+class ThermalModel:
+    """Acquisition step ``(store, dt)`` updating ``temp`` from losses and conduction.
+
+    Runaway progress follows cells being added or removed, and is reset when
+    the store is replaced.
+    """
+
+    def __init__(self, ambient=25.0, contact=2.0, cooling=0.5, edge_cooling=0.5, columns=None, burn_seconds=30.0):
+        self.ambient = ambient
+        self.contact = contact
+        self.cooling = cooling
+        self.edge_cooling = edge_cooling
+        self.columns = columns
+        self.burn_seconds = burn_seconds
+        self.keys = []
+        self._layout = None
+        self._store_id = None
+        self.conductance = SparseMatrix.from_entries(0, [], [], [])
+        self.sink = np.empty(0)
+        self.budget = np.empty(0)
+        self.released = np.empty(0)
+        self._stiffness = 0.0
+
+    @property
+    def burning(self):
+        return self.released < self.budget
+
+    @property
+    def vented(self):
+        return (self.budget > 0) & (self.released >= self.budget)
+
+    def __call__(self, store, dt):
+        if self._layout != (id(store), store.version):
+            self._follow(store)
+        if not len(store):
+            return
+        tc = store.type_code
+        temp = store.temp
+        heat = store.current ** 2 * R0[tc] + store.v_rc ** 2 / R1[tc]
+
+        # Cells reaching onset commit the heat their charge holds, then burn it off
+        onset = (self.budget == 0) & (temp >= ONSET[tc])
+        if onset.any():
+            self.budget[onset] = RUNAWAY_HEAT[tc[onset]] * (RESIDUAL + (1.0 - RESIDUAL) * store.soc[onset])
+        burning = np.flatnonzero(self.burning)
+        if burning.size:
+            burst = np.minimum(self.budget[burning] / self.burn_seconds * dt,
+                               self.budget[burning] - self.released[burning])
+            self.released[burning] += burst
+            heat[burning] += burst / dt
+
+        substeps = max(int(np.ceil(dt * self._stiffness)), 1)
+        h = dt / substeps
+        source = self.sink * self.ambient + heat
+        scale = h / HEAT_CAPACITY[tc]
+        for _ in range(substeps):
+            temp = temp + scale * (self.conductance @ temp + source)
+        store.write("temp", temp)
+
+    def ignite(self, store, rows):
+        """Force ``rows`` into thermal runaway, as a nail or an internal short would."""
+        if self._layout != (id(store), store.version):
+            self._follow(store)
+        rows = np.asarray(rows, dtype=np.intp)
+        store.write("temp", np.maximum(store.temp[rows], ONSET[store.type_code[rows]]), rows)
+
+    def get_state(self):
+        return {"keys": self.keys, "budget": self.budget, "released": self.released}
+
+    def set_state(self, state, store):
+        """Resume from ``get_state`` output; the next tick re-maps it onto ``store`` by key."""
+        self.budget = state["budget"]
+        self.released = state["released"]
+        self.keys = list(state["keys"])
+        self._store_id = id(store)
+        self._layout = None
+
+    def _follow(self, store):
+        """Rebuild the conductance matrix and re-map runaway state for the current cells."""
+        new_keys = store.keys
+        if self._store_id == id(store):
+            rows = {key: i for i, key in enumerate(self.keys)}
+            src = np.array([rows.get(key, -1) for key in new_keys], dtype=np.intp)
+        else:
+            src = np.full(len(new_keys), -1, dtype=np.intp)
+        kept = src >= 0
+        n = len(new_keys)
+        budget, released = np.zeros(n), np.zeros(n)
+        budget[kept] = self.budget[src[kept]]
+        released[kept] = self.released[src[kept]]
+        self.budget, self.released = budget, released
+
+        a, b = grid_neighbours(store.group, store.cell_id, self.columns)
+        neighbours = np.bincount(np.r_[a, b], minlength=n)
+        self.sink = self.cooling + self.edge_cooling * np.maximum(4 - neighbours, 0)
+        diagonal = -(self.contact * neighbours + self.sink)
+        rows = np.r_[a, b, np.arange(n)]
+        cols = np.r_[b, a, np.arange(n)]
+        values = np.r_[np.full(2 * len(a), self.contact), diagonal]
+        self.conductance = SparseMatrix.from_entries(n, rows, cols, values)
+        # Substeps per second that keep the explicit update monotone
+        self._stiffness = float(np.max(-diagonal / HEAT_CAPACITY[store.type_code], initial=0.0))
+
+        self.keys = new_keys
+        self._store_id = id(store)
+        self._layout = (id(store), store.version)
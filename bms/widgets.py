@@ -0,0 +1,90 @@
+"""Streamlit widgets shared by both dashboards."""
+import numpy as np
+import streamlit as st
+
+from bms.chemistry import CELL_TYPES
+from bms.profiling import QUANTILES
+from bms.table import page_count, select_cells, status_frame
+
+PAGE_SIZES = (25, 50, 100, 250)
+
+# Temperature slider bounds; a handle left at a bound does not limit that side
+TEMP_BOUNDS = (0.0, 80.0)
+
+
+def cell_table(cells, ruleset, key, capacity_unit="Ah", cell_types=CELL_TYPES):
+    """Filterable, paginated status table; returns the visible row indices.
+
+    Only the current page is turned into a DataFrame, so the cost of a
+    rerun does not grow with the size of the bench.
+    """
+    col_search, col_type, col_group, col_status, col_temp = st.columns(5)
+    search = col_search.text_input("🔍 Search", key=f"{key}_search")
+    types = col_type.multiselect("Type", cell_types, key=f"{key}_types")
+    groups = col_group.multiselect("Group", list(cells.counts("group")), key=f"{key}_groups")
+    statuses = col_status.multiselect("Status", ruleset.labels.tolist(), key=f"{key}_statuses")
+    lo, hi = col_temp.slider("Temperature (°C)", *TEMP_BOUNDS, TEMP_BOUNDS, key=f"{key}_temp")
+    ranges = {}
+    if (lo, hi) != TEMP_BOUNDS:
+        ranges["temp"] = (-np.inf if lo == TEMP_BOUNDS[0] else lo, np.inf if hi == TEMP_BOUNDS[1] else hi)
+
+    indices = select_cells(cells, ruleset, search, types, statuses, ranges, groups)
+
+    col_size, col_page, col_count = st.columns([1, 1, 2])
+    page_size = col_size.selectbox("Rows per page", PAGE_SIZES, key=f"{key}_page_size")
+    pages = page_count(len(indices), page_size)
+    if st.session_state.get(f"{key}_page", 1) > pages:
+        st.session_state[f"{key}_page"] = pages
+    page = col_page.number_input("Page", min_value=1, max_value=pages, value=1, key=f"{key}_page")
+    col_count.caption(f"Showing {len(indices)} of {len(cells)} cells · page {page} of {pages}")
+
+    visible = indices[(page - 1) * page_size:page * page_size]
+    st.dataframe(
+        status_frame(cells, visible, ruleset, capacity_unit),
+        column_config={
+            "Voltage (V)": st.column_config.NumberColumn(format="%.2f"),
+            "Current (A)": st.column_config.NumberColumn(format="%.2f"),
+            "Temperature (°C)": st.column_config.NumberColumn(format="%.1f"),
+            f"Capacity ({capacity_unit})": st.column_config.NumberColumn(format="%.2f"),
+            "SOC (%)": st.column_config.ProgressColumn(format="%.1f", min_value=0, max_value=100),
+            "Health (%)": st.column_config.ProgressColumn(format="%.1f", min_value=0, max_value=100),
+        },
+        use_container_width=True,
+        hide_index=True
+    )
+    return visible
+
+
+def profiler_panel(profiler, key):
+    """Developer panel: rolling p50/p95/p99 per section plus JSON/Prometheus downloads."""
+    st.markdown("## 🛠️ Profiler")
+    col_alloc, col_reset = st.columns([3, 1])
+    track = col_alloc.toggle("Track allocations (tracemalloc, slows reruns)",
+                             value=profiler.tracking_allocations, key=f"{key}_allocations")
+    profiler.track_allocations(track)
+    if col_reset.button("♻️ Reset", key=f"{key}_reset"):
+        profiler.reset()
+
+    rows = profiler.summary()
+    if not rows:
+        st.info("No sections recorded yet.")
+        return
+    columns = {"section": "Section", "count": "Runs"}
+    for q in QUANTILES:
+        columns[f"p{q}_ms"] = f"p{q} (ms)"
+    for q in QUANTILES:
+        columns[f"p{q}_kb"] = f"p{q} (kB)"
+    st.dataframe(
+        [{label: row[name] for name, label in columns.items()} for row in rows],
+        column_config={label: st.column_config.NumberColumn(format="%.2f")
+                       for name, label in columns.items() if name.startswith("p")},
+        use_container_width=True,
+        hide_index=True
+    )
+    st.caption(f"Percentiles over the last {profiler.window} runs of each section")
+
+    col_json, col_prom = st.columns(2)
+    col_json.download_button("📄 Download JSON", profiler.to_json(), file_name="profile.json",
+                             mime="application/json", key=f"{key}_json")
+    col_prom.download_button("📈 Download Prometheus", profiler.to_prometheus(), file_name="profile.prom",
+                             mime="text/plain", key=f"{key}_prometheus")
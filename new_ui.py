@@ -1,13 +1,26 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import plotly.graph_objects as go
-import plotly.express as px
 from plotly.subplots import make_subplots
-import random
 import time
 from datetime import datetime, timedelta
 
+from bms import CELL_SPECS, CELL_TYPES, CellStore, engine
+from bms.acquisition import AcquisitionLoop
+from bms.aging import AgingModel
+from bms.checkpoint import DEFAULT_ROOT as CHECKPOINT_ROOT, checkpoint_path
+from bms.estimation import SocEstimator
+from bms.figures import FigureCache
+from bms.history import HistoryBuffer
+from bms.integrator import AdaptiveStep
+from bms.noise import NoiseModel, Uniform
+from bms.profiling import Profiler
+from bms.rules import DEFAULT_RULESET
+from bms.scheduler import FINAL, Scheduler, make_profile
+from bms.telemetry import DEFAULT_ROOT, TelemetryWriter
+from bms.thermal import ThermalModel
+from bms.widgets import cell_table, profiler_panel
+
 # Page configuration
 st.set_page_config(
     page_title="⚡ Battery Management System",
@@ -69,15 +82,166 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+
+
+# Perturbations applied by "Refresh Data", all cells in one vectorized update
+REFRESH_NOISE = {
+    "voltage": Uniform(-0.1, 0.1),
+}
+
+
+@st.cache_resource
+def get_refresh_noise():
+    # Seeded once per server so a run can be replayed
+    return NoiseModel(REFRESH_NOISE)
+
+
+@st.cache_resource
+def get_profiler():
+    # Section timings of every session and of the simulation ticks
+    return Profiler()
+
+
+@st.cache_resource(on_release=AcquisitionLoop.stop)
+def get_acquisition():
+    # One long-lived producer for the bench, shared by every session
+    scheduler = Scheduler(step=AdaptiveStep())
+    thermal = ThermalModel()
+    steps = (scheduler, thermal, AgingModel(), SocEstimator(), DEFAULT_RULESET)
+    # Only voltage history is plotted, so the buffer spends its memory on that alone
+    loop = AcquisitionLoop(CellStore(), steps=steps, history=HistoryBuffer(channels=("voltage",)))
+    loop.components["scheduler"] = scheduler
+    loop.components["thermal"] = thermal
+    loop.profiler = get_profiler()
+    loop.steps.append(lambda store, dt: engine.sync_task_status(store, loop.tasks))
+    loop.set_telemetry(TelemetryWriter(DEFAULT_ROOT, "Battery Management System", 1))
+    # Resume cells, tasks and noise where the last server left them
+    loop.components["refresh_noise"] = get_refresh_noise()
+    path = checkpoint_path(CHECKPOINT_ROOT, "Battery Management System", 1)
+    loop.restore_checkpoint(path)
+    loop.set_checkpoint(path)
+    return loop.start()
+
+
+MODE_SECTIONS = {
+    "🔋 Cell Management": "mode.cell_management",
+    "📋 Task Configuration": "mode.task_configuration",
+    "📊 Real-time Monitoring": "mode.monitoring",
+    "📈 Analytics": "mode.analytics",
+}
+
+
+# Commands, run one at a time on the acquisition thread via acquisition.submit
+def add_cells(loop, cell_types, group=0):
+    cells = loop.store
+    for cell_type in cell_types:
+        cell_id = cells.next_id
+        cell_key = f"cell_{cell_id}_{cell_type}"
+        
+        # Cell specifications based on type
+        spec = CELL_SPECS[cell_type]
+        
+        cells.add(
+            cell_key,
+            cell_type,
+            voltage=spec["voltage"],
+            current=0.0,
+            temp=loop.components["thermal"].ambient,
+            capacity=spec["capacity"],
+            min_voltage=spec["min_v"],
+            max_voltage=spec["max_v"],
+            group=group,
+            status="Idle"
+        )
+
+
+def remove_cell(loop, cell_key):
+    if cell_key in loop.store:
+        loop.store.remove(cell_key)
+
+
+def create_task(loop, task_data):
+    task_key = f"task_{loop.next_task_id}"
+    loop.next_task_id += 1
+    loop.tasks[task_key] = task_data
+    return task_key
+
+
+def start_task(loop, task_key):
+    task_data = loop.tasks[task_key]
+    task_id = engine.task_id_from_key(task_key)
+    if task_data["status"] == "Paused":
+        engine.set_active(loop.store, task_id, True)
+    else:
+        held = loop.components["scheduler"].held(task_data["cells"])
+        if held:
+            raise ValueError(f"Cells {', '.join(held)} are running a test profile")
+        indices = [loop.store.index(key) for key in task_data["cells"] if key in loop.store]
+        engine.start_task(loop.store, indices, task_id, task_data)
+    task_data["status"] = "Running"
+
+
+def pause_task(loop, task_key):
+    engine.set_active(loop.store, engine.task_id_from_key(task_key), False)
+    loop.tasks[task_key]["status"] = "Paused"
+
+
+def delete_task(loop, task_key):
+    engine.stop_task(loop.store, engine.task_id_from_key(task_key))
+    loop.tasks.pop(task_key, None)
+    # Profiles queued behind the task's cells can start now
+    loop.components["scheduler"].release(loop.store)
+
+
+def create_profile(loop, profile, cell_keys, priority, after, timeout):
+    task_id = loop.next_task_id
+    loop.next_task_id += 1
+    return loop.components["scheduler"].submit(loop.store, task_id, profile, cell_keys, priority, after, timeout)
+
+
+def pause_profile(loop, task_id):
+    loop.components["scheduler"].pause(loop.store, task_id)
+
+
+def resume_profile(loop, task_id):
+    loop.components["scheduler"].resume(loop.store, task_id)
+
+
+def delete_profile(loop, task_id):
+    loop.components["scheduler"].remove(loop.store, task_id)
+
+
+def ignite_cell(loop, cell_key):
+    if cell_key in loop.store:
+        loop.components["thermal"].ignite(loop.store, [loop.store.index(cell_key)])
+
+
+def refresh_data(loop, refresh_noise):
+    # Update cell data with random variations
+    refresh_noise(loop.store)
+
+
+def set_sample_rate(loop, rate):
+    loop.sample_rate = rate
+
+
 # Initialize session state
-if 'cells_data' not in st.session_state:
-    st.session_state.cells_data = {}
-if 'tasks_data' not in st.session_state:
-    st.session_state.tasks_data = {}
 if 'monitoring' not in st.session_state:
     st.session_state.monitoring = False
-if 'history' not in st.session_state:
-    st.session_state.history = []
+if 'figures' not in st.session_state:
+    st.session_state.figures = FigureCache()
+
+figures = st.session_state.figures
+profiler = get_profiler()
+
+# Every session renders the same shared snapshot; changes are submitted as commands
+acquisition = get_acquisition()
+refresh_noise = get_refresh_noise()
+cells = acquisition.snapshot()
+tasks_data = acquisition.task_snapshot()
+scheduler = acquisition.components["scheduler"]
+with acquisition.lock:
+    profiles_data = scheduler.snapshot()
 
 # Header
 st.markdown("""
@@ -86,404 +250,511 @@ st.markdown("""
     <p>Monitor, Control & Optimize Your Battery Cells</p>
 </div>
 """, unsafe_allow_html=True)
+if acquisition.error is not None:
+    st.error(f"⚠️ Acquisition tick failed ({acquisition.errors} times): {acquisition.error!r}")
 
 # Sidebar
-with st.sidebar:
+with st.sidebar, profiler.section("sidebar"):
     st.markdown("### 🎛️ Control Panel")
     
     # Mode selection
     mode = st.selectbox(
         "Select Operation Mode",
-        ["🔋 Cell Management", "📋 Task Configuration", "📊 Real-time Monitoring", "📈 Analytics"]
+        list(MODE_SECTIONS)
+    )
+    
+    st.slider(
+        "Sample Rate (Hz)", 1, 50, int(acquisition.sample_rate), key="sample_rate",
+        on_change=lambda: acquisition.submit(set_sample_rate, st.session_state.sample_rate)
     )
     
     st.markdown("---")
     
     # Quick stats if cells exist
-    if st.session_state.cells_data:
+    if cells:
         st.markdown("### ⚡ Quick Stats")
-        total_cells = len(st.session_state.cells_data)
-        avg_temp = np.mean([cell['temp'] for cell in st.session_state.cells_data.values()])
-        avg_voltage = np.mean([cell['voltage'] for cell in st.session_state.cells_data.values()])
+        total_cells = len(cells)
+        avg_temp = cells.stats.mean("temp")
+        avg_voltage = cells.stats.mean("voltage")
         
         st.metric("Total Cells", total_cells)
         st.metric("Avg Temperature", f"{avg_temp:.1f}°C")
         st.metric("Avg Voltage", f"{avg_voltage:.1f}V")
+    
+    st.markdown("---")
+    st.caption(f"🎲 Noise seed {refresh_noise.seed} · replay with BMS_NOISE_SEED={refresh_noise.seed}")
+    st.toggle("🛠️ Show Profiler", key="developer_panel")
+    # Chart payloads are only serialized for the profiler
+    figures.measure = st.session_state.developer_panel
 
 # Main content based on mode
-if mode == "🔋 Cell Management":
-    st.markdown("## 🔋 Battery Cell Configuration")
-    
-    col1, col2 = st.columns([1, 2])
-    
-    with col1:
-        st.markdown("### Add New Cells")
+with profiler.section(MODE_SECTIONS[mode]):
+    if mode == "🔋 Cell Management":
+        st.markdown("## 🔋 Battery Cell Configuration")
         
-        with st.form("cell_form"):
-            num_cells = st.number_input("Number of cells to add", min_value=1, max_value=20, value=1)
-            cell_types = []
-            
-            for i in range(num_cells):
-                cell_type = st.selectbox(
-                    f"Cell {i+1} type", 
-                    ["lfp", "li-ion", "nmc", "lto"],
-                    key=f"cell_type_{i}"
-                )
-                cell_types.append(cell_type)
-            
-            submitted = st.form_submit_button("🔋 Add Cells", use_container_width=True)
+        col1, col2 = st.columns([1, 2])
+        
+        with col1:
+            st.markdown("### Add New Cells")
             
-            if submitted:
-                for i, cell_type in enumerate(cell_types):
-                    cell_id = len(st.session_state.cells_data) + 1
-                    cell_key = f"cell_{cell_id}_{cell_type}"
-                    
-                    # Cell specifications based on type
-                    specs = {
-                        "lfp": {"voltage": 3.2, "min_v": 2.8, "max_v": 3.6, "capacity": 100},
-                        "li-ion": {"voltage": 3.7, "min_v": 3.2, "max_v": 4.2, "capacity": 120},
-                        "nmc": {"voltage": 3.6, "min_v": 3.0, "max_v": 4.0, "capacity": 110},
-                        "lto": {"voltage": 2.4, "min_v": 1.5, "max_v": 2.8, "capacity": 80}
-                    }
-                    
-                    spec = specs[cell_type]
-                    
-                    st.session_state.cells_data[cell_key] = {
-                        "type": cell_type,
-                        "voltage": spec["voltage"],
-                        "current": round(random.uniform(0, 5), 2),
-                        "temp": round(random.uniform(25, 40), 1),
-                        "capacity": spec["capacity"],
-                        "min_voltage": spec["min_v"],
-                        "max_voltage": spec["max_v"],
-                        "health": round(random.uniform(85, 100), 1),
-                        "cycles": random.randint(0, 1000),
-                        "status": random.choice(["Charging", "Discharging", "Idle"])
-                    }
+            with st.form("cell_form"):
+                num_cells = st.number_input("Number of cells to add", min_value=1, max_value=20, value=1)
+                group = st.number_input("Group", min_value=0, max_value=99, value=0)
+                cell_types = []
                 
-                st.success(f"✅ Added {num_cells} cell(s) successfully!")
-                st.rerun()
-    
-    with col2:
-        st.markdown("### 🔋 Cell Overview")
+                for i in range(num_cells):
+                    cell_type = st.selectbox(
+                        f"Cell {i+1} type", 
+                        ["lfp", "li-ion", "nmc", "lto"],
+                        key=f"cell_type_{i}"
+                    )
+                    cell_types.append(cell_type)
+                
+                submitted = st.form_submit_button("🔋 Add Cells", use_container_width=True)
+                
+                if submitted:
+                    acquisition.submit(add_cells, cell_types, group)
+                    
+                    st.success(f"✅ Added {num_cells} cell(s) successfully!")
+                    st.rerun()
         
-        if st.session_state.cells_data:
-            # Create metrics row
-            cols = st.columns(4)
-            total_cells = len(st.session_state.cells_data)
-            total_capacity = sum([cell['capacity'] for cell in st.session_state.cells_data.values()])
-            avg_health = np.mean([cell['health'] for cell in st.session_state.cells_data.values()])
-            critical_cells = sum([1 for cell in st.session_state.cells_data.values() if cell['temp'] > 35])
-            
-            with cols[0]:
-                st.metric("Total Cells", total_cells, "")
-            with cols[1]:
-                st.metric("Total Capacity", f"{total_capacity}Ah", "")
-            with cols[2]:
-                st.metric("Avg Health", f"{avg_health:.1f}%", "")
-            with cols[3]:
-                st.metric("Critical Temp", critical_cells, "⚠️" if critical_cells > 0 else "✅")
-            
-            # Detailed cell cards
-            st.markdown("### 📱 Individual Cell Status")
+        with col2:
+            st.markdown("### 🔋 Cell Overview")
             
-            for cell_key, cell_data in st.session_state.cells_data.items():
-                with st.expander(f"🔋 {cell_key.upper()}", expanded=False):
+            if cells:
+                # Create metrics row
+                cols = st.columns(5)
+                total_cells = len(cells)
+                total_capacity = cells.stats.total("capacity")
+                avg_soc = cells.stats.mean("soc_est") * 100
+                avg_health = cells.stats.mean("health")
+                critical_cells = cells.stats.over("hot")
+                
+                with cols[0]:
+                    st.metric("Total Cells", total_cells, "")
+                with cols[1]:
+                    st.metric("Total Capacity", f"{total_capacity:g}Ah", "")
+                with cols[2]:
+                    st.metric("Avg SOC (EKF)", f"{avg_soc:.1f}%", "")
+                with cols[3]:
+                    st.metric("Avg Health", f"{avg_health:.1f}%", "")
+                with cols[4]:
+                    st.metric("Critical Temp", critical_cells, "⚠️" if critical_cells > 0 else "✅")
+                
+                # Detailed cell cards
+                st.markdown("### 📱 Individual Cell Status")
+                
+                visible = cell_table(cells, DEFAULT_RULESET, key="overview")
+                
+                # Details for one cell of the visible page
+                keys = cells.keys
+                visible_keys = [keys[i] for i in visible]
+                cell_key = st.selectbox("🔋 Inspect Cell", visible_keys) if visible_keys else None
+                if cell_key:
+                    cell_data = cells.row(cell_key)
                     col_a, col_b, col_c = st.columns(3)
                     
                     with col_a:
-                        st.metric("Voltage", f"{cell_data['voltage']}V")
-                        st.metric("Current", f"{cell_data['current']}A")
+                        st.metric("Voltage", f"{cell_data['voltage']:.2f}V")
+                        st.metric("Current", f"{cell_data['current']:.2f}A")
+                        st.metric("SOC (EKF)", f"{cell_data['soc_est'] * 100:.1f}% ± {cell_data['soc_std'] * 100:.1f}")
                     
                     with col_b:
-                        st.metric("Temperature", f"{cell_data['temp']}°C")
-                        st.metric("Capacity", f"{cell_data['capacity']}Ah")
+                        st.metric("Temperature", f"{cell_data['temp']:.1f}°C")
+                        st.metric("Capacity", f"{cell_data['capacity']:g}Ah")
                     
                     with col_c:
-                        st.metric("Health", f"{cell_data['health']}%")
+                        st.metric("Health", f"{cell_data['health']:.1f}%")
+                        st.metric("SOH (estimated)", f"{cell_data['soh_est']:.1f}% ± {cell_data['soh_std']:.1f}")
                         st.metric("Cycles", cell_data['cycles'])
                     
                     # Status indicator
                     status_color = {"Charging": "🟢", "Discharging": "🟡", "Idle": "⚪"}
                     st.markdown(f"**Status:** {status_color[cell_data['status']]} {cell_data['status']}")
                     
-                    # Remove button
-                    if st.button(f"🗑️ Remove {cell_key}", key=f"remove_{cell_key}"):
-                        del st.session_state.cells_data[cell_key]
+                    # Remove button, and a thermal runaway trigger for propagation tests
+                    col_remove, col_ignite = st.columns(2)
+                    if col_remove.button(f"🗑️ Remove {cell_key}", key=f"remove_{cell_key}"):
+                        acquisition.submit(remove_cell, cell_key)
                         st.rerun()
-        else:
-            st.info("No cells configured yet. Add some cells to get started!")
+                    if col_ignite.button("🔥 Trigger Thermal Runaway", key=f"ignite_{cell_key}"):
+                        acquisition.submit(ignite_cell, cell_key)
+                        st.rerun()
+            else:
+                st.info("No cells configured yet. Add some cells to get started!")
 
-elif mode == "📋 Task Configuration":
-    st.markdown("## 📋 Task Management")
-    
-    col1, col2 = st.columns([1, 1])
-    
-    with col1:
-        st.markdown("### Create New Task")
+    elif mode == "📋 Task Configuration":
+        st.markdown("## 📋 Task Management")
         
-        with st.form("task_form"):
-            task_type = st.selectbox(
-                "Task Type",
-                ["CC_CV (Constant Current/Constant Voltage)", "IDLE", "CC_CD (Constant Current/Constant Discharge)"]
-            )
-            
-            if "CC_CV" in task_type:
-                st.markdown("**CC_CV Parameters**")
-                cc_value = st.number_input("CC Value (A)", value=2.0, step=0.1)
-                cv_voltage = st.number_input("CV Voltage (V)", value=4.0, step=0.1)
-                current = st.number_input("Current Limit (A)", value=1.0, step=0.1)
-                capacity = st.number_input("Capacity (Ah)", value=10.0, step=0.1)
-                duration = st.number_input("Duration (seconds)", value=3600, step=60)
-                
-            elif "IDLE" in task_type:
-                st.markdown("**IDLE Parameters**")
-                duration = st.number_input("Duration (seconds)", value=1800, step=60)
-                
-            elif "CC_CD" in task_type:
-                st.markdown("**CC_CD Parameters**")
-                cc_value = st.number_input("CC Value (A)", value=2.0, step=0.1)
-                voltage = st.number_input("Cutoff Voltage (V)", value=2.8, step=0.1)
-                capacity = st.number_input("Capacity (Ah)", value=10.0, step=0.1)
-                duration = st.number_input("Duration (seconds)", value=3600, step=60)
-            
-            submitted = st.form_submit_button("📋 Create Task", use_container_width=True)
+        col1, col2 = st.columns([1, 1])
+        
+        with col1:
+            st.markdown("### Create New Task")
             
-            if submitted:
-                task_id = len(st.session_state.tasks_data) + 1
-                task_key = f"task_{task_id}"
-                
-                task_data = {"task_type": task_type.split()[0], "duration": duration}
+            with st.form("task_form"):
+                task_type = st.selectbox(
+                    "Task Type",
+                    ["CC_CV (Constant Current/Constant Voltage)", "IDLE", "CC_CD (Constant Current/Constant Discharge)"]
+                )
                 
                 if "CC_CV" in task_type:
-                    task_data.update({
-                        "cc_value": cc_value,
-                        "cv_voltage": cv_voltage,
-                        "current": current,
-                        "capacity": capacity
-                    })
+                    st.markdown("**CC_CV Parameters**")
+                    cc_value = st.number_input("CC Value (A)", value=2.0, step=0.1)
+                    cv_voltage = st.number_input("CV Voltage (V)", value=4.0, step=0.1)
+                    current = st.number_input("Current Limit (A)", value=1.0, step=0.1)
+                    capacity = st.number_input("Capacity (Ah)", value=10.0, step=0.1)
+                    duration = st.number_input("Duration (seconds)", value=3600, step=60)
+                    
+                elif "IDLE" in task_type:
+                    st.markdown("**IDLE Parameters**")
+                    duration = st.number_input("Duration (seconds)", value=1800, step=60)
+                    
                 elif "CC_CD" in task_type:
-                    task_data.update({
-                        "cc_value": cc_value,
-                        "voltage": voltage,
-                        "capacity": capacity
-                    })
+                    st.markdown("**CC_CD Parameters**")
+                    cc_value = st.number_input("CC Value (A)", value=2.0, step=0.1)
+                    voltage = st.number_input("Cutoff Voltage (V)", value=2.8, step=0.1)
+                    capacity = st.number_input("Capacity (Ah)", value=10.0, step=0.1)
+                    duration = st.number_input("Duration (seconds)", value=3600, step=60)
                 
-                task_data["created_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                task_data["status"] = "Pending"
+                assigned_cells = st.multiselect("Assign to Cells", cells.keys)
                 
-                st.session_state.tasks_data[task_key] = task_data
-                st.success(f"✅ Task {task_key} created successfully!")
-                st.rerun()
-    
-    with col2:
-        st.markdown("### 📋 Task Queue")
-        
-        if st.session_state.tasks_data:
-            for task_key, task_data in st.session_state.tasks_data.items():
-                with st.expander(f"📋 {task_key.upper()}", expanded=False):
-                    st.markdown(f"**Type:** {task_data['task_type']}")
-                    st.markdown(f"**Duration:** {task_data['duration']}s")
-                    st.markdown(f"**Status:** {task_data['status']}")
-                    st.markdown(f"**Created:** {task_data['created_at']}")
+                submitted = st.form_submit_button("📋 Create Task", use_container_width=True)
+                
+                if submitted:
+                    params = {"duration": duration}
                     
-                    col_a, col_b, col_c = st.columns(3)
-                    with col_a:
-                        if st.button(f"▶️ Start", key=f"start_{task_key}"):
-                            st.session_state.tasks_data[task_key]["status"] = "Running"
-                            st.rerun()
+                    if "CC_CV" in task_type:
+                        params.update({
+                            "cc_value": cc_value,
+                            "cv_voltage": cv_voltage,
+                            "current": current,
+                            "capacity": capacity
+                        })
+                    elif "CC_CD" in task_type:
+                        params.update({
+                            "cc_value": cc_value,
+                            "voltage": voltage,
+                            "capacity": capacity
+                        })
                     
-                    with col_b:
-                        if st.button(f"⏸️ Pause", key=f"pause_{task_key}"):
-                            st.session_state.tasks_data[task_key]["status"] = "Paused"
-                            st.rerun()
+                    task_data = engine.make_task(task_type.split()[0], assigned_cells, **params)
+                    task_data["created_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                    task_data["status"] = "Pending"
                     
-                    with col_c:
-                        if st.button(f"🗑️ Delete", key=f"delete_{task_key}"):
-                            del st.session_state.tasks_data[task_key]
-                            st.rerun()
-        else:
-            st.info("No tasks created yet. Create a task to get started!")
-
-elif mode == "📊 Real-time Monitoring":
-    st.markdown("## 📊 Real-time Battery Monitoring")
-    
-    if st.session_state.cells_data:
-        # Control buttons
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            if st.button("▶️ Start Monitoring", use_container_width=True):
-                st.session_state.monitoring = True
+                    task_key = acquisition.submit(create_task, task_data)
+                    st.success(f"✅ Task {task_key} created successfully!")
+                    st.rerun()
+        
         with col2:
-            if st.button("⏸️ Stop Monitoring", use_container_width=True):
-                st.session_state.monitoring = False
+            st.markdown("### 📋 Task Queue")
+            
+            if tasks_data:
+                for task_key, task_data in tasks_data.items():
+                    with st.expander(f"📋 {task_key.upper()}", expanded=False):
+                        st.markdown(f"**Type:** {task_data['task_type']}")
+                        st.markdown(f"**Duration:** {task_data['duration']}s")
+                        st.markdown(f"**Status:** {task_data['status']}")
+                        st.markdown(f"**Cells:** {', '.join(task_data['cells']) or 'None assigned'}")
+                        st.markdown(f"**Created:** {task_data['created_at']}")
+                        
+                        col_a, col_b, col_c = st.columns(3)
+                        with col_a:
+                            if st.button(f"▶️ Start", key=f"start_{task_key}"):
+                                try:
+                                    acquisition.submit(start_task, task_key)
+                                except ValueError as e:
+                                    st.error(f"❌ {e}")
+                                else:
+                                    st.rerun()
+                        
+                        with col_b:
+                            if st.button(f"⏸️ Pause", key=f"pause_{task_key}"):
+                                acquisition.submit(pause_task, task_key)
+                                st.rerun()
+                        
+                        with col_c:
+                            if st.button(f"🗑️ Delete", key=f"delete_{task_key}"):
+                                acquisition.submit(delete_task, task_key)
+                                st.rerun()
+            else:
+                st.info("No tasks created yet. Create a task to get started!")
+        
+        # Multi-step profiles, run by the scheduler on groups of cells
+        st.markdown("### 🧪 Test Profiles")
+        
+        col3, col4 = st.columns([1, 1])
+        
         with col3:
-            if st.button("🔄 Refresh Data", use_container_width=True):
-                # Update cell data with random variations
-                for cell_key, cell_data in st.session_state.cells_data.items():
-                    st.session_state.cells_data[cell_key]['temp'] += random.uniform(-1, 1)
-                    st.session_state.cells_data[cell_key]['voltage'] += random.uniform(-0.1, 0.1)
-                    st.session_state.cells_data[cell_key]['current'] += random.uniform(-0.5, 0.5)
+            with st.form("profile_form"):
+                profile_steps = st.text_input("Steps (in order)", value="CC_CV, IDLE, CC_CD")
+                repeat = st.number_input("Repeat", min_value=1, max_value=1000, value=1)
+                step_duration = st.number_input("Step Duration (seconds)", value=600, step=60)
+                profile_groups = st.multiselect("Cell Groups", list(cells.counts("group")))
+                profile_cells = st.multiselect("Cells", cells.keys)
+                priority = st.number_input("Priority", value=0, step=1)
+                open_profiles = [task_id for task_id, job in profiles_data.items() if job["status"] not in FINAL]
+                after = st.multiselect(
+                    "Run After", open_profiles,
+                    format_func=lambda task_id: f"Profile {task_id} · {profiles_data[task_id]['name']}"
+                )
+                timeout = st.number_input("Timeout (seconds, 0 for none)", min_value=0, value=0, step=60)
+                
+                if st.form_submit_button("🧪 Create Profile", use_container_width=True):
+                    keys = cells.keys
+                    profile_keys = [keys[i] for i in cells.rows_where("group", *profile_groups)] if profile_groups else []
+                    profile_keys += [key for key in profile_cells if key not in profile_keys]
+                    try:
+                        steps = [engine.make_task(step.strip().upper(), duration=step_duration)
+                                 for step in profile_steps.split(",") if step.strip()]
+                        profile = make_profile(steps, repeat)
+                    except ValueError as e:
+                        st.error(f"❌ {e}")
+                    else:
+                        task_id = acquisition.submit(create_profile, profile, profile_keys, priority, after, timeout or None)
+                        st.success(f"✅ Profile {task_id} scheduled on {len(profile_keys)} cell(s)")
+                        st.rerun()
         
-        # Create real-time charts
-        if st.session_state.cells_data:
-            # Voltage chart
-            fig_voltage = go.Figure()
-            cell_names = list(st.session_state.cells_data.keys())
-            voltages = [st.session_state.cells_data[cell]['voltage'] for cell in cell_names]
-            
-            fig_voltage.add_trace(go.Bar(
-                x=cell_names,
-                y=voltages,
-                marker_color='lightblue',
-                name='Voltage'
-            ))
+        with col4:
+            if profiles_data:
+                shown = sorted(profiles_data, key=lambda task_id: (profiles_data[task_id]["status"] in FINAL, -task_id))[:50]
+                st.caption(f"Showing {len(shown)} of {len(profiles_data)} profiles")
+                for task_id in shown:
+                    job = profiles_data[task_id]
+                    with st.expander(f"🧪 PROFILE {task_id} · {job['name']} ×{job['repeat']}", expanded=False):
+                        st.markdown(f"**Status:** {job['status']} · **Priority:** {job['priority']}")
+                        st.markdown(f"**Cells:** {len(job['cells'])} ({job['remaining']} still running)")
+                        if job["after"]:
+                            st.markdown(f"**After:** {', '.join(f'Profile {dep}' for dep in job['after'])}")
+                        if job["status"] in ("Running", "Paused"):
+                            st.progress(1 - job["remaining"] / max(len(job["cells"]), 1))
+                            steps_done = scheduler.progress(cells, task_id)
+                            st.caption("Cells per step: " + " · ".join(str(count) for count in steps_done))
+                        
+                        col_a, col_b, col_c = st.columns(3)
+                        with col_a:
+                            if job["status"] == "Paused" and st.button("▶️ Resume", key=f"resume_profile_{task_id}"):
+                                acquisition.submit(resume_profile, task_id)
+                                st.rerun()
+                        with col_b:
+                            if job["status"] == "Running" and st.button("⏸️ Pause", key=f"pause_profile_{task_id}"):
+                                acquisition.submit(pause_profile, task_id)
+                                st.rerun()
+                        with col_c:
+                            if st.button("🗑️ Delete", key=f"delete_profile_{task_id}"):
+                                acquisition.submit(delete_profile, task_id)
+                                st.rerun()
+            else:
+                st.info("No profiles yet. Create one to run a test plan on groups of cells.")
+
+    elif mode == "📊 Real-time Monitoring":
+        st.markdown("## 📊 Real-time Battery Monitoring")
+        
+        if cells:
+            # Control buttons
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                if st.button("▶️ Start Monitoring", use_container_width=True):
+                    st.session_state.monitoring = True
+            with col2:
+                if st.button("⏸️ Stop Monitoring", use_container_width=True):
+                    st.session_state.monitoring = False
+            with col3:
+                if st.button("🔄 Refresh Data", use_container_width=True):
+                    acquisition.submit(refresh_data, refresh_noise)
             
-            fig_voltage.update_layout(
-                title="🔋 Cell Voltages",
-                xaxis_title="Cells",
-                yaxis_title="Voltage (V)",
-                height=400
-            )
+            history_seconds = st.slider("History Window (s)", 10, 600, 60, step=10)
             
-            st.plotly_chart(fig_voltage, use_container_width=True)
+            # Create real-time charts, re-rendered from fresh snapshots while monitoring
+            @st.fragment(run_every=2 if st.session_state.monitoring else None)
+            def monitoring_charts():
+                with profiler.section("chart.monitoring"):
+                    cells = acquisition.snapshot()
+                    
+                    # Voltage trend from the ring buffer
+                    history_keys, times, history_voltages = acquisition.history_snapshot("voltage", history_seconds)
+                    if acquisition.history.full and len(times) == acquisition.history.samples:
+                        st.caption(f"⚠️ History is capped at the last {times[-1] - times[0]:.0f}s for {len(history_keys)} cells")
+                    sample_times = pd.to_datetime(times, unit='s')
+                    
+                    if len(history_keys) <= 20:
+                        history_traces = [
+                            ("scatter", dict(x=sample_times, y=cell_voltages, mode='lines', name=cell_key))
+                            for cell_key, cell_voltages in zip(history_keys, history_voltages)
+                        ]
+                    else:
+                        # One gap-separated trace keeps large benches to a single WebGL draw
+                        gap = np.full((len(history_keys), 1), np.nan)
+                        history_traces = [("scatter", dict(
+                            x=np.tile(np.append(times, np.nan), len(history_keys)) * 1000,
+                            y=np.hstack([history_voltages, gap]).ravel(),
+                            mode='lines',
+                            name='Voltage'
+                        ))]
+                    
+                    fig_history = figures.render("history", history_traces, dict(
+                        title=f"📈 Voltage History (last {history_seconds}s)",
+                        xaxis_title="Time",
+                        xaxis_type="date",
+                        yaxis_title="Voltage (V)",
+                        height=400
+                    ))
+                    
+                    st.plotly_chart(fig_history, use_container_width=True)
+                    
+                    # Voltage chart
+                    cell_names = cells.keys
+                    voltages = cells.voltage
+                    
+                    fig_voltage = figures.render("voltage", [("bar", dict(
+                        x=cell_names,
+                        y=voltages,
+                        marker_color='lightblue',
+                        name='Voltage'
+                    ))], dict(
+                        title="🔋 Cell Voltages",
+                        xaxis_title="Cells",
+                        yaxis_title="Voltage (V)",
+                        height=400
+                    ))
+                    
+                    st.plotly_chart(fig_voltage, use_container_width=True)
+                    
+                    # Estimated state of charge, with the filter's one-sigma band
+                    fig_soc = figures.render("soc", [("bar", dict(
+                        x=cell_names,
+                        y=cells.soc_est * 100,
+                        error_y=dict(type='data', array=cells.soc_std * 100),
+                        marker_color='seagreen',
+                        name='SOC'
+                    ))], dict(
+                        title="🔋 State of Charge (EKF estimate)",
+                        xaxis_title="Cells",
+                        yaxis_title="SOC (%)",
+                        yaxis_range=[0, 100],
+                        height=400
+                    ))
+                    
+                    st.plotly_chart(fig_soc, use_container_width=True)
+                    
+                    # Temperature chart
+                    temperatures = cells.temp
+                    
+                    fig_temp = figures.render("temperature", [("scatter", dict(
+                        x=cell_names,
+                        y=temperatures,
+                        mode='lines+markers',
+                        marker_color='red',
+                        name='Temperature'
+                    ))], dict(
+                        title="🌡️ Cell Temperatures",
+                        xaxis_title="Cells",
+                        yaxis_title="Temperature (°C)",
+                        height=400
+                    ))
+                    
+                    st.plotly_chart(fig_temp, use_container_width=True)
+                    
+                    # Health status pie chart
+                    health_labels = ["Excellent (90-100%)", "Good (80-89%)", "Fair (70-79%)", "Poor (<70%)"]
+                    health_counts = np.bincount(np.digitize(cells.health, [70, 80, 90]), minlength=4)[::-1]
+                    health_ranges = dict(zip(health_labels, health_counts.tolist()))
+                    
+                    fig_health = figures.render("health", [("pie", dict(
+                        labels=list(health_ranges.keys()),
+                        values=list(health_ranges.values()),
+                        hole=0.4
+                    ))], dict(
+                        title="🏥 Battery Health Distribution",
+                        height=400
+                    ))
+                    
+                    st.plotly_chart(fig_health, use_container_width=True)
+                    
+                    if figures.measure:
+                        st.caption(f"📦 Chart payload: {figures.total_payload_bytes / 1024:.1f} kB per frame")
             
-            # Temperature chart
-            fig_temp = go.Figure()
-            temperatures = [st.session_state.cells_data[cell]['temp'] for cell in cell_names]
+            monitoring_charts()
+        else:
+            st.warning("⚠️ No cells available for monitoring. Please add cells first.")
+
+    elif mode == "📈 Analytics":
+        st.markdown("## 📈 Battery Analytics & Insights")
+        
+        if cells:
+            # Performance metrics
+            st.markdown("### 🎯 Performance Metrics")
             
-            fig_temp.add_trace(go.Scatter(
-                x=cell_names,
-                y=temperatures,
-                mode='lines+markers',
-                marker_color='red',
-                name='Temperature'
-            ))
+            cols = st.columns(4)
             
-            fig_temp.update_layout(
-                title="🌡️ Cell Temperatures",
-                xaxis_title="Cells",
-                yaxis_title="Temperature (°C)",
-                height=400
-            )
+            # Calculate metrics
+            total_energy = cells.stats.total("power")
+            avg_efficiency = cells.stats.mean("health")
+            total_cycles = int(cells.stats.total("cycles"))
+            power_consumption = cells.stats.total("abs_current")
             
-            st.plotly_chart(fig_temp, use_container_width=True)
+            with cols[0]:
+                st.metric("Total Energy", f"{total_energy:.2f}W", "")
+            with cols[1]:
+                st.metric("Avg Efficiency", f"{avg_efficiency:.1f}%", "")
+            with cols[2]:
+                st.metric("Total Cycles", f"{total_cycles}", "")
+            with cols[3]:
+                st.metric("Power Draw", f"{power_consumption:.2f}A", "")
             
-            # Health status pie chart
-            health_ranges = {"Excellent (90-100%)": 0, "Good (80-89%)": 0, "Fair (70-79%)": 0, "Poor (<70%)": 0}
+            # Detailed analytics
+            col1, col2 = st.columns(2)
             
-            for cell_data in st.session_state.cells_data.values():
-                health = cell_data['health']
-                if health >= 90:
-                    health_ranges["Excellent (90-100%)"] += 1
-                elif health >= 80:
-                    health_ranges["Good (80-89%)"] += 1
-                elif health >= 70:
-                    health_ranges["Fair (70-79%)"] += 1
-                else:
-                    health_ranges["Poor (<70%)"] += 1
+            with col1:
+                # Cell type distribution
+                type_counts = {CELL_TYPES[code]: count for code, count in cells.counts("type_code").items()}
+                
+                fig_types = figures.render("types", [("bar", dict(
+                    x=list(type_counts.keys()),
+                    y=list(type_counts.values())
+                ))], dict(
+                    title="🔋 Cell Type Distribution",
+                    xaxis_title="Cell Type",
+                    yaxis_title="Count"
+                ))
+                st.plotly_chart(fig_types, use_container_width=True)
             
-            fig_health = go.Figure(data=[go.Pie(
-                labels=list(health_ranges.keys()),
-                values=list(health_ranges.values()),
-                hole=0.4
-            )])
+            with col2:
+                # Voltage vs Temperature correlation
+                voltages = cells.voltage
+                temperatures = cells.temp
+                
+                fig_corr = figures.render("correlation", [("scatter", dict(
+                    x=temperatures,
+                    y=voltages,
+                    mode='markers'
+                ))], dict(
+                    title="🌡️ Voltage vs Temperature",
+                    xaxis_title="Temperature (°C)",
+                    yaxis_title="Voltage (V)"
+                ))
+                st.plotly_chart(fig_corr, use_container_width=True)
             
-            fig_health.update_layout(
-                title="🏥 Battery Health Distribution",
-                height=400
-            )
+            # Recommendations
+            st.markdown("### 💡 AI Recommendations")
             
-            st.plotly_chart(fig_health, use_container_width=True)
+            # Findings from the shared rule table, evaluated on every tick
+            recommendations = [
+                rule.recommendation
+                for rule, count in DEFAULT_RULESET.findings(cells.alarms)
+                if rule.recommendation
+            ]
             
-        # Auto-refresh for monitoring
-        if st.session_state.monitoring:
-            time.sleep(2)
-            st.rerun()
-    else:
-        st.warning("⚠️ No cells available for monitoring. Please add cells first.")
-
-elif mode == "📈 Analytics":
-    st.markdown("## 📈 Battery Analytics & Insights")
-    
-    if st.session_state.cells_data:
-        # Performance metrics
-        st.markdown("### 🎯 Performance Metrics")
-        
-        cols = st.columns(4)
-        
-        # Calculate metrics
-        total_energy = sum([cell['voltage'] * cell['current'] for cell in st.session_state.cells_data.values()])
-        avg_efficiency = np.mean([cell['health'] for cell in st.session_state.cells_data.values()])
-        total_cycles = sum([cell['cycles'] for cell in st.session_state.cells_data.values()])
-        power_consumption = sum([abs(cell['current']) for cell in st.session_state.cells_data.values()])
-        
-        with cols[0]:
-            st.metric("Total Energy", f"{total_energy:.2f}W", "")
-        with cols[1]:
-            st.metric("Avg Efficiency", f"{avg_efficiency:.1f}%", "")
-        with cols[2]:
-            st.metric("Total Cycles", f"{total_cycles}", "")
-        with cols[3]:
-            st.metric("Power Draw", f"{power_consumption:.2f}A", "")
-        
-        # Detailed analytics
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            # Cell type distribution
-            cell_types = [cell['type'] for cell in st.session_state.cells_data.values()]
-            type_counts = {cell_type: cell_types.count(cell_type) for cell_type in set(cell_types)}
+            if not recommendations:
+                recommendations.append("✅ All systems operating normally")
             
-            fig_types = px.bar(
-                x=list(type_counts.keys()),
-                y=list(type_counts.values()),
-                title="🔋 Cell Type Distribution",
-                labels={'x': 'Cell Type', 'y': 'Count'}
-            )
-            st.plotly_chart(fig_types, use_container_width=True)
-        
-        with col2:
-            # Voltage vs Temperature correlation
-            voltages = [cell['voltage'] for cell in st.session_state.cells_data.values()]
-            temperatures = [cell['temp'] for cell in st.session_state.cells_data.values()]
+            for rec in recommendations:
+                st.info(rec)
             
-            fig_corr = px.scatter(
-                x=temperatures,
-                y=voltages,
-                title="🌡️ Voltage vs Temperature",
-                labels={'x': 'Temperature (°C)', 'y': 'Voltage (V)'}
-            )
-            st.plotly_chart(fig_corr, use_container_width=True)
-        
-        # Recommendations
-        st.markdown("### 💡 AI Recommendations")
-        
-        recommendations = []
-        
-        # Check for high temperature cells
-        hot_cells = [cell for cell in st.session_state.cells_data.values() if cell['temp'] > 35]
-        if hot_cells:
-            recommendations.append("🌡️ Consider cooling system - some cells are running hot")
-        
-        # Check for low health cells
-        unhealthy_cells = [cell for cell in st.session_state.cells_data.values() if cell['health'] < 80]
-        if unhealthy_cells:
-            recommendations.append("🏥 Replace cells with health below 80%")
-        
-        # Check for high cycle count
-        aged_cells = [cell for cell in st.session_state.cells_data.values() if cell['cycles'] > 800]
-        if aged_cells:
-            recommendations.append("🔄 Monitor high-cycle cells closely")
-        
-        if not recommendations:
-            recommendations.append("✅ All systems operating normally")
-        
-        for rec in recommendations:
-            st.info(rec)
-        
-    else:
-        st.warning("⚠️ No data available for analytics. Please add cells first.")
+        else:
+            st.warning("⚠️ No data available for analytics. Please add cells first.")
+
+if st.session_state.developer_panel:
+    profiler_panel(profiler, key="profiler")
 
 # Footer
 st.markdown("---")
@@ -0,0 +1,49 @@
+"""``CyclerDriver`` and ``ConnectionPool`` against the simulated cycler."""
+import asyncio
+
+import numpy as np
+import pytest
+
+from bms import scpi
+from bms.cycler import SimulatedCycler, simulated_bench
+from bms.drivers import ConnectionPool, CyclerDriver
+
+
+def with_cycler(test, cells=8, latency=0.0, timeout=1.0, batch_size=64):
+    """Run ``test(driver, pool)`` against a fresh simulated cycler."""
+    async def main():
+        store = simulated_bench(cells)
+        # Tell the channels apart by their voltage
+        store.write("voltage", 3.0 + 0.01 * np.arange(1, cells + 1))
+        cycler = SimulatedCycler(store, latency=latency)
+        host, port = await cycler.start()
+        pool = ConnectionPool(host, port, timeout=timeout)
+        try:
+            return await test(CyclerDriver(pool, batch_size), pool)
+        finally:
+            await pool.close()
+            await cycler.stop()
+
+    return asyncio.run(main())
+
+
+@pytest.mark.parametrize("batch_size", [1, 64])
+def test_measure_repeated_channels(batch_size):
+    async def test(driver, pool):
+        return await driver.measure([3, 1, 3, 2, 1])
+
+    readings = with_cycler(test, batch_size=batch_size)
+    assert readings.shape == (5, len(scpi.MEASUREMENTS))
+    voltage = scpi.MEASUREMENTS.index("voltage")
+    np.testing.assert_allclose(readings[:, voltage], [3.03, 3.01, 3.03, 3.02, 3.01])
+    np.testing.assert_array_equal(readings[0], readings[2])
+
+
+def test_stalled_reply_times_out_and_drops_connection():
+    async def test(driver, pool):
+        with pytest.raises(asyncio.TimeoutError):
+            await driver.identify()
+        return pool
+
+    pool = with_cycler(test, latency=0.5, timeout=0.05)
+    assert not pool._idle
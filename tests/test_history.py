@@ -0,0 +1,25 @@
+"""``HistoryBuffer`` windows when the byte ceiling caps the history."""
+import numpy as np
+
+from bms import CellStore
+from bms.history import HistoryBuffer
+
+
+def test_capped_window_returns_every_held_sample():
+    store = CellStore()
+    for k in range(4):
+        store.add(f"cell_{k}", "nmc")
+    # Room for 10 samples of 4 cells, each written twice with its timestamp
+    history = HistoryBuffer(cell_capacity=4, channels=("voltage",), max_bytes=10 * 2 * (4 * 4 + 8))
+    assert history.samples == 10
+
+    for t in range(10):
+        history.append(store, float(t))
+    assert not history.full
+
+    history.append(store, 10.0)
+    times, values = history.channel("voltage", 60)
+    assert history.full
+    assert len(times) == history.samples
+    np.testing.assert_array_equal(times, np.arange(1.0, 11.0))
+    assert values.shape == (4, 10)
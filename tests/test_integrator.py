@@ -0,0 +1,89 @@
+"""``AdaptiveStep`` at a coarse tick against ``engine.step`` at a fine one.
+
+The fixed-step engine only notices an event at the end of the step that
+crosses it, so its event times run up to one reference step late and its
+SOC carries up to one step of extra charge; the tolerances allow a couple
+of reference steps on top of the integrator's own ``time_tol``.
+"""
+import numpy as np
+import pytest
+
+from bms import CellStore, engine
+from bms.engine import PHASE_CV
+from bms.integrator import AdaptiveStep
+
+REF_DT = 0.05
+COARSE_DT = 60.0
+TIME_TOL = 0.1
+SOC_TOL = 5e-5
+
+# Chemistry, starting SOC, 1C current (A), CV voltage and discharge cutoff (V)
+CELLS = [
+    ("nmc", 0.45, 110.0, 4.0, 3.2),
+    ("li-ion", 0.45, 120.0, 4.2, 3.25),
+]
+
+
+def bench(task_type, taper=0.8):
+    """One cell per chemistry running ``task_type``; CV ends at ``taper`` times the CC current."""
+    store = CellStore()
+    for k, (cell_type, soc, cc, cv, cutoff) in enumerate(CELLS):
+        store.add(f"cell_{k}", cell_type, soc=soc)
+        if task_type == "CC_CV":
+            task = engine.make_task("CC_CV", cc_value=cc, cv_voltage=cv, current=taper * cc, capacity=0,
+                                    duration=36000)
+        else:
+            task = engine.make_task("CC_CD", cc_value=cc, voltage=cutoff, capacity=0, duration=36000)
+        engine.start_task(store, [k], k + 1, task)
+    return store
+
+
+def run(step, store, dt):
+    """Step until every task is done; returns per-cell CV start, end time and final SOC."""
+    switched = np.full(len(store), np.nan)
+    ended = np.full(len(store), np.nan)
+    soc = np.full(len(store), np.nan)
+    for _ in range(int(36000 / dt)):
+        finished = step(store, dt)
+        new = np.isnan(switched) & (store.phase == PHASE_CV)
+        switched[new] = store.elapsed[new]
+        ended[finished] = store.elapsed[finished]
+        soc[finished] = store.soc[finished]
+        if not np.isnan(ended).any():
+            break
+    return switched, ended, soc
+
+
+@pytest.fixture(scope="module")
+def charge():
+    return run(engine.step, bench("CC_CV"), REF_DT)
+
+
+@pytest.fixture(scope="module")
+def discharge():
+    return run(engine.step, bench("CC_CD"), REF_DT)
+
+
+def test_cc_to_cv_switch_time(charge):
+    # A CV phase tapering to the CC current ends the moment it starts, so
+    # its end time is the switch time
+    _, ended, _ = run(AdaptiveStep(), bench("CC_CV", taper=1.0), COARSE_DT)
+    switched, _, _ = charge
+    assert np.all(switched > 0)
+    np.testing.assert_allclose(ended, switched, atol=TIME_TOL)
+
+
+def test_cv_taper_end(charge):
+    _, ended, soc = run(AdaptiveStep(), bench("CC_CV"), COARSE_DT)
+    switched, ref_ended, ref_soc = charge
+    assert np.all(ref_ended > switched)
+    np.testing.assert_allclose(ended, ref_ended, atol=TIME_TOL)
+    np.testing.assert_allclose(soc, ref_soc, atol=SOC_TOL)
+
+
+def test_cc_cd_cutoff(discharge):
+    _, ended, soc = run(AdaptiveStep(), bench("CC_CD"), COARSE_DT)
+    _, ref_ended, ref_soc = discharge
+    np.testing.assert_allclose(ended, ref_ended, atol=TIME_TOL)
+    np.testing.assert_allclose(soc, ref_soc, atol=SOC_TOL)
+
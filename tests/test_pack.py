@@ -0,0 +1,64 @@
+"""``PackModel`` string currents and balancing, run after ``engine.step`` as on a bench."""
+import numpy as np
+import pytest
+
+from bms import CellStore, engine
+from bms.pack import PackModel
+
+
+def pack(socs, group=1):
+    store = CellStore()
+    for k, soc in enumerate(socs):
+        store.add(f"cell_{k}", "nmc", group=group, soc=soc)
+    return store
+
+
+def tick(store, model, dt, ticks=1):
+    for _ in range(ticks):
+        engine.step(store, dt)
+        model(store, dt)
+
+
+def test_string_currents_sum_to_pack_current():
+    # 2S2P: strings {0, 1} and {2, 3} at different SOCs
+    store = pack([0.4, 0.45, 0.6, 0.6])
+    model = PackModel()
+    model.configure(1, 2, 2)
+    engine.start_task(store, np.arange(4), 1, engine.make_task("CC_CV", cc_value=10.0, cv_voltage=4.0))
+    tick(store, model, 1.0, 10)
+
+    # Each string carries the current of its cells; two strings share 2 x 10 A
+    assert model.current[0] == pytest.approx(20.0)
+    assert model.string_current.sum() == pytest.approx(20.0)
+    assert model.string_current[0] > model.string_current[1]
+    np.testing.assert_allclose(store.current, np.repeat(model.string_current, 2))
+
+
+def test_strings_circulate_current_at_rest():
+    store = pack([0.4, 0.4, 0.6, 0.6])
+    model = PackModel()
+    model.configure(1, 2, 2)
+    tick(store, model, 1.0)
+
+    assert model.current[0] == 0.0
+    assert model.string_current.sum() == pytest.approx(0.0, abs=1e-9)
+    # The fuller string discharges into the emptier one
+    assert model.string_current[1] < -1.0
+    assert model.string_current[0] == pytest.approx(-model.string_current[1])
+
+
+@pytest.mark.parametrize("balancing, current", [("passive", "bleed_current"), ("active", "transfer_current")])
+def test_balancing_shrinks_soc_spread(balancing, current):
+    # One string, so no current circulates and only balancing moves charge
+    store = pack([0.5, 0.52, 0.49, 0.51])
+    model = PackModel(**{current: 10.0})
+    model.configure(1, 4, 1, balancing)
+    tick(store, model, 10.0)
+    spread = model.soc_spread[0]
+    tick(store, model, 10.0, 300)
+
+    assert spread == pytest.approx(0.03)
+    assert model.soc_spread[0] < model.threshold + 1e-3
+    assert np.ptp(store.soc) < spread / 5
+    # Balancing only ever loses charge
+    assert store.soc.mean() <= 0.505
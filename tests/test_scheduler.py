@@ -0,0 +1,57 @@
+"""``Scheduler`` profiles sharing a bench with single tasks."""
+import numpy as np
+
+from bms import CellStore, engine
+from bms.scheduler import Scheduler, make_profile
+
+
+def bench(cells=4):
+    store = CellStore()
+    for k in range(cells):
+        store.add(f"cell_{k}", "nmc", soc=0.5)
+    return store
+
+
+def test_profile_waits_for_cells_of_a_single_task():
+    store = bench()
+    scheduler = Scheduler()
+    engine.start_task(store, [0, 1], 1, engine.make_task("IDLE", duration=10))
+    scheduler.submit(store, 2, make_profile([engine.make_task("IDLE", duration=5)]), store.keys[1:3])
+    assert scheduler.jobs[2]["status"] == "Queued"
+    assert store.task_id.tolist() == [1, 1, 0, 0]
+
+    for _ in range(11):
+        scheduler(store, 1.0)
+    # The single task ran to its end, then the profile took the cells
+    assert store.phase[0] == engine.PHASE_DONE
+    assert scheduler.jobs[2]["status"] == "Running"
+    assert store.task_id.tolist() == [1, 2, 2, 0]
+
+    for _ in range(6):
+        scheduler(store, 1.0)
+    assert scheduler.jobs[2]["status"] == "Completed"
+
+
+def test_release_starts_profiles_after_a_single_task_stops():
+    store = bench()
+    scheduler = Scheduler()
+    engine.start_task(store, [0], 1, engine.make_task("IDLE", duration=1000))
+    scheduler.submit(store, 2, make_profile(["IDLE"]), store.keys[:2])
+    scheduler(store, 1.0)
+    assert scheduler.jobs[2]["status"] == "Queued"
+
+    engine.stop_task(store, 1)
+    scheduler.release(store)
+    assert scheduler.jobs[2]["status"] == "Running"
+    np.testing.assert_array_equal(store.task_id[:2], [2, 2])
+
+
+def test_held_lists_cells_of_running_and_paused_profiles():
+    store = bench()
+    scheduler = Scheduler()
+    scheduler.submit(store, 1, make_profile(["IDLE"]), store.keys[:2])
+    assert scheduler.held(store.keys) == store.keys[:2]
+    scheduler.pause(store, 1)
+    assert scheduler.held(store.keys[1:]) == store.keys[1:2]
+    scheduler.cancel(store, 1)
+    assert scheduler.held(store.keys) == []
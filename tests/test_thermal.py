@@ -0,0 +1,66 @@
+"""``ThermalModel`` on a pair of coupled cells, against closed forms."""
+import numpy as np
+import pytest
+
+from bms import CELL_TYPES, CellStore
+from bms.chemistry import HEAT_CAPACITY, ONSET, R0, RUNAWAY_HEAT
+from bms.thermal import RESIDUAL, ThermalModel
+
+
+def pair(temps=(25.0, 25.0), currents=(0.0, 0.0), soc=0.5):
+    """Two nmc cells side by side in one group, carrying fixed currents."""
+    store = CellStore()
+    for k, (temp, current) in enumerate(zip(temps, currents)):
+        store.add(f"cell_{k}", "nmc", group=1, temp=temp, current=current, soc=soc)
+    return store
+
+
+def energy(store):
+    return np.sum(HEAT_CAPACITY[store.type_code] * store.temp)
+
+
+def test_insulated_pair_conserves_energy():
+    store = pair((60.0, 20.0), (80.0, 0.0))
+    thermal = ThermalModel(cooling=0.0, edge_cooling=0.0)
+    start = energy(store)
+    seconds = 0.0
+    for _ in range(1000):
+        thermal(store, 10.0)
+        seconds += 10.0
+    heat = 80.0 ** 2 * R0[store.type_code[0]]
+    assert energy(store) - start == pytest.approx(heat * seconds, rel=1e-9)
+    # Contact evens the pair out, except for the gap that carries half the heat across
+    assert store.temp[0] - store.temp[1] == pytest.approx(heat / (2 * thermal.contact), rel=1e-6)
+
+
+def test_pair_steady_state_matches_closed_form():
+    store = pair(currents=(100.0, 0.0))
+    thermal = ThermalModel(ambient=25.0, contact=2.0, cooling=0.5, edge_cooling=0.5)
+    for _ in range(3000):
+        thermal(store, 10.0)
+
+    # Each cell has one neighbour, so three open sides:
+    # (k + s) u_a - k u_b = q,  -k u_a + (k + s) u_b = 0
+    k, s = thermal.contact, thermal.cooling + 3 * thermal.edge_cooling
+    q = 100.0 ** 2 * R0[store.type_code[0]]
+    rise = q / (s * (2 * k + s))
+    np.testing.assert_allclose(store.temp - thermal.ambient, [(k + s) * rise, k * rise], rtol=1e-6)
+
+
+def test_runaway_starts_at_onset_and_releases_its_budget():
+    nmc = CELL_TYPES.index("nmc")
+    store = pair((ONSET[nmc] - 0.5, 25.0), soc=0.5)
+    thermal = ThermalModel(cooling=0.0, edge_cooling=0.0, burn_seconds=30.0)
+    thermal(store, 0.1)
+    assert not thermal.burning.any()
+
+    thermal.ignite(store, [0])
+    start = energy(store)
+    for _ in range(60):
+        thermal(store, 1.0)
+    budget = RUNAWAY_HEAT[nmc] * (RESIDUAL + (1.0 - RESIDUAL) * 0.5)
+    np.testing.assert_allclose(thermal.budget, [budget, 0.0])
+    assert thermal.vented.tolist() == [True, False]
+    assert energy(store) - start == pytest.approx(budget, rel=1e-9)
+    # The heat spreads to the neighbour
+    assert store.temp[1] > 25.0